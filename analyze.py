@@ -3,21 +3,28 @@
 GitHub Actionsで実行され、予測結果をJSONとして出力する
 """
 
+import gzip
+import hashlib
+import importlib
+import importlib.util
 import json
+import math
 import os
 import re
+import sys
 import time
 from datetime import datetime
 from pathlib import Path
 from zoneinfo import ZoneInfo
+from typing import Callable, Dict, List, Tuple, Optional
+import argparse
+
+_import_started = time.perf_counter()
 import pandas as pd
 import numpy as np
-from scipy import stats
-from scipy.optimize import minimize_scalar
-from typing import Dict, List, Tuple, Optional
-import requests
-from bs4 import BeautifulSoup
-import argparse
+# 起動時に読み込む基本ライブラリの読み込み時間（--import-profileで表示）
+# 重いライブラリ（TensorFlow、XGBoostなど）は、それを使う手法が実行されるときだけ読み込む
+STARTUP_IMPORT_SECONDS = time.perf_counter() - _import_started
 
 
 def fetch_latest_result(timeout: int = 10, sleep_sec: float = 1.0) -> Optional[Dict[str, str]]:
@@ -48,6 +55,10 @@ def fetch_latest_result(timeout: int = 10, sleep_sec: float = 1.0) -> Optional[D
         # "Accept-Language": "ja,en-US;q=0.9,en;q=0.8", # 言語設定は自動判定に任せる
     }
     
+    # Web取得のときだけ必要なライブラリ（予測処理だけの実行では読み込まない）
+    import requests
+    from bs4 import BeautifulSoup
+    
     valid_results = []
     
     for url, site_type in urls:
@@ -311,8 +322,1961 @@ def fetch_latest_result(timeout: int = 10, sleep_sec: float = 1.0) -> Optional[D
             print(f"[fetch_latest_result] {site_type} ({url}) からの取得に失敗: {e}")
             continue
     
-    print("[fetch_latest_result] すべての情報源からの取得に失敗しました")
-    return None
+    print("[fetch_latest_result] すべての情報源からの取得に失敗しました")
+    return None
+
+
+def format_data_json(records: List[Dict[str, any]], style: str = 'indent') -> str:
+    """
+    data.json形式のレコードを文字列にする
+    
+    Args:
+        records: レコードのリスト
+        style: 'indent'（public/data.json、indent=2）または 'lines'（docs/public/data.json、1行1オブジェクト）
+    """
+    if style == 'indent':
+        return json.dumps(records, ensure_ascii=False, indent=2)
+    if not records:
+        return '[\n]'
+    return '[\n' + ',\n'.join(f'    {json.dumps(item, ensure_ascii=False)}' for item in records) + '\n]'
+
+
+def write_text_atomic(path: str, text: str):
+    """一時ファイルに書いてから置き換える（書き込み途中の状態を他から見せない）"""
+    write_bytes_atomic(path, text.encode('utf-8'))
+
+
+def write_bytes_atomic(path: str, data: bytes):
+    """write_text_atomicのバイト列版"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_tail(path: str, size: int = 1024) -> Tuple[int, bytes]:
+    """ファイル末尾のバイト列を読む: (読み込んだ位置, バイト列)"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        start = max(0, f.tell() - size)
+        f.seek(start)
+        return start, f.read()
+
+
+def read_last_json_record(path: str) -> Optional[Dict[str, any]]:
+    """
+    data.json形式のファイルの最後のレコードを読む（全体は解析しない）
+    
+    Returns:
+        dict | None: 最後のレコード（空・形式が想定と異なる場合はNone）
+    """
+    _, tail = _read_tail(path)
+    end = tail.rfind(b'}')
+    start = tail.rfind(b'{', 0, end)
+    if start < 0 or end < 0:
+        return None
+    try:
+        return json.loads(tail[start:end + 1])
+    except ValueError:
+        return None
+
+
+def append_json_records(path: str, records: List[Dict[str, any]], style: str = 'indent') -> bool:
+    """
+    data.json形式のファイルの末尾にレコードを追記する
+    
+    既存部分は解析・再シリアライズせずにバイト列のままコピーし、閉じ括弧の前に
+    新しいレコードを書き足したものを一時ファイル経由で置き換える。結果は
+    format_data_json で全件を書き出した場合と同じ内容になる。
+    
+    Args:
+        path: ファイルのパス
+        records: 追記するレコード（既存の最後のレコードより後の日付のもの）
+        style: format_data_json と同じ形式
+    
+    Returns:
+        bool: 追記できた場合True（空のリストなど末尾の形式が想定と異なる場合はFalse）
+    """
+    tail_start, tail = _read_tail(path)
+    close = tail.rfind(b']')
+    last = tail.rfind(b'}', 0, close) if close >= 0 else -1
+    if last < 0 or tail[last + 1:close].strip():
+        return False
+    
+    if style == 'indent':
+        items = ['\n'.join('  ' + line for line in json.dumps(item, ensure_ascii=False, indent=2).split('\n'))
+                 for item in records]
+        addition = ''.join(f',\n{item}' for item in items)
+    else:
+        addition = ''.join(f',\n    {json.dumps(item, ensure_ascii=False)}' for item in records)
+    suffix = addition.encode('utf-8') + tail[last + 1:]
+    
+    keep = tail_start + last + 1
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        remaining = keep
+        while remaining > 0:
+            chunk = src.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            dst.write(chunk)
+            remaining -= len(chunk)
+        dst.write(suffix)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, path)
+    return True
+
+
+# 予測結果の分割出力（最初の表示に必要な部分だけを latest_prediction.json に残す）
+# 分割したセクションは出力先の sections/ に「名前.ハッシュ.json」で保存する
+PREDICTION_SECTION_DIR = "sections"
+# 手法の結果のうち、概要（カード表示）に残す値の型（それ以外のリスト・辞書は method_details へ）
+_SUMMARY_VALUE_TYPES = (str, int, float, bool, type(None))
+
+
+def quantize_floats(value, digits: int):
+    """
+    浮動小数点数を有効数字digits桁に丸める（辞書・リストは再帰的に処理、NaN・無限大はそのまま）
+    
+    Args:
+        value: JSONに出力する値
+        digits: 有効数字の桁数
+    """
+    if isinstance(value, float):
+        return float(f"{value:.{digits}g}") if math.isfinite(value) else value
+    if isinstance(value, dict):
+        return {key: quantize_floats(item, digits) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [quantize_floats(item, digits) for item in value]
+    return value
+
+
+class PredictionWriter:
+    """
+    予測結果のJSON出力
+    
+    セクションごとに宣言した有効桁数に浮動小数点数を丸めて1回だけ（インデントなしで）
+    シリアライズし、同じバイト列をすべての出力先と、その .gz / .br（brotliがある場合）に書き込む。
+    セクションごとのサイズと時間を記録し、report() で表示する。
+    """
+    
+    # ★ セクションごとの浮動小数点数の有効桁数（位相は逆算の許容誤差1e-5に合わせる）
+    # 指定のないセクション（本体 'core' を含む）は DEFAULT_FLOAT_DIGITS
+    FLOAT_DIGITS = {
+        'phases': 5,
+    }
+    DEFAULT_FLOAT_DIGITS = 6
+    
+    def __init__(self):
+        """初期化"""
+        self.rows = []
+        try:
+            import brotli
+            self._brotli = brotli
+        except ImportError:
+            self._brotli = None
+    
+    def quantize(self, name: str, content):
+        """セクションの浮動小数点数を宣言した有効桁数に丸める"""
+        return quantize_floats(content, self.FLOAT_DIGITS.get(name, self.DEFAULT_FLOAT_DIGITS))
+    
+    def encode(self, name: str, content) -> bytes:
+        """
+        セクションをシリアライズする（浮動小数点数を丸め、インデントなし）
+        
+        Args:
+            name: セクション名（本体は 'core'）
+            content: セクションの内容
+        
+        Returns:
+            bytes: UTF-8のJSON
+        """
+        started = time.perf_counter()
+        data = json.dumps(self.quantize(name, content), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.rows.append({'name': name, 'bytes': len(data), 'gz': None, 'br': None,
+                          'encode': time.perf_counter() - started, 'write': 0.0, 'written': 0})
+        return data
+    
+    def write(self, name: str, data: bytes, paths: List[str], skip_existing: bool = False):
+        """
+        encodeしたバイト列を各出力先と圧縮版に書き込む
+        
+        Args:
+            name: セクション名（encodeと同じ）
+            data: encodeの結果
+            paths: 出力先のパス
+            skip_existing: 既にあるファイルは書き込まない（内容のハッシュをファイル名に含む場合）
+        """
+        started = time.perf_counter()
+        row = next((row for row in reversed(self.rows) if row['name'] == name), None)
+        compressed = {}
+        
+        for path in paths:
+            for suffix, compress in (('', None), ('.gz', self._gzip), ('.br', self._brotli_compress)):
+                if suffix == '.br' and self._brotli is None:
+                    continue
+                target = path + suffix
+                if skip_existing and os.path.exists(target):
+                    continue
+                if compress is not None and suffix not in compressed:
+                    compressed[suffix] = compress(data)
+                write_bytes_atomic(target, compressed[suffix] if compress is not None else data)
+                if row is not None:
+                    row['written'] += 1
+        
+        if row is not None:
+            row['gz'] = len(compressed['.gz']) if '.gz' in compressed else row['gz']
+            row['br'] = len(compressed['.br']) if '.br' in compressed else row['br']
+            row['write'] += time.perf_counter() - started
+    
+    @staticmethod
+    def _gzip(data: bytes) -> bytes:
+        # 内容が同じなら同じバイト列になるよう、ヘッダーの時刻は0にする
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    
+    def _brotli_compress(self, data: bytes) -> bytes:
+        return self._brotli.compress(data, quality=11)
+    
+    def report(self):
+        """セクションごとのサイズ（JSON / gzip / brotli）と時間を表示する"""
+        if self._brotli is None:
+            print("[PredictionWriter] brotliがインストールされていないため、.br は出力していません")
+        
+        def size(value):
+            return f"{value:,}" if value is not None else '-'
+        
+        print(f"[PredictionWriter] {'section':<22}{'json':>10}{'gz':>10}{'br':>10}{'encode':>9}{'write':>9}")
+        for row in self.rows:
+            note = '' if row['written'] else '  (変更なし)'
+            print(f"[PredictionWriter] {row['name']:<22}{size(row['bytes']):>10}{size(row['gz']):>10}{size(row['br']):>10}"
+                  f"{row['encode'] * 1000:>7.1f}ms{row['write'] * 1000:>7.1f}ms{note}")
+        total = sum(row['bytes'] for row in self.rows)
+        elapsed = sum(row['encode'] + row['write'] for row in self.rows)
+        print(f"[PredictionWriter] 合計 {len(self.rows)}件 {total:,} bytes、{elapsed * 1000:.1f}ms")
+
+
+def split_prediction(prediction: Dict[str, any]) -> Tuple[Dict[str, any], Dict[str, Tuple[str, any]]]:
+    """
+    予測結果を最初の表示に必要な本体と、詳細表示のときだけ読み込むセクションに分ける
+    
+    セクション:
+      phases: recent_phases
+      method_details: 各手法の結果のうちリスト・辞書の値（特徴量の重要度など）
+      advanced_analysisの各キー: 分析ごとの結果
+    
+    Args:
+        prediction: ensemble_predictの結果
+        
+    Returns:
+        (本体, {セクション名: (予測結果内の格納先, 内容)})
+        格納先は 'recent_phases' / 'methods'（手法ごとにマージ）/ 'advanced_analysis.キー'
+    """
+    core = {key: value for key, value in prediction.items() if key not in ('recent_phases', 'advanced_analysis')}
+    sections = {}
+    
+    if 'recent_phases' in prediction:
+        sections['phases'] = ('recent_phases', prediction['recent_phases'])
+    
+    methods = {}
+    details = {}
+    for key, result in prediction.get('methods', {}).items():
+        if not isinstance(result, dict):
+            methods[key] = result
+            continue
+        methods[key] = {k: v for k, v in result.items() if isinstance(v, _SUMMARY_VALUE_TYPES)}
+        detail = {k: v for k, v in result.items() if not isinstance(v, _SUMMARY_VALUE_TYPES)}
+        if detail:
+            details[key] = detail
+    if 'methods' in prediction:
+        core['methods'] = methods
+        sections['method_details'] = ('methods', details)
+    
+    for key, result in prediction.get('advanced_analysis', {}).items():
+        sections[key] = (f'advanced_analysis.{key}', result)
+    
+    return core, sections
+
+
+def write_prediction_sections(output_dir: str, sections: Dict[str, Tuple[str, any]],
+                              writer: Optional[PredictionWriter] = None) -> Dict[str, Dict[str, any]]:
+    """
+    セクションを内容のハッシュ付きのファイル名で保存し、マニフェストを返す
+    
+    同じ内容のファイルが既にある場合は書き込まない（履歴の各予測から同じファイルを
+    参照するため、古いセクションファイルも削除しない）。
+    
+    Args:
+        output_dir: 出力先ディレクトリ（latest_prediction.jsonと同じ場所）
+        sections: split_predictionのセクション
+        
+    Returns:
+        dict: {セクション名: {'file': 出力先からの相対パス, 'target': 格納先, 'sha256': ハッシュ, 'bytes': サイズ}}
+    """
+    section_dir = os.path.join(output_dir, PREDICTION_SECTION_DIR)
+    os.makedirs(section_dir, exist_ok=True)
+    
+    writer = writer or PredictionWriter()
+    manifest = {}
+    for name, (target, content) in sections.items():
+        data = writer.encode(name, content)
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{name}.{digest[:16]}.json"
+        writer.write(name, data, [os.path.join(section_dir, filename)], skip_existing=True)
+        manifest[name] = {
+            'file': f"{PREDICTION_SECTION_DIR}/{filename}",
+            'target': target,
+            'sha256': digest,
+            'bytes': len(data)
+        }
+    
+    return manifest
+
+
+# 各手法の結果のうち、予測内容ではなく実行時の状態を表す項目（内容ハッシュから除く）
+# model_update は同じデータでも1回目は 'new'、再実行では 'reused' になる
+RUN_STATE_METHOD_FIELDS = ('model_update',)
+
+
+def prediction_content_hash(core: Dict[str, any]) -> str:
+    """
+    予測結果の本体の内容のハッシュ（実行ごとに変わる実行日時・経過時間・モデルの更新方法は除く）
+    
+    セクションはマニフェストのハッシュで含まれるため、データ・結果が同じ再実行では同じ値になる。
+    """
+    content = {key: value for key, value in core.items() if key != 'timestamp'}
+    if isinstance(content.get('run_budget'), dict):
+        content['run_budget'] = {key: value for key, value in content['run_budget'].items() if key != 'elapsed'}
+    if isinstance(content.get('methods'), dict):
+        content['methods'] = {
+            name: ({key: value for key, value in method.items() if key not in RUN_STATE_METHOD_FIELDS}
+                   if isinstance(method, dict) else method)
+            for name, method in content['methods'].items()
+        }
+    data = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class PredictionHistoryIndex:
+    """
+    予測履歴の追記専用インデックス
+    
+    history_dir/prediction_history.jsonl に1行1エントリ（古い順）で追記し、画面表示用に
+    history_dir/prediction_history_summary.json（直近PAGE_SIZE件、新しい順）と
+    history_dir/history_pages/{k}.json（k番目のPAGE_SIZE件、古い順。埋まったページのみ）を保存する。
+    追記時に読み書きするのは要約ファイルと埋まったページ1つだけなので、件数によらずコストは一定。
+    """
+    
+    INDEX_FILE = "prediction_history.jsonl"
+    SUMMARY_FILE = "prediction_history_summary.json"
+    PAGE_DIR = "history_pages"
+    # 従来形式の履歴リスト（全件を新しい順に並べたJSON配列。最初の追記時に移行する）
+    LEGACY_FILE = "prediction_history.json"
+    # ★ 1ページの件数（画面の初期表示・追加読み込みの単位。変更する場合はrebuildが必要）
+    PAGE_SIZE = 50
+    
+    def __init__(self, history_dir: str):
+        """
+        初期化
+        
+        Args:
+            history_dir: 予測履歴のディレクトリ（latest_prediction.jsonと同じ場所）
+        """
+        self.history_dir = history_dir
+        self.index_file = os.path.join(history_dir, self.INDEX_FILE)
+        self.summary_file = os.path.join(history_dir, self.SUMMARY_FILE)
+        self.page_dir = os.path.join(history_dir, self.PAGE_DIR)
+        self.legacy_file = os.path.join(history_dir, self.LEGACY_FILE)
+    
+    def summary(self) -> Dict[str, any]:
+        """
+        要約（件数と直近PAGE_SIZE件）を読む（読み込みのみで移行・修復はしない）
+        
+        Returns:
+            dict: {'total', 'page_size', 'pages', 'index_bytes', 'recent'（新しい順）}
+        """
+        if os.path.exists(self.summary_file):
+            try:
+                with open(self.summary_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except ValueError:
+                print(f"[PredictionHistoryIndex] {self.summary_file} を読み込めません")
+        return {'total': 0, 'page_size': self.PAGE_SIZE, 'pages': 0, 'index_bytes': 0, 'recent': []}
+    
+    def load(self) -> Dict[str, any]:
+        """追記・書き換えの前に要約を読む（従来形式の移行と、中断された追記の切り捨てを行う）"""
+        if not os.path.exists(self.summary_file):
+            if os.path.exists(self.legacy_file):
+                self.migrate_legacy()
+            elif os.path.exists(self.index_file):
+                self.rebuild(self.entries())
+        summary = self.summary()
+        if summary.get('page_size') != self.PAGE_SIZE or (summary['total'] > 0 and not os.path.exists(self.index_file)):
+            print("[PredictionHistoryIndex] 要約がインデックスと一致しないため再構築します")
+            self.rebuild(self.entries())
+            return self.summary()
+        
+        # 要約に反映される前に中断された追記の行を切り捨てる
+        if os.path.exists(self.index_file) and os.path.getsize(self.index_file) != summary['index_bytes']:
+            with open(self.index_file, 'r+b') as f:
+                f.truncate(summary['index_bytes'])
+        return summary
+    
+    def latest(self) -> Optional[Dict[str, any]]:
+        """
+        最新のエントリ（従来形式の履歴リストがあれば先に移行する）
+        
+        Returns:
+            dict | None: 最新のエントリ（履歴がない場合はNone）
+        """
+        recent = self.load()['recent']
+        return recent[0] if recent else None
+    
+    def append(self, entry: Dict[str, any]) -> Dict[str, any]:
+        """
+        エントリを追記する（既存のエントリより新しいもの）
+        
+        Args:
+            entry: 履歴エントリ（file, timestamp, sha256など）
+        
+        Returns:
+            dict: 通し番号（seq）を付けたエントリと、追記後の件数を含む要約
+        """
+        summary = self.load()
+        entry = dict(entry, seq=summary['total'])
+        
+        os.makedirs(self.history_dir, exist_ok=True)
+        with open(self.index_file, 'ab') as f:
+            f.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        
+        summary['total'] += 1
+        summary['index_bytes'] = os.path.getsize(self.index_file)
+        summary['recent'] = [entry] + summary['recent'][:self.PAGE_SIZE - 1]
+        if summary['total'] % self.PAGE_SIZE == 0:
+            # 直近PAGE_SIZE件でちょうど1ページが埋まったので、ページファイルとして確定する
+            self._write_page(summary['total'] // self.PAGE_SIZE - 1, summary['recent'][::-1])
+            summary['pages'] = summary['total'] // self.PAGE_SIZE
+        self._write_summary(summary)
+        return summary
+    
+    def entries(self) -> List[Dict[str, any]]:
+        """全エントリを古い順に読む（移行・書き換え用。通常の追記では使わない）"""
+        if not os.path.exists(self.index_file):
+            return []
+        entries = []
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(f"[PredictionHistoryIndex] 読み込めない行を無視します: {line[:80]}")
+        return entries
+    
+    def rebuild(self, entries: List[Dict[str, any]]):
+        """
+        全エントリからインデックス・ページ・要約を書き直す
+        
+        Args:
+            entries: 履歴エントリ（タイムスタンプの古い順に並べ直し、通し番号を付け直す）
+        """
+        entries = sorted(entries, key=lambda entry: entry.get('timestamp', ''))
+        entries = [dict(entry, seq=seq) for seq, entry in enumerate(entries)]
+        
+        os.makedirs(self.history_dir, exist_ok=True)
+        write_text_atomic(self.index_file, ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+        
+        pages = len(entries) // self.PAGE_SIZE
+        for k in range(pages):
+            self._write_page(k, entries[k * self.PAGE_SIZE:(k + 1) * self.PAGE_SIZE])
+        self._write_summary({
+            'total': len(entries),
+            'page_size': self.PAGE_SIZE,
+            'pages': pages,
+            'index_bytes': os.path.getsize(self.index_file),
+            'recent': entries[::-1][:self.PAGE_SIZE]
+        })
+    
+    def migrate_legacy(self):
+        """従来形式の履歴リスト（prediction_history.json）をインデックスに移行して削除する"""
+        with open(self.legacy_file, 'r', encoding='utf-8') as f:
+            history_list = json.load(f)
+        self.rebuild(history_list)
+        os.remove(self.legacy_file)
+        print(f"[PredictionHistoryIndex] {self.legacy_file} の {len(history_list)}件を {self.index_file} に移行しました")
+    
+    def _write_page(self, k: int, entries: List[Dict[str, any]]):
+        """k番目のページ（PAGE_SIZE件、古い順）を書き込む"""
+        os.makedirs(self.page_dir, exist_ok=True)
+        write_text_atomic(os.path.join(self.page_dir, f"{k}.json"),
+                          json.dumps(entries, ensure_ascii=False, separators=(',', ':')))
+    
+    def _write_summary(self, summary: Dict[str, any]):
+        """要約を書き込む（画面が最初に読み込むため、インデントなしで小さく保つ）"""
+        write_text_atomic(self.summary_file, json.dumps(summary, ensure_ascii=False, separators=(',', ':')))
+
+
+def compact_prediction_history(history_dir: str) -> int:
+    """
+    従来形式（全体を1ファイルに保存）の予測履歴を、本体とセクションに分けた形式に書き換える
+    
+    セクションは内容のハッシュで共有されるため、同じデータに対する履歴の位相・分析結果は1つだけ保存される。
+    
+    Args:
+        history_dir: 予測履歴のディレクトリ（PredictionHistoryIndexの保存先）
+        
+    Returns:
+        int: 書き換えたファイル数
+    """
+    history = PredictionHistoryIndex(history_dir)
+    history.load()
+    history_list = history.entries()
+    
+    writer = PredictionWriter()
+    compacted = 0
+    for entry in history_list:
+        path = os.path.join(history_dir, entry.get('file', ''))
+        if not entry.get('file') or not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            prediction = json.load(f)
+        if 'sections' not in prediction:
+            before = os.path.getsize(path)
+            core, sections = split_prediction(prediction)
+            core['sections'] = write_prediction_sections(history_dir, sections, writer)
+            core = writer.quantize('core', core)
+            writer.write('core', writer.encode('core', core), [path])
+            print(f"[compact_prediction_history] {entry['file']}: {before:,} → {os.path.getsize(path):,} bytes")
+            compacted += 1
+            prediction = core
+        entry['sha256'] = prediction_content_hash(prediction)
+    
+    history.rebuild(history_list)
+    writer.report()
+    return compacted
+
+
+def invert_phases(time_indices, targets, bounds: Tuple[float, float] = (0.0, 6.28),
+                  xatol: float = 1e-5, maxiter: int = 500) -> np.ndarray:
+    """
+    位相をまとめて逆算する（floor(5*sin(0.5*t+phase)+5) % 10 == target）
+    
+    scipy.optimize.minimize_scalar(method='bounded') と同じ反復（Brent法）を
+    全ての (t, target) の組に対してNumPyで同時に進めるため、結果は従来の
+    1件ずつの最適化と完全に一致する。
+    
+    Args:
+        time_indices: 時間インデックスの配列
+        targets: 各時間インデックスの数字（0-9）の配列
+        bounds: 位相の探索範囲
+        xatol: 収束判定の許容誤差
+        maxiter: 最大評価回数
+    
+    Returns:
+        np.ndarray: 各組の位相（入力と同じ長さの1次元配列）
+    """
+    t = np.asarray(time_indices, dtype=np.float64).ravel()
+    target = np.asarray(targets, dtype=np.int64).ravel()
+    n = t.shape[0]
+    
+    def error_func(phase, idx):
+        prediction = np.floor(5 * np.sin(0.5 * t[idx] + phase) + 5).astype(np.int64) % 10
+        return np.abs(target[idx] - prediction).astype(np.float64)
+    
+    sqrt_eps = np.sqrt(2.2e-16)
+    golden_mean = 0.5 * (3.0 - np.sqrt(5.0))
+    a = np.full(n, float(bounds[0]))
+    b = np.full(n, float(bounds[1]))
+    xf = a + golden_mean * (b - a)
+    nfc = xf.copy()
+    fulc = xf.copy()
+    rat = np.zeros(n)
+    e = np.zeros(n)
+    fx = error_func(xf, np.arange(n))
+    fnfc = fx.copy()
+    ffulc = fx.copy()
+    xm = 0.5 * (a + b)
+    tol1 = sqrt_eps * np.abs(xf) + xatol / 3.0
+    tol2 = 2.0 * tol1
+    num = 1
+    
+    # 収束していない組だけを更新する
+    active = np.abs(xf - xm) > (tol2 - 0.5 * (b - a))
+    while active.any():
+        i = np.flatnonzero(active)
+        xf_i, xm_i, a_i, b_i = xf[i], xm[i], a[i], b[i]
+        fx_i, nfc_i, fnfc_i, fulc_i, ffulc_i = fx[i], nfc[i], fnfc[i], fulc[i], ffulc[i]
+        tol1_i, tol2_i = tol1[i], tol2[i]
+        e_i, rat_i = e[i], rat[i]
+        
+        # 放物線補間が可能か判定
+        parabolic = np.abs(e_i) > tol1_i
+        r = (xf_i - nfc_i) * (fx_i - ffulc_i)
+        q = (xf_i - fulc_i) * (fx_i - fnfc_i)
+        p = (xf_i - fulc_i) * q - (xf_i - nfc_i) * r
+        q = 2.0 * (q - r)
+        p = np.where(q > 0.0, -p, p)
+        q = np.abs(q)
+        accept = (parabolic & (np.abs(p) < np.abs(0.5 * q * e_i))
+                  & (p > q * (a_i - xf_i)) & (p < q * (b_i - xf_i)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rat_parabolic = (p + 0.0) / q
+        x_parabolic = xf_i + rat_parabolic
+        near_bound = ((x_parabolic - a_i) < tol2_i) | ((b_i - x_parabolic) < tol2_i)
+        si = np.sign(xm_i - xf_i) + ((xm_i - xf_i) == 0)
+        rat_parabolic = np.where(near_bound, tol1_i * si, rat_parabolic)
+        
+        # 放物線が採用されなければ黄金分割
+        e_golden = np.where(xf_i >= xm_i, a_i - xf_i, b_i - xf_i)
+        e_i = np.where(accept, rat_i, e_golden)
+        rat_i = np.where(accept, rat_parabolic, golden_mean * e_golden)
+        
+        si = np.sign(rat_i) + (rat_i == 0)
+        x = xf_i + si * np.maximum(np.abs(rat_i), tol1_i)
+        fu = error_func(x, i)
+        num += 1
+        
+        # 区間と3点（xf, nfc, fulc）を更新
+        improved = fu <= fx_i
+        shift_nfc = ~improved & ((fu <= fnfc_i) | (nfc_i == xf_i))
+        shift_fulc = (~improved & ~shift_nfc
+                      & ((fu <= ffulc_i) | (fulc_i == xf_i) | (fulc_i == nfc_i)))
+        a_i = np.where(improved, np.where(x >= xf_i, xf_i, a_i), np.where(x < xf_i, x, a_i))
+        b_i = np.where(improved, np.where(x >= xf_i, b_i, xf_i), np.where(x < xf_i, b_i, x))
+        fulc[i] = np.where(improved | shift_nfc, nfc_i, np.where(shift_fulc, x, fulc_i))
+        ffulc[i] = np.where(improved | shift_nfc, fnfc_i, np.where(shift_fulc, fu, ffulc_i))
+        nfc[i] = np.where(improved, xf_i, np.where(shift_nfc, x, nfc_i))
+        fnfc[i] = np.where(improved, fx_i, np.where(shift_nfc, fu, fnfc_i))
+        xf[i] = np.where(improved, x, xf_i)
+        fx[i] = np.where(improved, fu, fx_i)
+        a[i], b[i], e[i], rat[i] = a_i, b_i, e_i, rat_i
+        xm[i] = 0.5 * (a_i + b_i)
+        tol1[i] = sqrt_eps * np.abs(xf[i]) + xatol / 3.0
+        tol2[i] = 2.0 * tol1[i]
+        
+        if num >= maxiter:
+            break
+        active[i] = np.abs(xf[i] - xm[i]) > (tol2[i] - 0.5 * (b_i - a_i))
+    
+    return xf
+
+
+class DrawStore:
+    """
+    抽せんインデックスごとの行を追記していくディスク上の配列
+    
+    cache_dir/{name}.f64 に float64 の行を追記し、cache_dir/{name}.json に
+    保存済み件数とその範囲の履歴ハッシュ（と任意の付加情報）を記録する。
+    読み込みはメモリマップで行う。
+    """
+    
+    def __init__(self, cache_dir: str, name: str, n_columns: int):
+        """
+        初期化
+        
+        Args:
+            cache_dir: 保存先ディレクトリ
+            name: ストア名（ファイル名に使用）
+            n_columns: 1行あたりの列数
+        """
+        self.cache_dir = cache_dir
+        self.name = name
+        self.n_columns = n_columns
+        self.data_file = os.path.join(cache_dir, f"{name}.f64")
+        self.meta_file = os.path.join(cache_dir, f"{name}.json")
+        self.row_bytes = n_columns * np.dtype(np.float64).itemsize
+    
+    def load_meta(self, history_hash: Callable[[int], str], n: int) -> Tuple[int, Dict[str, any]]:
+        """
+        再利用できる保存済み行数を調べる
+        
+        Args:
+            history_hash: 先頭k件の履歴ハッシュを返す関数
+            n: 現在の抽せん件数
+        
+        Returns:
+            tuple: (再利用できる行数, メタ情報)。再利用できない場合は (0, {})
+        """
+        if not (os.path.exists(self.data_file) and os.path.exists(self.meta_file)):
+            return 0, {}
+        
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except ValueError:
+            print(f"[DrawStore] {self.meta_file} を読み込めないため {self.name} を再構築します")
+            return 0, {}
+        count = int(meta.get('count', 0))
+        if (meta.get('n_columns') == self.n_columns and count <= n
+                and os.path.getsize(self.data_file) >= count * self.row_bytes
+                and meta.get('history_hash') == history_hash(count)):
+            return count, meta
+        
+        print(f"[DrawStore] 履歴が変更されたため {self.name} を再構築します")
+        return 0, {}
+    
+    def write(self, start: int, rows: np.ndarray, history_hash: str, **extra):
+        """
+        start行目以降を書き込む（それより後ろの既存行は切り捨てる）
+        
+        Args:
+            start: 書き込み開始行
+            rows: 書き込む行（shape (k, n_columns)）
+            history_hash: 書き込み後の全件の履歴ハッシュ
+            **extra: メタ情報に追加で保存する値
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.data_file, 'r+b' if start > 0 else 'wb') as f:
+            # 中断された追記の残りを切り捨ててから追記
+            f.truncate(start * self.row_bytes)
+            f.seek(start * self.row_bytes)
+            f.write(np.ascontiguousarray(rows, dtype=np.float64).tobytes())
+        
+        meta = {'count': start + len(rows), 'n_columns': self.n_columns, 'history_hash': history_hash}
+        meta.update(extra)
+        tmp_file = self.meta_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, self.meta_file)
+    
+    def read(self, n: int) -> np.ndarray:
+        """
+        先頭n行を読み取り専用のメモリマップで返す
+        
+        Args:
+            n: 行数
+        """
+        return np.memmap(self.data_file, dtype=np.float64, mode='r', shape=(n, self.n_columns))
+
+
+class ModelStore:
+    """
+    学習済みモデルの保存先（実行間で継続学習するため）
+    
+    cache_dir/models/{name}/{version}/ に model.pkl（またはpath()で指定したファイル）と
+    meta.json を保存する。
+    version は特徴量の構成とハイパーパラメータから求めたハッシュで、
+    どちらかが変わると別のディレクトリになる（＝最初から学習し直す）。
+    meta.json には学習に使った抽せん件数とその範囲の履歴ハッシュを記録する。
+    """
+    
+    def __init__(self, cache_dir: str, name: str, schema: Dict[str, any]):
+        """
+        初期化
+        
+        Args:
+            cache_dir: キャッシュディレクトリ
+            name: モデル名（ディレクトリ名に使用）
+            schema: 特徴量名・ハイパーパラメータなど、変わったら再学習が必要な値
+        """
+        self.name = name
+        self.version = hashlib.sha256(json.dumps(schema, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        self.directory = os.path.join(cache_dir, "models", name, self.version)
+        self.model_file = os.path.join(self.directory, "model.pkl")
+        self.meta_file = os.path.join(self.directory, "meta.json")
+    
+    def path(self, filename: str) -> str:
+        """バージョンディレクトリ内のファイルパスを返す（pickle以外の形式で保存するモデル用）"""
+        return os.path.join(self.directory, filename)
+    
+    def load_meta(self, history_hash: Callable[[int], str], n: int, max_age_days: float) -> Dict[str, any]:
+        """
+        継続学習に使えるかを調べてメタ情報を返す
+        
+        Args:
+            history_hash: 先頭k件の履歴ハッシュを返す関数
+            n: 現在の抽せん件数
+            max_age_days: 最初から学習してからの最大日数（超えたら使わない）
+        
+        Returns:
+            dict: メタ情報。使えない場合は {}
+        """
+        if not os.path.exists(self.meta_file):
+            return {}
+        
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except ValueError:
+            print(f"[ModelStore] {self.meta_file} を読み込めないため {self.name} を学習し直します")
+            return {}
+        count = int(meta.get('count', 0))
+        age_days = (time.time() - float(meta.get('created_at', 0))) / 86400
+        if age_days > max_age_days:
+            print(f"[ModelStore] {self.name} の作成から{age_days:.0f}日経過したため学習し直します")
+            return {}
+        if count > n or meta.get('history_hash') != history_hash(count):
+            print(f"[ModelStore] 履歴が変更されたため {self.name} を学習し直します")
+            return {}
+        return meta
+    
+    def save_meta(self, meta: Dict[str, any]):
+        """
+        メタ情報を保存する（モデル本体を書き終えてから呼ぶ）
+        
+        Args:
+            meta: メタ情報（count, history_hash, created_at など）
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # 並列実行中の他プロセスと一時ファイルが衝突しないようにPIDを付ける
+        tmp_file = f"{self.meta_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, self.meta_file)
+    
+    def load(self, history_hash: Callable[[int], str], n: int, max_age_days: float) -> Tuple[any, Dict[str, any]]:
+        """
+        継続学習に使える保存済みモデル（pickle）を読み込む
+        
+        Args:
+            history_hash: 先頭k件の履歴ハッシュを返す関数
+            n: 現在の抽せん件数
+            max_age_days: 最初から学習してからの最大日数（超えたら使わない）
+        
+        Returns:
+            tuple: (モデル, メタ情報)。使えない場合は (None, {})
+        """
+        import pickle
+        
+        meta = self.load_meta(history_hash, n, max_age_days)
+        if not meta or not os.path.exists(self.model_file):
+            return None, {}
+        
+        try:
+            with open(self.model_file, 'rb') as f:
+                return pickle.load(f), meta
+        except Exception as e:
+            print(f"[ModelStore] {self.name} を読み込めないため学習し直します: {e}")
+            return None, {}
+    
+    def save(self, model: any, meta: Dict[str, any]):
+        """
+        モデル（pickle）とメタ情報を保存する（一時ファイル経由で置き換え）
+        
+        Args:
+            model: 学習済みモデル
+            meta: メタ情報（count, history_hash, created_at など）
+        """
+        import pickle
+        
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_file = f"{self.model_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.model_file)
+        self.save_meta(meta)
+
+
+class HistoryStore:
+    """
+    抽せん履歴の列形式バイナリ（data.jsonから生成するキャッシュ）
+    
+    cache_dir/history/ に日付順に並べた以下の列を固定長のバイナリとして保存し、
+    メモリマップで読み込む（コピーしない）。
+      digits.bin: int8 (n, 3) 百・十・一の各桁
+      date.bin:   int32 (n,) 1970-01-01からの日数
+      issue.bin:  int32 (n,) 回号（不明な場合は-1）
+    meta.json に件数とdata.jsonの内容のハッシュを記録し、ハッシュが変わった場合だけ
+    作り直す。新しい抽せんは各列の末尾に追記する（件数はmeta.jsonの置き換えで確定）。
+    data.jsonのハッシュはHASH_BLOCK_SIZEごとのブロックのハッシュをまとめたもので、追記時は
+    書き換わった末尾のブロックだけ計算し直す（追記のたびに全体を読み直さない）。
+    公開用の正本は引き続きdata.jsonで、このストアはいつ削除しても再生成できる。
+    """
+    
+    # 列名: (型, 1行あたりの要素数)
+    COLUMNS = {
+        'digits': (np.int8, 3),
+        'date': (np.int32, 1),
+        'issue': (np.int32, 1)
+    }
+    
+    # data.jsonのハッシュを計算するブロックの大きさ
+    HASH_BLOCK_SIZE = 1 << 20
+    # 追記で書き換わりうるdata.jsonの末尾の範囲（閉じ括弧の前に追記するため、それより前は変わらない）
+    HASH_TAIL_SLACK = 1 << 12
+    
+    def __init__(self, cache_dir: str):
+        """
+        初期化
+        
+        Args:
+            cache_dir: キャッシュディレクトリ
+        """
+        self.directory = os.path.join(cache_dir, "history")
+        self.meta_file = os.path.join(self.directory, "meta.json")
+    
+    def column_file(self, column: str) -> str:
+        """列ファイルのパスを返す"""
+        return os.path.join(self.directory, f"{column}.bin")
+    
+    @classmethod
+    def block_hashes(cls, path: str, start: int = 0, previous: List[str] = ()) -> List[str]:
+        """
+        ファイルをHASH_BLOCK_SIZEごとに区切った各ブロックのSHA-256を返す
+        
+        Args:
+            path: ファイルのパス
+            start: 変わっている可能性がある最初のバイト位置（それより前のブロックはpreviousを使う）
+            previous: 以前のblock_hashesの結果
+        """
+        first = start // cls.HASH_BLOCK_SIZE
+        if len(previous) < first:
+            first = 0
+        hashes = list(previous[:first])
+        with open(path, 'rb') as f:
+            f.seek(first * cls.HASH_BLOCK_SIZE)
+            for chunk in iter(lambda: f.read(cls.HASH_BLOCK_SIZE), b''):
+                hashes.append(hashlib.sha256(chunk).hexdigest())
+        return hashes
+    
+    @staticmethod
+    def content_hash(blocks: List[str]) -> str:
+        """ブロックごとのハッシュをまとめた、ファイル内容のハッシュを返す"""
+        return hashlib.sha256(''.join(blocks).encode('ascii')).hexdigest()
+    
+    @staticmethod
+    def from_records(records: List[Dict[str, any]]) -> Dict[str, np.ndarray]:
+        """
+        data.json形式のレコードから列を作成する（日付順に並べ替える）
+        
+        Args:
+            records: [{"date": "YYYY-MM-DD", "num": "123", "issue": "6625"（任意）}, ...]
+        
+        Returns:
+            dict: {'digits', 'date', 'issue'} の配列
+        """
+        n = len(records)
+        nums = np.fromiter((int(item['num']) for item in records), dtype=np.int32, count=n)
+        dates = np.array([item['date'] for item in records], dtype='datetime64[D]').astype(np.int32)
+        issues = np.fromiter((int(item.get('issue', -1)) for item in records), dtype=np.int32, count=n)
+        
+        order = np.argsort(dates, kind='stable')
+        nums = nums[order]
+        digits = np.stack([nums // 100, nums // 10 % 10, nums % 10], axis=1).astype(np.int8)
+        return {'digits': digits, 'date': dates[order], 'issue': issues[order]}
+    
+    def read(self, count: int) -> Dict[str, np.ndarray]:
+        """
+        先頭count行の列を読み取り専用のメモリマップで返す
+        
+        Args:
+            count: 行数
+        """
+        columns = {}
+        for column, (dtype, width) in self.COLUMNS.items():
+            shape = (count, width) if width > 1 else (count,)
+            if count == 0:
+                columns[column] = np.empty(shape, dtype=dtype)
+            else:
+                columns[column] = np.memmap(self.column_file(column), dtype=dtype, mode='r', shape=shape)
+        return columns
+    
+    def load(self, json_path: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        保存済みの列をメモリマップで読み込む
+        
+        ファイルサイズと更新時刻がメタ情報と一致すればハッシュ計算も省略する。
+        
+        Args:
+            json_path: data.jsonのパス
+        
+        Returns:
+            dict | None: 列の辞書（data.jsonが変わっている・ストアがない場合はNone）
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        
+        count = int(meta.get('count', 0))
+        for column, (dtype, width) in self.COLUMNS.items():
+            path = self.column_file(column)
+            if not os.path.exists(path) or os.path.getsize(path) < count * width * np.dtype(dtype).itemsize:
+                return None
+        
+        stat = os.stat(json_path)
+        if (meta.get('json_size'), meta.get('json_mtime_ns')) != (stat.st_size, stat.st_mtime_ns):
+            if meta.get('json_sha256') != self.content_hash(self.block_hashes(json_path)):
+                return None
+            # 内容は同じ（チェックアウトし直しなど）なので、次回のためにサイズ・時刻だけ更新
+            meta.update({'json_size': stat.st_size, 'json_mtime_ns': stat.st_mtime_ns})
+            self._write_meta(meta)
+        
+        return self.read(count)
+    
+    def build(self, json_path: str) -> Dict[str, np.ndarray]:
+        """
+        data.jsonから列を作成して保存する
+        
+        Args:
+            json_path: data.jsonのパス
+        
+        Returns:
+            dict: 列の辞書
+        """
+        stat = os.stat(json_path)
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+        columns = self.from_records(json.loads(raw))
+        blocks = [hashlib.sha256(raw[i:i + self.HASH_BLOCK_SIZE]).hexdigest()
+                  for i in range(0, len(raw), self.HASH_BLOCK_SIZE)]
+        self._write_rows(0, columns)
+        self._write_meta({
+            'count': len(columns['date']),
+            'json_sha256': self.content_hash(blocks),
+            'json_blocks': blocks,
+            'json_size': stat.st_size,
+            'json_mtime_ns': stat.st_mtime_ns
+        })
+        return self.read(len(columns['date']))
+    
+    def append(self, json_path: str, start: int, rows: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        start行目以降に新しい行を追記する（data.jsonへの追記が済んでから呼ぶ）
+        
+        data.jsonのハッシュは、追記前のサイズからHASH_TAIL_SLACKを引いた位置以降のブロックだけ計算し直す。
+        
+        Args:
+            json_path: 追記後のdata.jsonのパス（ハッシュを記録する）
+            start: 追記前の行数
+            rows: 追記する行（from_recordsと同じ形式）
+        
+        Returns:
+            dict: 追記後の全件の列
+        """
+        stat = os.stat(json_path)
+        previous = self._read_meta() or {}
+        blocks = self.block_hashes(json_path, max(0, int(previous.get('json_size', 0)) - self.HASH_TAIL_SLACK),
+                                   previous.get('json_blocks', []))
+        self._write_rows(start, rows)
+        count = start + len(rows['date'])
+        self._write_meta({
+            'count': count,
+            'json_sha256': self.content_hash(blocks),
+            'json_blocks': blocks,
+            'json_size': stat.st_size,
+            'json_mtime_ns': stat.st_mtime_ns
+        })
+        return self.read(count)
+    
+    def _write_rows(self, start: int, rows: Dict[str, np.ndarray]):
+        os.makedirs(self.directory, exist_ok=True)
+        for column, (dtype, width) in self.COLUMNS.items():
+            path = self.column_file(column)
+            data = np.ascontiguousarray(rows[column], dtype=dtype).tobytes()
+            if start == 0:
+                # 作り直す場合は別ファイルに書いて置き換える（読み込み中のメモリマップを壊さない）
+                tmp_file = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_file, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_file, path)
+                continue
+            row_bytes = width * np.dtype(dtype).itemsize
+            with open(path, 'r+b') as f:
+                # 中断された追記の残りを切り捨ててから追記
+                f.truncate(start * row_bytes)
+                f.seek(start * row_bytes)
+                f.write(data)
+    
+    def _read_meta(self) -> Optional[Dict[str, any]]:
+        if not os.path.exists(self.meta_file):
+            return None
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError:
+            return None
+    
+    def _write_meta(self, meta: Dict[str, any]):
+        tmp_file = f"{self.meta_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, self.meta_file)
+
+
+class PredictionLedger:
+    """
+    予測の台帳（1回の実行の1手法につき1行、列形式のバイナリ）
+    
+    cache_dir/ledger/ に以下の列を固定長のバイナリとして追記し、メモリマップで読み込む。
+      run.bin:        int32 予測対象の抽せんインデックス（予測時点の抽せん件数）
+      time.bin:       int64 予測した日時（UNIX秒）
+      method.bin:     int16 手法（meta.jsonのmethodsの位置）
+      set.bin:        int16 ストレートの予測（0-999、予測がない場合は-1）
+      mini.bin:       int16 ミニの予測（0-99、予測がない場合は-1）
+      confidence.bin: float32 手法が出力した信頼度
+      actual.bin:     int16 実際の当せん番号（未確定の場合は-1）
+    meta.json に件数・手法名・当せん番号が確定済みの先頭行数を記録する（件数はmeta.jsonの置き換えで確定）。
+    予測履歴から作り直せるため、このストアはいつ削除してもよい。
+    """
+    
+    # 列名: 型
+    COLUMNS = {
+        'run': np.int32,
+        'time': np.int64,
+        'method': np.int16,
+        'set': np.int16,
+        'mini': np.int16,
+        'confidence': np.float32,
+        'actual': np.int16
+    }
+    
+    def __init__(self, cache_dir: str):
+        """
+        初期化
+        
+        Args:
+            cache_dir: キャッシュディレクトリ
+        """
+        self.directory = os.path.join(cache_dir, "ledger")
+        self.meta_file = os.path.join(self.directory, "meta.json")
+        self.meta = {'count': 0, 'resolved': 0, 'methods': []}
+        self.columns = self._empty_columns()
+    
+    def column_file(self, column: str) -> str:
+        """列ファイルのパスを返す"""
+        return os.path.join(self.directory, f"{column}.bin")
+    
+    def exists(self) -> bool:
+        """保存済みの台帳があるか"""
+        return os.path.exists(self.meta_file)
+    
+    def _empty_columns(self) -> Dict[str, np.ndarray]:
+        return {column: np.empty(0, dtype=dtype) for column, dtype in self.COLUMNS.items()}
+    
+    def load(self) -> Dict[str, np.ndarray]:
+        """
+        保存済みの列をメモリマップで読み込む（台帳がない・壊れている場合は空）
+        
+        Returns:
+            dict: 列の辞書（self.columnsにも保持する）
+        """
+        self.meta = {'count': 0, 'resolved': 0, 'methods': []}
+        self.columns = self._empty_columns()
+        if not self.exists():
+            return self.columns
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except ValueError:
+            print(f"[PredictionLedger] {self.meta_file} を読み込めないため、台帳を空として扱います")
+            return self.columns
+        
+        count = int(meta.get('count', 0))
+        for column, dtype in self.COLUMNS.items():
+            path = self.column_file(column)
+            if not os.path.exists(path) or os.path.getsize(path) < count * np.dtype(dtype).itemsize:
+                print(f"[PredictionLedger] {path} が不完全なため、台帳を空として扱います")
+                return self.columns
+        
+        self.meta = meta
+        if count > 0:
+            # actualは当せん番号の確定時にその場で書き換えるため、読み書き可能で開く
+            self.columns = {column: np.memmap(self.column_file(column), dtype=dtype,
+                                              mode='r+' if column == 'actual' else 'r', shape=(count,))
+                            for column, dtype in self.COLUMNS.items()}
+        return self.columns
+    
+    def append(self, run: int, timestamp: float, methods: Dict[str, Dict[str, any]]):
+        """
+        1回の実行の各手法の予測を追記する
+        
+        同じ抽せん（run）以降を対象にした行が既にある場合（同じデータでの再実行など）は、
+        それらを切り捨ててから追記し、1回の抽せんの1手法につき1行に保つ。
+        
+        Args:
+            run: 予測対象の抽せんインデックス（予測時点の抽せん件数）
+            timestamp: 予測した日時（UNIX秒）
+            methods: {手法のキー: 予測結果（set_prediction, mini_prediction, confidence）}
+        """
+        names = list(self.meta['methods'])
+        rows = {column: [] for column in self.COLUMNS}
+        for key, result in methods.items():
+            if not isinstance(result, dict):
+                continue
+            if key not in names:
+                names.append(key)
+            rows['run'].append(run)
+            rows['time'].append(int(timestamp))
+            rows['method'].append(names.index(key))
+            rows['set'].append(self._parse_number(result.get('set_prediction'), 1000))
+            rows['mini'].append(self._parse_number(result.get('mini_prediction'), 100))
+            rows['confidence'].append(float(result.get('confidence') or 0.0))
+            rows['actual'].append(-1)
+        if not rows['run']:
+            return
+        
+        # 行は予測対象の抽せんの順に並んでいるため、同じ抽せん以降の行は末尾にまとまっている
+        start = int(np.searchsorted(self.columns['run'][:self.meta['count']], run, side='left'))
+        resolved = min(int(self.meta.get('resolved', 0)), start)
+        self.columns = self._empty_columns()  # 切り詰める前にメモリマップを手放す
+        os.makedirs(self.directory, exist_ok=True)
+        for column, dtype in self.COLUMNS.items():
+            with open(self.column_file(column), 'ab') as f:
+                # 置き換える行と中断された追記の残りを切り捨ててから追記
+                f.truncate(start * np.dtype(dtype).itemsize)
+                f.write(np.asarray(rows[column], dtype=dtype).tobytes())
+        self._write_meta(dict(self.meta, count=start + len(rows['run']), resolved=resolved, methods=names))
+        self.load()
+    
+    def resolve(self, numbers: np.ndarray) -> int:
+        """
+        結果が出た予測の当せん番号を記録する
+        
+        行は予測対象の抽せんの順に追記されるため、未確定の行は末尾にまとまっている。
+        
+        Args:
+            numbers: 抽せん履歴の当せん番号（0-999、日付順）
+        
+        Returns:
+            int: 新しく確定した行数
+        """
+        resolved = int(self.meta.get('resolved', 0))
+        run = self.columns['run']
+        end = resolved + int(np.searchsorted(run[resolved:], len(numbers), side='left'))
+        if end <= resolved:
+            return 0
+        actual = self.columns['actual']
+        actual[resolved:end] = np.asarray(numbers)[run[resolved:end]]
+        actual.flush()
+        self._write_meta(dict(self.meta, resolved=end))
+        self.meta['resolved'] = end
+        return end - resolved
+    
+    def rebuild(self, history_dir: str) -> int:
+        """
+        予測履歴（各実行の本体）から台帳を作り直す
+        
+        Args:
+            history_dir: 予測履歴のディレクトリ
+        
+        Returns:
+            int: 読み込んだ実行の件数
+        """
+        history = PredictionHistoryIndex(history_dir)
+        entries = history.entries()
+        if not entries and os.path.exists(history.legacy_file):
+            with open(history.legacy_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        
+        self.meta = {'count': 0, 'resolved': 0, 'methods': []}
+        for column in self.COLUMNS:
+            if os.path.exists(self.column_file(column)):
+                os.remove(self.column_file(column))
+        runs = 0
+        for entry in sorted(entries, key=lambda entry: entry.get('timestamp', '')):
+            path = os.path.join(history_dir, entry.get('file', ''))
+            if not entry.get('file') or not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                core = json.load(f)
+            run = core.get('statistics', {}).get('total_records')
+            if run is None or not core.get('methods'):
+                continue
+            timestamp = datetime.fromisoformat(core.get('timestamp') or entry['timestamp']).timestamp()
+            self.append(int(run), timestamp, core['methods'])
+            runs += 1
+        if not self.exists():
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_meta(self.meta)
+        return runs
+    
+    @staticmethod
+    def _parse_number(value, limit: int) -> int:
+        """予測の番号（'012'など）を整数にする（不正な値は-1）"""
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            return -1
+        return number if 0 <= number < limit else -1
+    
+    def _write_meta(self, meta: Dict[str, any]):
+        tmp_file = f"{self.meta_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_file, self.meta_file)
+
+
+class IndicatorEngine:
+    """
+    技術指標（MA、EMA、RSI、MACD、ボリンジャーバンド）の逐次計算エンジン
+    
+    直近の値のバッファとEWMの値だけを状態として持ち、1回の抽せんごとに
+    定数時間で状態を進めて新しい行の指標を返す。計算結果は
+    NumbersAnalyzer._compute_indicator_frame（pandasによる全件計算）と一致する。
+    """
+    
+    POSITIONS = ['hundred', 'ten', 'one']
+    MA_WINDOWS = [5, 10, 20, 50]
+    EMA_ALPHAS = [0.1, 0.3, 0.5]
+    RSI_WINDOW = 14
+    MACD_FAST_SPAN = 12
+    MACD_SLOW_SPAN = 26
+    MACD_SIGNAL_SPAN = 9
+    BB_WINDOW = 20
+    
+    # バッファに保持する値の数（最大のウィンドウ + RSIの差分用）
+    BUFFER_SIZE = max(MA_WINDOWS + [RSI_WINDOW + 1, BB_WINDOW])
+    
+    def __init__(self, state: Optional[Dict[str, any]] = None):
+        """
+        初期化
+        
+        Args:
+            state: 保存済みの状態（Noneの場合は空の状態から開始）
+        """
+        if state is None:
+            state = {'count': 0}
+            for pos in self.POSITIONS:
+                state[pos] = {
+                    'buffer': [],
+                    'ema': [None] * len(self.EMA_ALPHAS),
+                    'macd_fast': None,
+                    'macd_slow': None,
+                    'macd_signal': None
+                }
+        self.state = state
+    
+    @classmethod
+    def column_names(cls) -> List[str]:
+        """指標の列名（create_advanced_featuresと同じ順序）"""
+        names = []
+        for window in cls.MA_WINDOWS:
+            names.extend([f'{pos}_ma{window}' for pos in cls.POSITIONS])
+        for alpha in cls.EMA_ALPHAS:
+            names.extend([f'{pos}_ema{alpha}' for pos in cls.POSITIONS])
+        names.extend([f'{pos}_rsi' for pos in cls.POSITIONS])
+        for pos in cls.POSITIONS:
+            names.extend([f'{pos}_macd', f'{pos}_macd_signal', f'{pos}_macd_histogram'])
+        for pos in cls.POSITIONS:
+            names.extend([f'{pos}_bb_upper', f'{pos}_bb_lower', f'{pos}_bb_width', f'{pos}_bb_position'])
+        return names
+    
+    @staticmethod
+    def _ewm(previous: Optional[float], value: float, alpha: float) -> float:
+        """adjust=FalseのEWMを1ステップ進める"""
+        if previous is None:
+            return value
+        return (1 - alpha) * previous + alpha * value
+    
+    def step(self, digits) -> np.ndarray:
+        """
+        1回分の抽せん結果で状態を進める
+        
+        Args:
+            digits: (百, 十, 一) の数字
+        
+        Returns:
+            np.ndarray: 新しい行の指標（column_names()の順）
+        """
+        count = self.state['count'] + 1
+        self.state['count'] = count
+        values = {}
+        
+        for pos, digit in zip(self.POSITIONS, digits):
+            st = self.state[pos]
+            x = float(digit)
+            buffer = st['buffer']
+            buffer.append(x)
+            del buffer[:-self.BUFFER_SIZE]
+            
+            for window in self.MA_WINDOWS:
+                values[f'{pos}_ma{window}'] = float(np.mean(buffer[-window:])) if count >= window else np.nan
+            
+            for i, alpha in enumerate(self.EMA_ALPHAS):
+                st['ema'][i] = self._ewm(st['ema'][i], x, alpha)
+                values[f'{pos}_ema{alpha}'] = st['ema'][i]
+            
+            # RSI（最初の差分はpandas同様に0として扱う）
+            if count >= self.RSI_WINDOW:
+                recent = buffer[-(self.RSI_WINDOW + 1):]
+                deltas = np.diff(recent)
+                if len(deltas) < self.RSI_WINDOW:
+                    deltas = np.concatenate([[0.0], deltas])
+                gain = np.mean(np.where(deltas > 0, deltas, 0.0))
+                loss = np.mean(np.where(deltas < 0, -deltas, 0.0))
+                rs = gain / (loss + 1e-10)
+                values[f'{pos}_rsi'] = 100 - (100 / (1 + rs))
+            else:
+                values[f'{pos}_rsi'] = 50.0
+            
+            # MACD
+            st['macd_fast'] = self._ewm(st['macd_fast'], x, 2 / (self.MACD_FAST_SPAN + 1))
+            st['macd_slow'] = self._ewm(st['macd_slow'], x, 2 / (self.MACD_SLOW_SPAN + 1))
+            macd = st['macd_fast'] - st['macd_slow']
+            st['macd_signal'] = self._ewm(st['macd_signal'], macd, 2 / (self.MACD_SIGNAL_SPAN + 1))
+            values[f'{pos}_macd'] = macd
+            values[f'{pos}_macd_signal'] = st['macd_signal']
+            values[f'{pos}_macd_histogram'] = macd - st['macd_signal']
+            
+            # ボリンジャーバンド
+            if count >= self.BB_WINDOW:
+                window_values = buffer[-self.BB_WINDOW:]
+                ma = np.mean(window_values)
+                std = np.std(window_values, ddof=1)
+                upper = ma + std * 2
+                lower = ma - std * 2
+                width = upper - lower
+                values[f'{pos}_bb_upper'] = upper
+                values[f'{pos}_bb_lower'] = lower
+                values[f'{pos}_bb_width'] = width
+                values[f'{pos}_bb_position'] = (x - lower) / (width + 1e-10)
+            else:
+                for key in ['bb_upper', 'bb_lower', 'bb_width', 'bb_position']:
+                    values[f'{pos}_{key}'] = np.nan
+        
+        return np.array([values[name] for name in self.column_names()], dtype=np.float64)
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, indicators: pd.DataFrame) -> 'IndicatorEngine':
+        """
+        全件計算の結果から最終時点の状態を復元する
+        
+        Args:
+            df: 抽せんデータ（hundred, ten, one列を含む）
+            indicators: 全件計算した指標（column_names()の列を含む）
+        """
+        engine = cls()
+        engine.state['count'] = len(df)
+        if len(df) == 0:
+            return engine
+        
+        for pos in cls.POSITIONS:
+            st = engine.state[pos]
+            series = df[pos].astype(float)
+            st['buffer'] = series.values[-cls.BUFFER_SIZE:].tolist()
+            st['ema'] = [float(indicators[f'{pos}_ema{alpha}'].iloc[-1]) for alpha in cls.EMA_ALPHAS]
+            st['macd_fast'] = float(series.ewm(span=cls.MACD_FAST_SPAN, adjust=False).mean().iloc[-1])
+            st['macd_slow'] = float(series.ewm(span=cls.MACD_SLOW_SPAN, adjust=False).mean().iloc[-1])
+            st['macd_signal'] = float(indicators[f'{pos}_macd_signal'].iloc[-1])
+        return engine
+
+
+class PatternCounter:
+    """
+    数字の組み合わせ（パターン）の出現回数を整数コードで数える
+    
+    組み合わせは桁を10進数としてまとめたコード（3桁なら h*100+t*10+o、
+    2桁なら a*10+b）で表し、bincountで数える。ボックス（順不同）は
+    桁を昇順に並べてからコードにする。文字列のキー（"123"など）は
+    上位N件の出力時にだけ作る。
+    """
+    
+    @staticmethod
+    def encode(digits: np.ndarray, box: bool = False) -> np.ndarray:
+        """
+        各行の数字をコードにする
+        
+        Args:
+            digits: 数字の配列 (n, k)（kは組み合わせの桁数）
+            box: Trueの場合は順不同（昇順に並べてからコードにする）
+            
+        Returns:
+            np.ndarray: コード (n,)
+        """
+        digits = np.asarray(digits, dtype=np.int64)
+        if box:
+            digits = np.sort(digits, axis=1)
+        return digits @ (10 ** np.arange(digits.shape[1] - 1, -1, -1))
+    
+    @staticmethod
+    def count(codes: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        コードごとの出現回数と、最初に出現したインデックスを数える
+        
+        Args:
+            codes: コード (n,)
+            width: 組み合わせの桁数（コードは0から10^width-1）
+            
+        Returns:
+            (出現回数, 最初に出現したインデックス（未出現は-1）)
+        """
+        size = 10 ** width
+        counts = np.bincount(codes, minlength=size)
+        first_seen = np.full(size, -1, dtype=np.int64)
+        unique_codes, first_idx = np.unique(codes, return_index=True)
+        first_seen[unique_codes] = first_idx
+        return counts, first_seen
+    
+    @staticmethod
+    def rank(counts: np.ndarray, first_seen: np.ndarray, top_n: Optional[int] = None) -> np.ndarray:
+        """
+        出現したコードを件数の多い順に返す（同数は最初に出現した順、pandasのvalue_counts()と同じ）
+        
+        Args:
+            counts: 出現回数
+            first_seen: 最初に出現したインデックス
+            top_n: 上位N件だけを返す（argpartitionで候補を絞ってから並べる）
+            
+        Returns:
+            np.ndarray: 平坦化したコードの配列
+        """
+        counts = counts.reshape(-1)
+        first_seen = first_seen.reshape(-1)
+        seen = np.flatnonzero(counts > 0)
+        if top_n is not None and top_n < len(seen):
+            # N番目の件数以上のコードだけを候補にする（同数の並びは下で決める）
+            threshold = counts[seen[np.argpartition(-counts[seen], top_n - 1)[top_n - 1]]]
+            seen = seen[counts[seen] >= threshold]
+        order = seen[np.lexsort((first_seen[seen], -counts[seen]))]
+        return order if top_n is None else order[:top_n]
+    
+    @classmethod
+    def top(cls, counts: np.ndarray, first_seen: np.ndarray, top_n: int, width: int) -> Dict[str, int]:
+        """
+        上位N件を {"123": 件数} の辞書にする
+        
+        Args:
+            counts: 出現回数
+            first_seen: 最初に出現したインデックス
+            top_n: 件数
+            width: 組み合わせの桁数（キーの0埋めの桁数）
+        """
+        counts = counts.reshape(-1)
+        return {f"{code:0{width}d}": int(counts[code]) for code in cls.rank(counts, first_seen, top_n)}
+    
+    @classmethod
+    def most_common(cls, digits: np.ndarray, top_n: int, box: bool = False) -> Dict[str, int]:
+        """
+        数字の配列から頻出の組み合わせの上位N件を求める
+        
+        Args:
+            digits: 数字の配列 (n, k)
+            top_n: 件数
+            box: Trueの場合は順不同で数える
+        """
+        width = np.shape(digits)[1]
+        counts, first_seen = cls.count(cls.encode(digits, box=box), width)
+        return cls.top(counts, first_seen, top_n, width)
+
+
+class TransitionEngine:
+    """
+    各桁のk次マルコフ連鎖の遷移回数（k = 1..max_order）
+    
+    状態は直前k回の数字を10進数としてまとめたコード（例: 2次で 3→7 なら37）、
+    遷移は「状態 * 10 + 次の数字」のコードで表し、bincountでまとめて数える。
+    表の大きさは10^(k+1)なので、DENSE_MAX_SIZEまでは密な配列、
+    それを超える次数は出現したコードと件数の組（ソート済み）で保持する。
+    """
+    
+    # 密な配列で保持する表の最大の大きさ（10^(k+1)、これより大きい次数は疎な形式）
+    DENSE_MAX_SIZE = 1000
+    
+    def __init__(self, max_order: int = 3):
+        """
+        初期化（空の遷移表）
+        
+        Args:
+            max_order: 保持する最大の次数
+        """
+        self.max_order = max_order
+        self.tail = np.empty((0, 3), dtype=np.int64)  # 直近max_order回の数字（追加分の遷移の起点）
+        self.tables = {}
+        for order in range(1, max_order + 1):
+            if self.is_dense(order):
+                self.tables[order] = np.zeros((3, 10 ** (order + 1)), dtype=np.int64)
+            else:
+                self.tables[order] = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)) for _ in range(3)]
+    
+    def is_dense(self, order: int) -> bool:
+        """その次数の遷移表を密な配列で保持するか"""
+        return 10 ** (order + 1) <= self.DENSE_MAX_SIZE
+    
+    def append(self, digits: np.ndarray):
+        """
+        抽せんを末尾に追加して遷移回数を更新する
+        
+        Args:
+            digits: 追加する抽せんの数字 (k, 3)
+        """
+        if len(digits) == 0:
+            return
+        context = np.concatenate([self.tail, np.asarray(digits, dtype=np.int64)])
+        for order in range(1, self.max_order + 1):
+            if len(context) <= order:
+                continue
+            # 遷移先が追加分に含まれる（order+1）回の並びだけを数える
+            windows = np.lib.stride_tricks.sliding_window_view(context, order + 1, axis=0)
+            windows = windows[max(0, len(self.tail) - order):]
+            codes = windows @ (10 ** np.arange(order, -1, -1))  # (m, 3)
+            for p in range(3):
+                if self.is_dense(order):
+                    self.tables[order][p] += np.bincount(codes[:, p], minlength=10 ** (order + 1))
+                else:
+                    keys, counts = self.tables[order][p]
+                    new_keys, new_counts = np.unique(codes[:, p], return_counts=True)
+                    keys, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+                    counts = np.bincount(inverse, weights=np.concatenate([counts, new_counts]), minlength=len(keys))
+                    self.tables[order][p] = (keys, counts.astype(np.int64))
+        self.tail = context[-self.max_order:]
+    
+    def counts(self, p: int, order: int, state: int) -> np.ndarray:
+        """
+        状態から次の数字への遷移回数
+        
+        Args:
+            p: 桁（0-2）
+            order: 次数
+            state: 直前order回の数字のコード
+            
+        Returns:
+            np.ndarray: 次の数字（0-9）ごとの遷移回数
+        """
+        if self.is_dense(order):
+            return self.tables[order][p][state * 10:(state + 1) * 10]
+        keys, counts = self.tables[order][p]
+        row = np.zeros(10, dtype=np.int64)
+        lo, hi = np.searchsorted(keys, [state * 10, (state + 1) * 10])
+        row[keys[lo:hi] - state * 10] = counts[lo:hi]
+        return row
+    
+    def state(self, p: int, order: int) -> Optional[int]:
+        """直近order回の数字から作る現在の状態のコード（抽せんが足りない場合はNone）"""
+        if len(self.tail) < order:
+            return None
+        return int(self.tail[-order:, p] @ (10 ** np.arange(order - 1, -1, -1)))
+
+
+class DigitCountIndex:
+    """
+    各桁の出現回数の集計インデックス（頻度系の手法・分析で共有）
+    
+    全履歴を1回のベクトル化処理で集計し、追加された抽せんは append で
+    差分だけ加算する。保持する集計（posは百・十・一の0-2）:
+      digit_counts[pos, d]: 各桁の数字の出現回数
+      transitions[pos, a, b]: 前回aから今回bへの遷移回数（markov: 高次の遷移はTransitionEngine）
+      calendar_counts[name][pos, c, d]: 曜日(0-6)・月(0-11)・四半期(0-3)別の出現回数
+      pair_counts[name][a, b]: 2桁の組み合わせ（百十・十一・百一）の出現回数
+      triple_counts[n]: 3桁の番号（000-999）の出現回数
+      box_counts[n]: ボックス（順不同、桁を昇順に並べた番号）の出現回数
+      last_seen[pos, d]: 最後に出現した抽せんインデックス（未出現は-1）
+      gap_count / gap_sum / gap_square_sum / gap_min / gap_max[pos, d]: 同じ数字が再出現するまでの
+        間隔の件数・合計・二乗和・最小・最大（追加分の間隔だけ加算）
+      gap_histogram[pos, d, g]: 間隔gの件数（中央値用。最大の間隔を超えたら倍に広げる）
+      repeat_counts[pos, d]: 前回と同じ数字が続いた回数（連続の長さ-1の合計）
+      max_run[pos, d]: 同じ数字が連続した最大の長さ
+      alternating_counts[pos, a*10+b]: A-B-A-Bの交互出現の回数
+      run_length[pos]: 現在の連続の長さ（最後の数字が何回続いているか）
+    件数の集計には、同数の場合の並び順（pandasのvalue_counts()と同じく
+    最初に出現した順）を再現するため、最初に出現したインデックスも保持する。
+    """
+    
+    POSITIONS = ['hundred', 'ten', 'one']
+    # 暦の種類: (DataFrameの列, 値の個数, 最小値)
+    CALENDARS = {
+        'weekday': ('weekday', 7, 0),
+        'month': ('month', 12, 1),
+        'quarter': ('quarter', 4, 1)
+    }
+    PAIRS = {
+        'hundred_ten': (0, 1),
+        'ten_one': (1, 2),
+        'hundred_one': (0, 2)
+    }
+    
+    def __init__(self):
+        """初期化（空のインデックス）"""
+        self.count = 0
+        self.digit_counts = np.zeros((3, 10), dtype=np.int64)
+        self.markov = TransitionEngine()
+        self.transition_first_seen = np.full((3, 10, 10), -1, dtype=np.int64)
+        self.calendar_counts = {name: np.zeros((3, size, 10), dtype=np.int64)
+                                for name, (_, size, _) in self.CALENDARS.items()}
+        self.calendar_first_seen = {name: np.full((3, size, 10), -1, dtype=np.int64)
+                                    for name, (_, size, _) in self.CALENDARS.items()}
+        self.pair_counts = {name: np.zeros((10, 10), dtype=np.int64) for name in self.PAIRS}
+        self.pair_first_seen = {name: np.full((10, 10), -1, dtype=np.int64) for name in self.PAIRS}
+        self.triple_counts = np.zeros(1000, dtype=np.int64)
+        self.triple_first_seen = np.full(1000, -1, dtype=np.int64)
+        self.box_counts = np.zeros(1000, dtype=np.int64)
+        self.box_first_seen = np.full(1000, -1, dtype=np.int64)
+        self.last_seen = np.full((3, 10), -1, dtype=np.int64)
+        self.gap_count = np.zeros((3, 10), dtype=np.int64)
+        self.gap_sum = np.zeros((3, 10), dtype=np.int64)
+        self.gap_square_sum = np.zeros((3, 10), dtype=np.int64)
+        self.gap_min = np.full((3, 10), np.iinfo(np.int64).max, dtype=np.int64)
+        self.gap_max = np.zeros((3, 10), dtype=np.int64)
+        self.gap_histogram = np.zeros((3, 10, 64), dtype=np.int64)
+        self.repeat_counts = np.zeros((3, 10), dtype=np.int64)
+        self.repeat_first_seen = np.full((3, 10), -1, dtype=np.int64)
+        self.max_run = np.zeros((3, 10), dtype=np.int64)
+        self.alternating_counts = np.zeros((3, 100), dtype=np.int64)
+        self.alternating_first_seen = np.full((3, 100), -1, dtype=np.int64)
+        self.run_length = np.zeros(3, dtype=np.int64)
+        self.recent = np.empty((0, 3), dtype=np.int64)  # 直近3回の数字（交互出現の判定に使用）
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'DigitCountIndex':
+        """DataFrame（load_dataの形式）の全件から作成する"""
+        index = cls()
+        index.append(df)
+        return index
+    
+    @property
+    def last_digits(self) -> Optional[np.ndarray]:
+        """最後の抽せんの数字 (3,)（抽せんがない場合はNone）"""
+        return self.recent[-1] if len(self.recent) > 0 else None
+    
+    @property
+    def transitions(self) -> np.ndarray:
+        """1次の遷移回数 (3, 10, 10)"""
+        return self.markov.tables[1].reshape(3, 10, 10)
+    
+    @staticmethod
+    def _accumulate(counts: np.ndarray, first_seen: np.ndarray, codes: np.ndarray, positions: np.ndarray):
+        """平坦化したコードごとに件数を加算し、初出のインデックスを記録する"""
+        counts_flat = counts.reshape(-1)
+        counts_flat += np.bincount(codes, minlength=counts_flat.size)
+        DigitCountIndex._record_first_seen(first_seen, codes, positions)
+    
+    @staticmethod
+    def _record_first_seen(first_seen: np.ndarray, codes: np.ndarray, positions: np.ndarray):
+        """平坦化したコードごとに初出のインデックスを記録する"""
+        first_flat = first_seen.reshape(-1)
+        unique_codes, first_idx = np.unique(codes, return_index=True)
+        new = first_flat[unique_codes] < 0
+        first_flat[unique_codes[new]] = positions[first_idx[new]]
+    
+    def append(self, rows: pd.DataFrame):
+        """
+        抽せんを末尾に追加して集計を更新する（追加件数に比例する時間で済む）
+        
+        Args:
+            rows: 追加する行（hundred/ten/one/weekday/month/quarter列を持つDataFrame）
+        """
+        k = len(rows)
+        if k == 0:
+            return
+        digits = rows[self.POSITIONS].to_numpy(dtype=np.int64)
+        positions = np.arange(self.count, self.count + k)
+        self.markov.append(digits)
+        
+        for p in range(3):
+            d = digits[:, p]
+            self.digit_counts[p] += np.bincount(d, minlength=10)
+            
+            # 遷移の初出（回数はmarkovで数える。前回追加分の最後の抽せんからの遷移も含める）
+            if self.last_digits is not None:
+                sequence = np.concatenate([[self.last_digits[p]], d])
+                to_positions = positions
+            else:
+                sequence = d
+                to_positions = positions[1:]
+            if len(sequence) > 1:
+                self._record_first_seen(self.transition_first_seen[p],
+                                        sequence[:-1] * 10 + sequence[1:], to_positions)
+            
+            # 出現間隔（数字ごとに出現位置を並べ、直前の出現位置との差を取る）
+            order = np.argsort(d, kind='stable')
+            sorted_digits = d[order]
+            sorted_positions = positions[order]
+            group_start = np.r_[True, sorted_digits[1:] != sorted_digits[:-1]]
+            group_end = np.r_[sorted_digits[1:] != sorted_digits[:-1], True]
+            previous = np.empty_like(sorted_positions)
+            previous[1:] = sorted_positions[:-1]
+            previous[group_start] = self.last_seen[p, sorted_digits[group_start]]
+            valid = previous >= 0
+            gap_digits = sorted_digits[valid]
+            gaps = sorted_positions[valid] - previous[valid]
+            if len(gaps) > 0:
+                self._add_gaps(p, gap_digits, gaps)
+            self.last_seen[p, sorted_digits[group_end]] = sorted_positions[group_end]
+            
+            # 連続出現（ランレングス符号化。最初のランは前回追加分の最後のランの続きになりうる）
+            previous_digit = self.last_digits[p] if self.last_digits is not None else -1
+            sequence = np.concatenate([[previous_digit], d])
+            repeat = np.flatnonzero(sequence[1:] == sequence[:-1])
+            self._accumulate(self.repeat_counts[p], self.repeat_first_seen[p], d[repeat], positions[repeat])
+            starts = np.flatnonzero(sequence[1:] != sequence[:-1])
+            lengths = np.diff(np.r_[starts, k])
+            if len(starts) == 0 or starts[0] > 0:
+                # 先頭のランは前回からの続き
+                lengths = np.r_[self.run_length[p] + (starts[0] if len(starts) else k), lengths]
+                starts = np.r_[0, starts]
+            np.maximum.at(self.max_run[p], d[starts], lengths)
+            self.run_length[p] = lengths[-1]
+            
+            # 交互出現（A-B-A-B、最後の抽せんが追加分に含まれる4回の並び）
+            context = np.concatenate([self.recent[:, p], d])
+            if len(context) >= 4:
+                windows = np.lib.stride_tricks.sliding_window_view(context, 4)
+                windows = windows[max(0, len(self.recent) - 3):]
+                window_starts = positions[-1] - len(windows) + 1 - 3 + np.arange(len(windows))
+                alternating = ((windows[:, 0] == windows[:, 2]) & (windows[:, 1] == windows[:, 3])
+                               & (windows[:, 0] != windows[:, 1]))
+                self._accumulate(self.alternating_counts[p], self.alternating_first_seen[p],
+                                 windows[alternating, 0] * 10 + windows[alternating, 1], window_starts[alternating])
+        
+        # 暦別の出現回数（(桁, 暦の値, 数字) を1つのコードにして、暦の種類ごとに1回のbincountで数える）
+        for name, (column, size, offset) in self.CALENDARS.items():
+            values = rows[column].to_numpy(dtype=np.int64) - offset
+            codes = (np.arange(3) * size + values[:, np.newaxis]) * 10 + digits
+            self._accumulate(self.calendar_counts[name], self.calendar_first_seen[name],
+                             codes.reshape(-1), np.repeat(positions, 3))
+        
+        # 組み合わせ
+        for name, (a, b) in self.PAIRS.items():
+            self._accumulate(self.pair_counts[name], self.pair_first_seen[name],
+                             PatternCounter.encode(digits[:, [a, b]]), positions)
+        self._accumulate(self.triple_counts, self.triple_first_seen, PatternCounter.encode(digits), positions)
+        self._accumulate(self.box_counts, self.box_first_seen, PatternCounter.encode(digits, box=True), positions)
+        
+        self.count += k
+        self.recent = np.concatenate([self.recent, digits])[-3:]
+    
+    def _add_gaps(self, p: int, gap_digits: np.ndarray, gaps: np.ndarray):
+        """追加分の出現間隔を集計に加える（追加件数に比例する時間）"""
+        self.gap_count[p] += np.bincount(gap_digits, minlength=10)
+        self.gap_sum[p] += np.bincount(gap_digits, weights=gaps, minlength=10).astype(np.int64)
+        self.gap_square_sum[p] += np.bincount(gap_digits, weights=gaps * gaps, minlength=10).astype(np.int64)
+        np.minimum.at(self.gap_min[p], gap_digits, gaps)
+        np.maximum.at(self.gap_max[p], gap_digits, gaps)
+        
+        width = self.gap_histogram.shape[2]
+        if gaps.max() >= width:
+            while gaps.max() >= width:
+                width *= 2
+            grown = np.zeros((3, 10, width), dtype=np.int64)
+            grown[:, :, :self.gap_histogram.shape[2]] = self.gap_histogram
+            self.gap_histogram = grown
+        np.add.at(self.gap_histogram[p], (gap_digits, gaps), 1)
+    
+    def gap_stats(self, p: int, digit: int) -> Dict[str, any]:
+        """
+        出現間隔の統計（平均・中央値・標準偏差・最小・最大・件数）
+        
+        中央値以外は累積値から、中央値は間隔のヒストグラムから求める（履歴の長さによらない）。
+        
+        Args:
+            p: 桁（0-2）
+            digit: 数字
+        """
+        count = int(self.gap_count[p, digit])
+        if count == 0:
+            return {'mean': 0.0, 'median': 0.0, 'std': 0.0, 'min': 0, 'max': 0, 'count': 0}
+        mean = self.gap_sum[p, digit] / count
+        variance = max(self.gap_square_sum[p, digit] / count - mean * mean, 0.0)
+        # 中央の2件（件数が奇数なら同じ1件）の間隔の平均（np.medianと同じ）
+        cumulative = np.cumsum(self.gap_histogram[p, digit])
+        lower, upper = np.searchsorted(cumulative, [(count - 1) // 2, count // 2], side='right')
+        return {
+            'mean': float(mean),
+            'median': float((lower + upper) / 2),
+            'std': float(np.sqrt(variance)),
+            'min': int(self.gap_min[p, digit]),
+            'max': int(self.gap_max[p, digit]),
+            'count': count
+        }
+
+
+# 並列実行用ワーカープロセスが保持するアナライザー
+_worker_analyzer = None
+# 上書き前にインスタンス属性が存在しなかったことを示す目印
+_MISSING = object()
+
+
+def _init_method_worker(analyzer: 'NumbersAnalyzer'):
+    """ワーカープロセスの初期化（アナライザーを1回だけ受け取る）"""
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+
+
+def load_dependencies(modules: List[str]) -> Dict[str, Optional[float]]:
+    """
+    手法が使う重いライブラリを読み込み、読み込み時間を計測する
+    
+    未インストールのライブラリは読み込まない（手法側でImportErrorとして扱われる）。
+    
+    Args:
+        modules: モジュール名のリスト
+    
+    Returns:
+        dict: {モジュール名: 読み込み秒数（読み込み済みの場合は0、未インストールの場合はNone）}
+    """
+    timings = {}
+    for module in modules:
+        if module in sys.modules:
+            timings[module] = 0.0
+            continue
+        if importlib.util.find_spec(module) is None:
+            timings[module] = None
+            continue
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            # 読み込みに失敗しても手法側の例外処理に任せる
+            print(f"[load_dependencies] {module} を読み込めません: {e}")
+        timings[module] = time.perf_counter() - start
+    return timings
+
+
+def _call_method(analyzer: 'NumbersAnalyzer', method_name: str, kwargs: Dict[str, any],
+                 settings: Optional[Dict[str, any]] = None,
+                 imports: Optional[List[str]] = None) -> Tuple[any, Optional[str], float, Dict[str, Optional[float]], Dict[str, int]]:
+    """
+    アナライザーのメソッドを実行する（例外は呼び出し元に返す）
+    
+    Args:
+        settings: 実行中だけ上書きするクラス定数（軽量設定など、終了後に元へ戻す）
+        imports: 実行前に読み込む重いライブラリ（読み込み時間は経過秒数に含めない）
+    
+    Returns:
+        tuple: (結果, エラーメッセージ（成功時はNone）, 経過秒数, ライブラリの読み込み秒数,
+                実行中の特徴量キャッシュのヒット・ミス回数)
+    """
+    import_times = load_dependencies(imports or [])
+    previous_base = analyzer.base_settings
+    analyzer.base_settings = {name: getattr(analyzer, name) for name in settings or {}}
+    overridden = {}
+    for name, value in (settings or {}).items():
+        overridden[name] = analyzer.__dict__.get(name, _MISSING)
+        setattr(analyzer, name, value)
+    before = dict(analyzer.feature_cache_stats)
+    
+    def cache_counts():
+        return {kind: analyzer.feature_cache_stats[kind] - count for kind, count in before.items()}
+    
+    start = time.time()
+    try:
+        result = getattr(analyzer, method_name)(**kwargs)
+        return result, None, time.time() - start, import_times, cache_counts()
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.time() - start, import_times, cache_counts()
+    finally:
+        analyzer.base_settings = previous_base
+        for name, previous in overridden.items():
+            if previous is _MISSING:
+                delattr(analyzer, name)
+            else:
+                setattr(analyzer, name, previous)
+
+
+def _run_method_in_worker(method_name: str, kwargs: Dict[str, any], settings: Optional[Dict[str, any]] = None,
+                          imports: Optional[List[str]] = None) -> Tuple[any, Optional[str], float, Dict[str, Optional[float]], Dict[str, int]]:
+    """ワーカープロセスでメソッドを実行する"""
+    return _call_method(_worker_analyzer, method_name, kwargs, settings, imports)
+
+
+def _terminate_pool(executor) -> None:
+    """打ち切った手法が残っているプロセスプールを待たずに終了させる"""
+    if hasattr(executor, 'terminate_workers'):
+        # Python 3.14以降
+        executor.terminate_workers()
+        return
+    # shutdownで_processesが破棄されるため先に控えておく
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
 
 
 class NumbersAnalyzer:
@@ -343,6 +2307,15 @@ class NumbersAnalyzer:
     # 影響度: ★★☆（全モデルの学習時間に影響）
     PREDICTION_MAX_TRAINING_SAMPLES = 100  
     
+    # 学習行列の列構成（build_training_matrixで使用）
+    # 過去window_size回分の基本データの列と、現在時点の技術指標の列
+    LAG_FEATURE_COLUMNS = ['hundred', 'ten', 'one', 'sum', 'span']
+    INDICATOR_FEATURE_COLUMNS = [
+        'hundred_ma20', 'ten_ma20', 'one_ma20',
+        'hundred_rsi', 'ten_rsi', 'one_rsi',
+        'hundred_macd', 'ten_macd', 'one_macd'
+    ]
+    
     # --- LSTM専用設定（Fullモードのみ） ---
     # LSTMは計算コストが非常に高いです。
     LSTM_WINDOW_SIZE = 10  # LSTMで使用するシーケンス長（過去10回のデータ）
@@ -350,6 +2323,16 @@ class NumbersAnalyzer:
     # 影響度: ★★★（増やしすぎると学習時間が激増します。通常は50-100必要ですが5に制限中）
     LSTM_EPOCHS = 5
     LSTM_BATCH_SIZE = 32  # LSTMのバッチサイズ（影響度: ★★☆）
+    # 保存済みの重みから継続学習する場合に使う直近のウィンドウ数とエポック数
+    # （最初から学習し直す条件はMODEL_MAX_AGE_DAYSなど、決定木系モデルと共通）
+    LSTM_FINE_TUNE_WINDOWS = 200  # 影響度: ★★☆
+    LSTM_FINE_TUNE_EPOCHS = 2  # 影響度: ★★☆
+    
+    # --- マルコフ連鎖パラメータ ---
+    # predict_markovの次数（直前何回の数字を状態とするか、1-3）
+    # 遷移回数の表は全次数を出現回数のインデックスと一緒に作成済みなので、次数による実行時間の差はありません
+    # 影響度: ★☆☆
+    MARKOV_ORDER = 1
     
     # --- Random Forest パラメータ ---
     # 並列処理が効くので比較的早いですが、決定木の数に比例します。
@@ -368,6 +2351,19 @@ class NumbersAnalyzer:
     LGB_MAX_DEPTH = 5  # LightGBMの最大深度（影響度: ★☆☆）
     LGB_LEARNING_RATE = 0.1  # LightGBMの学習率（影響度: ★☆☆）
     
+    # --- 学習済みモデルの保存・継続学習（Random Forest / XGBoost / LightGBM） ---
+    # 学習済みモデルはキャッシュディレクトリ（models/）に保存し、次回は新しい学習窓で継続学習します。
+    # 特徴量の構成・ハイパーパラメータが変わった場合と、下記の日数を過ぎた場合だけ最初から学習し直します。
+    # 影響度: ★★☆（継続学習は木・ラウンドを少し追加するだけなので、毎回の学習時間が大幅に短くなります）
+    MODEL_MAX_AGE_DAYS = 30
+    RF_WARM_START_ESTIMATORS = 10  # 継続学習で追加する木の数（古い木から同じ数だけ捨てて総数を保つ）
+    XGB_WARM_START_ROUNDS = 5  # 継続学習で追加するブースティングラウンド数
+    LGB_WARM_START_ROUNDS = 5  # 継続学習で追加するブースティングラウンド数
+    # ブースターは継続学習のたびにラウンドが増えて予測が遅くなるため、総ラウンド数が上限を超える場合は
+    # MODEL_MAX_AGE_DAYS を待たずに最初から学習し直す（既定ではどちらも継続学習14回分まで）
+    XGB_MAX_ROUNDS = 100  # 影響度: ★☆☆
+    LGB_MAX_ROUNDS = 120  # 影響度: ★☆☆
+    
     # --- Stacking パラメータ（Fullモードのみ） ---
     # ベースモデルの数 × バリデーション分割数(CV) の回数だけ学習が走るため、非常に重いです。
     # スタッキングのクロスバリデーション分割数（高速化のため2）
@@ -392,16 +2388,106 @@ class NumbersAnalyzer:
     # t-SNEは計算量がO(N^2)で増えるため、データ数が最大のボトルネックになります。
     # 現在はコード内で max_data_points = 250 にハードコードされています。
     # 影響度: ★★★（データ数を増やすと指数関数的に重くなります）  
+    
+    # --- キャッシュ設定 ---
+    # 実行間で再利用する計算結果（位相など）の保存先ディレクトリ
+    # GitHub Actionsではactions/cacheで復元されます（リポジトリにはコミットしない）
+    CACHE_DIR = ".cache"
+    # 予測結果・予測履歴の出力先（予測の台帳がない場合はここの履歴から作り直す）
+    PREDICTION_HISTORY_DIR = "docs/data"
+    
+    # --- 動的信頼度設定 ---
+    # 手法ごとに参照する予測の台帳の直近の行数
+    # 影響度: ★☆☆（大きくすると、予測の一貫性・的中率が長期の平均に近づきます）
+    CONFIDENCE_LEDGER_WINDOW = 20
+    
+    # --- アンサンブル実行設定 ---
+    # ensemble_predictで並列実行するプロセス数（Noneの場合はCPUコア数、1の場合は逐次実行）
+    # 影響度: ★★★（コア数が多いほど、総時間が最も遅い1手法の時間に近づきます）
+    ENSEMBLE_WORKERS = None
+    
+    # ensemble_predictで実行する手法・分析の登録表（この順序で結果を出力）
+    #   key: 結果のキー / method: メソッド名 / label: ログ表示名
+    #   group: 'prediction'（methodsに格納）または 'analysis'（advanced_analysisに格納）
+    #   kwargs: 引数 / full_kwargs: Fullモードで上書きする引数
+    #   cost: 相対的な計算コスト（1-3、重いものから先に投入する）
+    #   imports: 実行時にだけ読み込む重いライブラリ（--import-profileで読み込み時間を表示）
+    #   degraded: 時間予算が足りない場合の軽量設定
+    #             （settings: 一時的に上書きするクラス定数 / kwargs・full_kwargs: 上書きする引数）
+    ENSEMBLE_METHODS = [
+        {'key': 'chaos', 'method': 'predict_chaos', 'label': 'カオス理論予測', 'group': 'prediction', 'cost': 1},
+        {'key': 'markov', 'method': 'predict_markov', 'label': 'マルコフ連鎖予測', 'group': 'prediction', 'cost': 1},
+        {'key': 'bayesian', 'method': 'predict_bayesian', 'label': 'ベイズ統計予測', 'group': 'prediction', 'cost': 1},
+        {'key': 'periodicity', 'method': 'predict_with_periodicity', 'label': '周期性予測', 'group': 'prediction', 'cost': 1},
+        {'key': 'pattern', 'method': 'predict_with_patterns', 'label': '頻出パターン予測', 'group': 'prediction', 'cost': 1},
+        {'key': 'random_forest', 'method': 'predict_with_random_forest', 'label': 'ランダムフォレスト予測', 'group': 'prediction', 'cost': 2, 'imports': ['sklearn'],
+         'degraded': {'settings': {'RF_N_ESTIMATORS': 30}}},
+        {'key': 'xgboost', 'method': 'predict_with_xgboost', 'label': 'XGBoost予測', 'group': 'prediction', 'cost': 2, 'imports': ['xgboost'],
+         'degraded': {'settings': {'XGB_N_ESTIMATORS': 10}}},
+        {'key': 'lightgbm', 'method': 'predict_with_lightgbm', 'label': 'LightGBM予測', 'group': 'prediction', 'cost': 2, 'imports': ['lightgbm'],
+         'degraded': {'settings': {'LGB_N_ESTIMATORS': 20}}},
+        {'key': 'arima', 'method': 'predict_with_arima', 'label': 'ARIMA予測', 'group': 'prediction', 'cost': 2, 'imports': ['statsmodels', 'pmdarima']},
+        {'key': 'stacking', 'method': 'predict_with_stacking', 'label': 'スタッキング予測', 'group': 'prediction', 'cost': 3, 'imports': ['sklearn', 'xgboost', 'lightgbm'],
+         'degraded': {'settings': {'STACKING_RF_N_ESTIMATORS': 10, 'STACKING_XGB_N_ESTIMATORS': 10,
+                                   'STACKING_LGB_N_ESTIMATORS': 10}}},
+        {'key': 'hmm', 'method': 'predict_with_hmm', 'label': 'HMM予測', 'group': 'prediction', 'cost': 2, 'imports': ['hmmlearn']},
+        {'key': 'lstm', 'method': 'predict_with_lstm', 'label': 'LSTM予測', 'group': 'prediction', 'cost': 3, 'imports': ['tensorflow'],
+         'degraded': {'settings': {'LSTM_EPOCHS': 2}}},
+        {'key': 'conformal', 'method': 'predict_with_conformal', 'label': 'コンフォーマル予測', 'group': 'prediction', 'cost': 2, 'imports': ['lightgbm'],
+         'kwargs': {'base_method': 'lightgbm'}, 'degraded': {'settings': {'LGB_N_ESTIMATORS': 20}}},
+        {'key': 'kalman', 'method': 'predict_with_kalman', 'label': 'カルマンフィルタ予測', 'group': 'prediction', 'cost': 1, 'imports': ['filterpy']},
+        {'key': 'correlations', 'method': 'analyze_correlations', 'label': '相関分析', 'group': 'analysis', 'cost': 1},
+        {'key': 'trends', 'method': 'analyze_trends', 'label': 'トレンド分析', 'group': 'analysis', 'cost': 1},
+        {'key': 'frequent_patterns', 'method': 'extract_frequent_patterns', 'label': '頻出パターン分析', 'group': 'analysis', 'cost': 1,
+         'kwargs': {'top_n': 10}},
+        {'key': 'gap_analysis', 'method': 'analyze_gaps_detailed', 'label': 'ギャップ分析', 'group': 'analysis', 'cost': 1},
+        {'key': 'anomalies', 'method': 'detect_anomalies', 'label': '異常検知', 'group': 'analysis', 'cost': 1},
+        {'key': 'clustering', 'method': 'cluster_patterns', 'label': 'クラスタリング分析', 'group': 'analysis', 'cost': 2, 'imports': ['sklearn'],
+         'kwargs': {'n_clusters': 5}},
+        {'key': 'periodicity', 'method': 'analyze_periodicity', 'label': '周期性分析', 'group': 'analysis', 'cost': 1},
+        {'key': 'frequency_analysis', 'method': 'analyze_frequency_domain', 'label': '周波数解析', 'group': 'analysis', 'cost': 1, 'imports': ['scipy.fft']},
+        {'key': 'wavelet_analysis', 'method': 'analyze_wavelet', 'label': 'ウェーブレット解析', 'group': 'analysis', 'cost': 1, 'imports': ['pywt']},
+        {'key': 'pca_analysis', 'method': 'analyze_pca', 'label': 'PCA解析', 'group': 'analysis', 'cost': 1, 'imports': ['sklearn']},
+        {'key': 'tsne_analysis', 'method': 'analyze_tsne', 'label': 't-SNE解析', 'group': 'analysis', 'cost': 2, 'imports': ['sklearn'],
+         'kwargs': {'max_data_points': 10}, 'full_kwargs': {'max_data_points': 250},
+         'degraded': {'full_kwargs': {'max_data_points': 50}}},
+        {'key': 'continuity_analysis', 'method': 'analyze_continuity', 'label': '連続性分析', 'group': 'analysis', 'cost': 1},
+        {'key': 'change_points', 'method': 'detect_change_points', 'label': '変化点検出', 'group': 'analysis', 'cost': 2, 'imports': ['ruptures']},
+        {'key': 'network_analysis', 'method': 'analyze_network', 'label': 'ネットワーク分析', 'group': 'analysis', 'cost': 1},
+        {'key': 'genetic_optimization', 'method': 'optimize_with_genetic_algorithm', 'label': '遺伝的アルゴリズム最適化', 'group': 'analysis', 'cost': 2, 'imports': ['deap']},
+    ]
+    
+    # --- 時間予算設定（--time-budget指定時のみ有効） ---
+    # 各手法の所要時間は実行ごとに計測してキャッシュ（method_timings.json）に保存し、次回の見積もりに使用します。
+    # 見積もりが残り時間に収まらない手法は軽量設定（degraded）で実行し、それでも収まらなければスキップします。
+    # 計測値がない場合の見積もり秒数（cost別）
+    TIME_BUDGET_DEFAULT_ESTIMATES = {1: 5.0, 2: 60.0, 3: 600.0}
+    # 計測値がない場合の軽量設定の見積もり（通常設定の見積もりに対する比率）
+    TIME_BUDGET_DEGRADED_RATIO = 0.3
+    # 手法ごとの打ち切り時間 = max(見積もり × 係数, 最小秒数)（全体の期限を超えることはない）
+    # 影響度: ★★☆（小さくすると遅い手法が打ち切られやすくなります）
+    TIME_BUDGET_HARD_FACTOR = 3.0
+    TIME_BUDGET_MIN_HARD_SECONDS = 30.0
+    # 所要時間の計測値を更新する際の平滑化係数（指数移動平均）
+    TIME_BUDGET_TIMING_ALPHA = 0.5
+    
+    # --- ウォークフォワード検証設定（--backtest指定時のみ有効） ---
+    # 計算コスト2以上の手法（モデルの学習を伴う手法）を再実行する間隔（抽せん数、間の抽せんでは直前の予測を使う）
+    # 影響度: ★★★（小さくすると実際の運用に近づきますが、検証時間は反比例して増えます）
+    BACKTEST_REFIT_EVERY = 50
+    # 検証の最初の予測に使う最低限の抽せん数
+    BACKTEST_MIN_HISTORY = 100
     # ============================================================================
     
     # ============================================================================
     
-    def __init__(self, data_path: str = None):
+    def __init__(self, data_path: str = None, cache_dir: str = None):
         """
         初期化
         
         Args:
             data_path: データファイルのパス（Noneの場合は自動検出）
+            cache_dir: キャッシュディレクトリのパス（Noneの場合はCACHE_DIR）
         """
         if data_path is None:
             # パスを自動検出
@@ -414,45 +2500,242 @@ class NumbersAnalyzer:
         else:
             self.data_path = data_path
         
-        self.data = None
+        self.cache_dir = cache_dir if cache_dir is not None else self.CACHE_DIR
+        self._data = None
+        self.draws = None
         self.df = None
+        # データのバージョン（load_dataのたびに更新し、派生キャッシュの無効化に使用）
+        self.data_version = 0
+        self._feature_cache = None
+        # 特徴量キャッシュのヒット・ミス回数（ワーカーで実行した手法の分はrun_methodsで合算）
+        self.feature_cache_stats = {'hits': 0, 'misses': 0}
+        # 軽量設定で上書き中の定数の元の値（_call_methodが手法の実行中だけ設定する）
+        self.base_settings = {}
+        self._count_index = None
+        self._periodicity_cache = None
+        # 予測の台帳（load_dataでメモリマップし、結果が出た予測の当せん番号を記録）
+        self.ledger = PredictionLedger(self.cache_dir)
+        self._ledger_stats = None
+        self._confidence_context = None
+        # 手法の実行時に読み込んだライブラリと読み込み時間（--import-profile用）
+        self.import_profile = {}
         self.load_data()
     
+    @property
+    def data(self) -> List[Dict[str, any]]:
+        """data.jsonのレコード（update_dataで使用するため、必要になったときだけ読み込む）"""
+        if self._data is None:
+            with open(self.data_path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+        return self._data
+    
+    def load_draws(self) -> Dict[str, np.ndarray]:
+        """
+        抽せん履歴を列形式で読み込む（HistoryStoreのメモリマップ、data.jsonが変わった場合は再生成）
+        
+        Returns:
+            dict: {'digits': int8 (n, 3), 'date': int32 (n,), 'issue': int32 (n,)}（日付順）
+        """
+        store = HistoryStore(self.cache_dir)
+        try:
+            columns = store.load(self.data_path)
+            if columns is None:
+                columns = store.build(self.data_path)
+                print(f"[load_draws] {self.data_path} から列形式の履歴を作成しました（{len(columns['date'])}件）")
+            return columns
+        except OSError as e:
+            print(f"[load_draws] 履歴ストアを使用できません。{self.data_path} を直接読み込みます: {e}")
+            return HistoryStore.from_records(self.data)
+    
+    @staticmethod
+    def draw_frame(draws: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        列形式の抽せん履歴から分析用のDataFrameを作成する（時系列特徴量も一括で計算）
+        
+        Args:
+            draws: HistoryStore形式の列
+        """
+        hundred, ten, one = (draws['digits'][:, i].astype(np.int64) for i in range(3))
+        days = draws['date'].astype('datetime64[D]')
+        years = days.astype('datetime64[Y]')
+        months = days.astype('datetime64[M]')
+        month = ((months - years).astype(np.int32) + 1)
+        
+        return pd.DataFrame({
+            'date': days.astype('datetime64[us]'),
+            'num': hundred * 100 + ten * 10 + one,
+            'hundred': hundred,
+            'ten': ten,
+            'one': one,
+            'weekday': ((draws['date'].astype(np.int64) + 3) % 7).astype(np.int32),  # 0=月曜日, 6=日曜日（1970-01-01は木曜日）
+            'month': month,
+            'day': ((days - months).astype(np.int32) + 1),
+            'year': (years.astype(np.int32) + 1970),
+            'quarter': ((month - 1) // 3 + 1).astype(np.int32),
+            'sum': hundred + ten + one,
+            'span': np.maximum(np.maximum(hundred, ten), one) - np.minimum(np.minimum(hundred, ten), one)
+        })
+    
     def load_data(self):
         """データを読み込む"""
-        with open(self.data_path, 'r', encoding='utf-8') as f:
-            self.data = json.load(f)
-        
-        # DataFrameに変換
-        records = []
-        for item in self.data:
-            num_str = str(item['num']).zfill(3)
-            records.append({
-                'date': item['date'],
-                'num': int(item['num']),
-                'hundred': int(num_str[0]),
-                'ten': int(num_str[1]),
-                'one': int(num_str[2])
-            })
-        
-        self.df = pd.DataFrame(records)
-        self.df['date'] = pd.to_datetime(self.df['date'])
-        self.df = self.df.sort_values('date').reset_index(drop=True)
-        
-        # 時系列特徴量を追加
-        self.df['weekday'] = self.df['date'].dt.dayofweek  # 0=月曜日, 6=日曜日
-        self.df['month'] = self.df['date'].dt.month
-        self.df['day'] = self.df['date'].dt.day
-        self.df['year'] = self.df['date'].dt.year
-        self.df['quarter'] = self.df['date'].dt.quarter
-        self.df['sum'] = self.df['hundred'] + self.df['ten'] + self.df['one']
-        self.df['span'] = self.df[['hundred', 'ten', 'one']].max(axis=1) - self.df[['hundred', 'ten', 'one']].min(axis=1)
+        self._data = None
+        self.draws = self.load_draws()
+        self.df = self.draw_frame(self.draws)
+        
+        # 派生キャッシュを無効化
+        self.data_version += 1
+        self._feature_cache = None
+        self._count_index = None
+        self.load_ledger()
+    
+    def append_draws(self, records: List[Dict[str, any]]):
+        """
+        data.jsonに追記済みの新しい抽せんをメモリ上のデータに反映する（全件は読み直さない）
+        
+        Args:
+            records: 追記したレコード（既存の最後の抽せん以降の日付のもの）
+        """
+        rows = HistoryStore.from_records(records)
+        start = len(self.df)
+        try:
+            self.draws = HistoryStore(self.cache_dir).append(self.data_path, start, rows)
+        except OSError as e:
+            # 次回の読み込み時にdata.jsonから作り直される
+            print(f"[append_draws] 履歴ストアに追記できません: {e}")
+            self.draws = {column: np.concatenate([self.draws[column], rows[column]]) for column in rows}
+        
+        new_rows = self.draw_frame(rows)
+        self.df = pd.concat([self.df, new_rows], ignore_index=True)
+        if self._data is not None:
+            self._data.extend(records)
+        # 出現回数のインデックスは追加分だけ加算する
+        if self._count_index is not None:
+            self._count_index.append(new_rows)
+        
+        # 派生キャッシュを無効化（位相・指標のストアは次回の読み込み時に新しい分だけ追記される）
+        self.data_version += 1
+        self._feature_cache = None
+        self.resolve_ledger()
+    
+    def count_index(self) -> DigitCountIndex:
+        """
+        各桁の出現回数のインデックス（初回に全件から作成し、以降はappend_drawsで差分を加算）
+        
+        Returns:
+            DigitCountIndex
+        """
+        if self._count_index is None:
+            self._count_index = DigitCountIndex.from_frame(self.df)
+        return self._count_index
+    
+    def load_ledger(self):
+        """
+        予測の台帳をメモリマップで読み込み、結果が出た予測の当せん番号を記録する
+        
+        台帳がない場合は、既定のデータを使っているときだけ予測履歴から作り直す。
+        """
+        try:
+            if (not self.ledger.exists() and self.docs_data_path() is not None
+                    and os.path.isdir(self.PREDICTION_HISTORY_DIR)):
+                runs = self.ledger.rebuild(self.PREDICTION_HISTORY_DIR)
+                print(f"[load_ledger] 予測履歴 {runs}回分から予測の台帳を作成しました")
+            self.ledger.load()
+        except (OSError, ValueError) as e:
+            print(f"[load_ledger] 予測の台帳を使用できません: {e}")
+        self.resolve_ledger()
+    
+    def resolve_ledger(self):
+        """予測の台帳のうち、結果が出た予測の当せん番号を記録する"""
+        try:
+            resolved = self.ledger.resolve(self.df['num'].values)
+            if resolved:
+                print(f"[resolve_ledger] {resolved}件の予測の当せん番号を記録しました")
+        except OSError as e:
+            print(f"[resolve_ledger] 予測の台帳に書き込めません: {e}")
+        self._ledger_stats = None
+    
+    def ledger_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        手法ごとの直近の予測の集計（予測の台帳から作成し、台帳が変わるまで再利用）
+        
+        結果が出た抽せんを対象にした行だけを使う。まだ結果が出ていない行（今回の予測対象の抽せんの行）を
+        含めると、同じデータでの再実行のたびに動的信頼度が変わってしまうため。
+        
+        Returns:
+            dict: {手法のキー: {'count': 行数, 'unique': 異なるストレート予測の数,
+                               'resolved': 結果が出た行数, 'straight' / 'box' / 'mini': 的中数}}
+        """
+        resolved = int(self.ledger.meta.get('resolved', 0))
+        key = (resolved, len(self.ledger.meta['methods']))
+        if self._ledger_stats is not None and self._ledger_stats[0] == key:
+            return self._ledger_stats[1]
+        
+        columns = self.ledger.columns
+        method = np.asarray(columns['method'][:resolved])
+        stats = {}
+        for code, name in enumerate(self.ledger.meta['methods']):
+            rows = np.flatnonzero(method == code)[-self.CONFIDENCE_LEDGER_WINDOW:]
+            predicted = np.asarray(columns['set'][rows]).astype(np.int64)
+            mini = np.asarray(columns['mini'][rows]).astype(np.int64)
+            actual = np.asarray(columns['actual'][rows]).astype(np.int64)
+            done = (actual >= 0) & (predicted >= 0)
+            predicted_digits = PatternCounter.encode(np.stack([predicted // 100, predicted // 10 % 10, predicted % 10], axis=1), box=True)
+            actual_digits = PatternCounter.encode(np.stack([actual // 100, actual // 10 % 10, actual % 10], axis=1), box=True)
+            stats[name] = {
+                'count': int((predicted >= 0).sum()),
+                'unique': int(np.unique(predicted[predicted >= 0]).size),
+                'resolved': int(done.sum()),
+                'straight': int((done & (predicted == actual)).sum()),
+                'box': int((done & (predicted_digits == actual_digits)).sum()),
+                'mini': int((done & (mini >= 0) & (mini == actual % 100)).sum())
+            }
+        
+        self._ledger_stats = (key, stats)
+        return stats
+    
+    def confidence_context(self, patterns: Optional[Dict[str, any]] = None,
+                           trends: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+        """
+        動的信頼度の計算に使う頻出パターン・トレンドの要約（データが変わるまで再利用）
+        
+        Args:
+            patterns: 実行済みのextract_frequent_patternsの結果（上位10件以上、Noneの場合は計算）
+            trends: 実行済みのanalyze_trendsの結果（Noneの場合は計算）
+        
+        Returns:
+            dict: {'set_rank': {番号: 順位（上位10位まで）}, 'trend_hundred': 百の位の短期トレンド, 'last_hundred': 直近の百の位}
+        """
+        if self._confidence_context is not None and self._confidence_context[0] == self.data_version:
+            return self._confidence_context[1]
+        
+        if patterns is None or len(patterns.get('set_top', {})) < 10:
+            patterns = self.extract_frequent_patterns(top_n=10)
+        if trends is None:
+            trends = self.analyze_trends()
+        context = {
+            'set_rank': {number: rank + 1 for rank, number in enumerate(list(patterns.get('set_top', {}))[:10])},
+            'trend_hundred': trends.get('hundred', {}).get('short', {}).get('trend'),
+            'last_hundred': int(self.df['hundred'].iloc[-1])
+        }
+        self._confidence_context = (self.data_version, context)
+        return context
+    
+    def docs_data_path(self) -> Optional[str]:
+        """公開用のdocs/public/data.jsonのパス（data_pathが既定の場所でない場合はNone）"""
+        if self.data_path in ("public/data.json", "../public/data.json"):
+            return "docs/public/data.json"
+        return None
     
     def update_data(self) -> Dict[str, any]:
         """
         Webから最新データを取得してデータファイルを更新する
         public/data.json と docs/public/data.json の両方に追記する
         
+        最新の抽せんが既存の最後の抽せん以降の日付であれば（通常の日次更新）、
+        両ファイルの末尾に追記し、メモリ上のデータも追記分だけ更新する。
+        それより前の日付（過去データの補完など）の場合は全体を並べ替えて書き直す。
+        いずれもファイルは一時ファイル経由で置き換える。
+        
         Returns:
             dict: {
                 'updated': bool,  # データが更新されたかどうか
@@ -462,34 +2745,31 @@ class NumbersAnalyzer:
             }
         """
         print("[update_data] 最新の当選結果を取得中...")
-        previous_count = len(self.data)
+        previous_count = len(self.df)
         latest_result = fetch_latest_result()
         
+        not_updated = {
+            'updated': False,
+            'new_records_count': 0,
+            'previous_count': previous_count,
+            'current_count': previous_count
+        }
+        
         if latest_result is None:
             print("[update_data] 最新データの取得に失敗しました。既存データで分析を続行します。")
-            return {
-                'updated': False,
-                'new_records_count': 0,
-                'previous_count': previous_count,
-                'current_count': previous_count
-            }
+            return not_updated
         
-        # 重複チェック: 最新のデータが既に存在するか確認
         latest_date = latest_result['date']
         latest_num = latest_result['num']
         
-        # 既存データに同じ日付と番号の組み合わせがあるかチェック
-        existing_dates = {item['date'] for item in self.data}
-        existing_records = {(item['date'], str(item['num']).zfill(3)) for item in self.data}
-        
-        if (latest_date, latest_num) in existing_records:
+        # 重複チェック: 日付順に並んでいるので、同じ日付の範囲だけを二分探索で調べる
+        day = np.datetime64(latest_date, 'D').astype(np.int64)
+        dates = self.draws['date']
+        lo, hi = np.searchsorted(dates, [day, day + 1])
+        latest_digits = [int(c) for c in str(latest_num).zfill(3)]
+        if any(list(self.draws['digits'][i]) == latest_digits for i in range(lo, hi)):
             print(f"[update_data] 最新データは既に存在します: {latest_date} - {latest_num}")
-            return {
-                'updated': False,
-                'new_records_count': 0,
-                'previous_count': previous_count,
-                'current_count': previous_count
-            }
+            return not_updated
         
         # 新しいデータを追加（numは文字列として保存）
         new_record = {
@@ -499,78 +2779,56 @@ class NumbersAnalyzer:
         # 回号があれば追加
         if 'issue' in latest_result:
             new_record['issue'] = latest_result['issue']
-            
-        self.data.append(new_record)
-        
-        # 日付でソート
-        self.data.sort(key=lambda x: x['date'])
-        
-        # public/data.json に保存
-        with open(self.data_path, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
         
-        print(f"[update_data] {self.data_path} を更新しました: {latest_date} - {latest_num}")
+        docs_data_path = self.docs_data_path()
         
-        # docs/public/data.json にも追記（形式を維持）
-        docs_data_path = None
-        if self.data_path == "public/data.json":
-            docs_data_path = "docs/public/data.json"
-        elif self.data_path == "../public/data.json":
-            docs_data_path = "docs/public/data.json"
-        
-        if docs_data_path:
-            try:
-                # docs/public/data.json が存在するか確認
-                if os.path.exists(docs_data_path):
-                    # 既存ファイルを読み込む
-                    with open(docs_data_path, 'r', encoding='utf-8') as f:
-                        docs_data = json.load(f)
-                    
-                    # データが空または不足している場合は、public/data.jsonから同期
-                    if len(docs_data) == 0 or len(docs_data) < len(self.data):
-                        print(f"[update_data] {docs_data_path} のデータが不足しています。{self.data_path} から同期します...")
-                        # public/data.jsonの全データをコピー
-                        docs_data = self.data.copy()
-                        print(f"[update_data] {len(docs_data)} 件のデータを同期しました")
+        if hi == len(dates) and append_json_records(self.data_path, [new_record], style='indent'):
+            # 通常の日次更新: 既存の最後の抽せん以降なので末尾に追記
+            print(f"[update_data] {self.data_path} に追記しました: {latest_date} - {latest_num}")
+            previous_tail = None
+            if previous_count > 0:
+                previous_tail = (str(dates[-1].astype('datetime64[D]')),
+                                 ''.join(str(d) for d in self.draws['digits'][-1]))
+            self.append_draws([new_record])
+            
+            if docs_data_path:
+                try:
+                    # docs側の最後のレコードがpublic側の追記前の最後と一致していれば追記、それ以外は同期し直す
+                    docs_tail = read_last_json_record(docs_data_path) if os.path.exists(docs_data_path) else None
+                    if (docs_tail is not None and previous_tail is not None
+                            and (docs_tail.get('date'), str(docs_tail.get('num')).zfill(3)) == previous_tail
+                            and append_json_records(docs_data_path, [new_record], style='lines')):
+                        print(f"[update_data] {docs_data_path} に新しいデータを追加しました: {latest_date} - {latest_num}")
                     else:
-                        # 重複チェック
-                        docs_existing_records = {(item['date'], str(item['num']).zfill(3)) for item in docs_data}
-                        if (latest_date, latest_num) not in docs_existing_records:
-                            # 新しいデータを追加
-                            docs_data.append(new_record)
-                            # 日付でソート
-                            docs_data.sort(key=lambda x: x['date'])
-                            print(f"[update_data] {docs_data_path} に新しいデータを追加しました: {latest_date} - {latest_num}")
-                        else:
-                            print(f"[update_data] {docs_data_path} には既にデータが存在します: {latest_date} - {latest_num}")
-                else:
-                    # ファイルが存在しない場合は、public/data.jsonから全データをコピー
-                    print(f"[update_data] {docs_data_path} が存在しません。{self.data_path} から同期します...")
-                    docs_data = self.data.copy()
-                    # ディレクトリが存在しない場合は作成
-                    os.makedirs(os.path.dirname(docs_data_path), exist_ok=True)
-                
-                # docs/public/data.json の形式（1行1オブジェクト）で保存
-                with open(docs_data_path, 'w', encoding='utf-8') as f:
-                    f.write('[\n')
-                    for i, item in enumerate(docs_data):
-                        # 1行に1オブジェクトの形式で出力
-                        json_str = json.dumps(item, ensure_ascii=False)
-                        if i < len(docs_data) - 1:
-                            f.write(f'    {json_str},\n')
-                        else:
-                            f.write(f'    {json_str}\n')
-                    f.write(']')
-                print(f"[update_data] {docs_data_path} を更新しました（{len(docs_data)} 件）")
-            except Exception as e:
-                print(f"[update_data] {docs_data_path} の更新に失敗しました: {e}")
-                import traceback
-                print(f"[update_data] トレースバック: {traceback.format_exc()}")
+                        print(f"[update_data] {docs_data_path} が {self.data_path} と一致しないため同期します...")
+                        self.sync_docs_data(docs_data_path)
+                except Exception as e:
+                    print(f"[update_data] {docs_data_path} の更新に失敗しました: {e}")
+                    import traceback
+                    print(f"[update_data] トレースバック: {traceback.format_exc()}")
+        else:
+            # 過去の日付のデータ: 全体を並べ替えて書き直す
+            data = self.data
+            data.append(new_record)
+            data.sort(key=lambda x: x['date'])
+            write_text_atomic(self.data_path, format_data_json(data, style='indent'))
+            print(f"[update_data] {self.data_path} を更新しました: {latest_date} - {latest_num}")
+            
+            if docs_data_path:
+                try:
+                    self.sync_docs_data(docs_data_path)
+                except Exception as e:
+                    print(f"[update_data] {docs_data_path} の更新に失敗しました: {e}")
+                    import traceback
+                    print(f"[update_data] トレースバック: {traceback.format_exc()}")
+            
+            # DataFrameを再読み込み
+            self.load_data()
         
-        # DataFrameを再読み込み
-        self.load_data()
+        # 技術指標の状態を新しい抽せん分だけ進める
+        self.load_indicator_store()
         
-        current_count = len(self.data)
+        current_count = len(self.df)
         new_records_count = current_count - previous_count
         
         return {
@@ -580,6 +2838,17 @@ class NumbersAnalyzer:
             'current_count': current_count
         }
     
+    def sync_docs_data(self, docs_data_path: str):
+        """
+        docs/public/data.json を public/data.json の全データで書き直す（1行1オブジェクトの形式）
+        
+        Args:
+            docs_data_path: docs/public/data.json のパス
+        """
+        os.makedirs(os.path.dirname(docs_data_path), exist_ok=True)
+        write_text_atomic(docs_data_path, format_data_json(self.data, style='lines'))
+        print(f"[update_data] {docs_data_path} を更新しました（{len(self.data)} 件）")
+    
     def calculate_gap(self, window: int = 10) -> pd.Series:
         """
         Gap（前回との差）を計算
@@ -606,41 +2875,35 @@ class NumbersAnalyzer:
         """
         周期性分析（曜日・月次パターン）
         
+        データのバージョンごとに1回だけ計算する（predict_with_periodicityと共有）。
+        返す辞書はキャッシュそのものなので、呼び出し側で変更しないこと。
+        
         Returns:
-            周期性パターンの辞書
+            周期性パターンの辞書（数字のキーはint）
         """
-        patterns = {}
+        if self._periodicity_cache is not None and self._periodicity_cache[0] == self.data_version:
+            return self._periodicity_cache[1]
         
-        # 曜日パターン
-        weekday_patterns = {}
-        for pos in ['hundred', 'ten', 'one']:
-            weekday_patterns[pos] = {}
-            for weekday in range(7):
-                weekday_data = self.df[self.df['weekday'] == weekday][pos]
-                if len(weekday_data) > 0:
-                    weekday_patterns[pos][weekday] = weekday_data.value_counts(normalize=True).to_dict()
-        patterns['weekday'] = weekday_patterns
-        
-        # 月次パターン
-        monthly_patterns = {}
-        for pos in ['hundred', 'ten', 'one']:
-            monthly_patterns[pos] = {}
-            for month in range(1, 13):
-                month_data = self.df[self.df['month'] == month][pos]
-                if len(month_data) > 0:
-                    monthly_patterns[pos][month] = month_data.value_counts(normalize=True).to_dict()
-        patterns['monthly'] = monthly_patterns
-        
-        # 四半期パターン
-        quarter_patterns = {}
-        for pos in ['hundred', 'ten', 'one']:
-            quarter_patterns[pos] = {}
-            for quarter in range(1, 5):
-                quarter_data = self.df[self.df['quarter'] == quarter][pos]
-                if len(quarter_data) > 0:
-                    quarter_patterns[pos][quarter] = quarter_data.value_counts(normalize=True).to_dict()
-        patterns['quarterly'] = quarter_patterns
+        index = self.count_index()
+        patterns = {}
         
+        # 曜日（0-6）・月（1-12）・四半期（1-4）ごとの出現割合（出現回数の多い順）
+        for key, name in [('weekday', 'weekday'), ('monthly', 'month'), ('quarterly', 'quarter')]:
+            _, size, offset = DigitCountIndex.CALENDARS[name]
+            counts = index.calendar_counts[name]
+            first_seen = index.calendar_first_seen[name]
+            patterns[key] = {}
+            for p, pos in enumerate(DigitCountIndex.POSITIONS):
+                patterns[key][pos] = {}
+                for value in range(size):
+                    total = int(counts[p, value].sum())
+                    if total > 0:
+                        order = PatternCounter.rank(counts[p, value], first_seen[p, value])
+                        patterns[key][pos][value + offset] = {
+                            int(digit): int(counts[p, value, digit]) / total for digit in order
+                        }
+        
+        self._periodicity_cache = (self.data_version, patterns)
         return patterns
     
     def analyze_correlations(self) -> Dict[str, float]:
@@ -681,28 +2944,23 @@ class NumbersAnalyzer:
         Returns:
             頻出パターンの辞書
         """
+        index = self.count_index()
         patterns = {}
         
         # 3桁コンボ
-        combo_3 = self.df[['hundred', 'ten', 'one']].apply(
-            lambda x: f"{int(x['hundred'])}{int(x['ten'])}{int(x['one'])}", axis=1
-        )
-        patterns['set_top'] = combo_3.value_counts().head(top_n).to_dict()
+        patterns['set_top'] = PatternCounter.top(index.triple_counts, index.triple_first_seen, top_n, 3)
         
         # 2桁コンボ（下2桁）
-        combo_2 = self.df[['ten', 'one']].apply(
-            lambda x: f"{int(x['ten'])}{int(x['one'])}", axis=1
-        )
-        patterns['mini_top'] = combo_2.value_counts().head(top_n).to_dict()
+        patterns['mini_top'] = PatternCounter.top(index.pair_counts['ten_one'], index.pair_first_seen['ten_one'], top_n, 2)
         
         # 百の位と十の位の組み合わせ
-        combo_hundred_ten = self.df[['hundred', 'ten']].apply(
-            lambda x: f"{int(x['hundred'])}{int(x['ten'])}", axis=1
-        )
-        patterns['hundred_ten_top'] = combo_hundred_ten.value_counts().head(top_n).to_dict()
+        patterns['hundred_ten_top'] = PatternCounter.top(index.pair_counts['hundred_ten'], index.pair_first_seen['hundred_ten'], top_n, 2)
         
         # 十の位と一の位の組み合わせ
-        patterns['ten_one_top'] = combo_2.value_counts().head(top_n).to_dict()
+        patterns['ten_one_top'] = dict(patterns['mini_top'])
+        
+        # ボックス（順不同の3桁、昇順に並べた番号）
+        patterns['box_top'] = PatternCounter.top(index.box_counts, index.box_first_seen, top_n, 3)
         
         return patterns
     
@@ -713,30 +2971,12 @@ class NumbersAnalyzer:
         Returns:
             ギャップ分析結果の辞書
         """
+        index = self.count_index()
         gap_analysis = {}
         
-        for pos in ['hundred', 'ten', 'one']:
-            gap_data = {}
-            
-            # 各数字の出現間隔を計算
-            for digit in range(10):
-                digit_indices = self.df[self.df[pos] == digit].index.tolist()
-                if len(digit_indices) > 1:
-                    gaps = [digit_indices[i+1] - digit_indices[i] for i in range(len(digit_indices)-1)]
-                    gap_data[digit] = {
-                        'mean': float(np.mean(gaps)) if gaps else 0.0,
-                        'median': float(np.median(gaps)) if gaps else 0.0,
-                        'std': float(np.std(gaps)) if gaps else 0.0,
-                        'min': int(min(gaps)) if gaps else 0,
-                        'max': int(max(gaps)) if gaps else 0,
-                        'count': len(gaps)
-                    }
-                else:
-                    gap_data[digit] = {
-                        'mean': 0.0, 'median': 0.0, 'std': 0.0, 'min': 0, 'max': 0, 'count': 0
-                    }
-            
-            gap_analysis[pos] = gap_data
+        # 各数字の出現間隔の統計（インデックスの間隔ヒストグラムから計算）
+        for p, pos in enumerate(DigitCountIndex.POSITIONS):
+            gap_analysis[pos] = {digit: index.gap_stats(p, digit) for digit in range(10)}
         
         return gap_analysis
     
@@ -876,9 +3116,7 @@ class NumbersAnalyzer:
                     'one_mean': float(cluster_data['one'].mean()),
                     'sum_mean': float(cluster_data['sum'].mean()),
                     'span_mean': float(cluster_data['span'].mean()),
-                    'most_common_set': cluster_data[['hundred', 'ten', 'one']].apply(
-                        lambda x: f"{int(x['hundred'])}{int(x['ten'])}{int(x['one'])}", axis=1
-                    ).value_counts().head(5).to_dict()
+                    'most_common_set': PatternCounter.most_common(cluster_data[['hundred', 'ten', 'one']].to_numpy(), 5)
                 }
         
         # 最新データがどのクラスタに属するか
@@ -952,13 +3190,47 @@ class NumbersAnalyzer:
         return frequency_analysis
     
     def create_advanced_features(self) -> pd.DataFrame:
+        """
+        高度な特徴量を取得（データのバージョンごとに1回だけ計算）
+        
+        返すDataFrameはキャッシュのコピーのため、呼び出し側で変更してもキャッシュには影響しない
+        （pandas 2系ではCopy-on-Writeが既定で無効のため、浅いコピーでは共有されてしまう）。
+        読み取り専用のビューではなく毎回全体をコピーするため、呼び出しごとに特徴量の表1つ分の
+        コピーとメモリが必要になるが、特徴量の再計算よりは十分に小さい。
+        
+        Returns:
+            特徴量が追加されたDataFrame
+        """
+        if self._feature_cache is not None and self._feature_cache[0] == self.data_version:
+            self.feature_cache_stats['hits'] += 1
+        else:
+            self.feature_cache_stats['misses'] += 1
+            self._feature_cache = (self.data_version, self._compute_advanced_features())
+        
+        return self._feature_cache[1].copy()
+    
+    def _compute_advanced_features(self) -> pd.DataFrame:
         """
         高度な特徴量を作成（移動平均、EMA、RSI、MACD、ボリンジャーバンド）
         
+        指標は指標ストアから読み込む（新しい抽せん分のみ逐次計算）。
+        
         Returns:
             特徴量が追加されたDataFrame
         """
         df = self.df.copy()
+        indicators = pd.DataFrame(np.asarray(self.load_indicator_store()),
+                                  columns=IndicatorEngine.column_names(), index=df.index)
+        return pd.concat([df, indicators], axis=1)
+    
+    def _compute_indicator_frame(self) -> pd.DataFrame:
+        """
+        技術指標を全件から計算する（逐次計算の初期化と検証に使用）
+        
+        Returns:
+            指標の列だけを持つDataFrame
+        """
+        df = self.df.copy()
         
         # 移動平均（MA）
         for window in [5, 10, 20, 50]:
@@ -996,68 +3268,184 @@ class NumbersAnalyzer:
             df[f'{pos}_bb_width'] = df[f'{pos}_bb_upper'] - df[f'{pos}_bb_lower']
             df[f'{pos}_bb_position'] = (df[pos] - df[f'{pos}_bb_lower']) / (df[f'{pos}_bb_width'] + 1e-10)
         
-        return df
+        return df[IndicatorEngine.column_names()]
     
-    def predict_with_random_forest(self) -> Dict[str, any]:
+    def load_indicator_store(self) -> np.ndarray:
         """
-        ランダムフォレストによる予測
+        指標ストアを読み込む（未計算の抽せん分だけ状態を進めて追記）
+        
+        指標の行とIndicatorEngineの状態を cache_dir/indicators.* に保存する。
+        保存済みの履歴が一致すれば新しい抽せん1件あたり定数時間で更新し、
+        一致しない場合は全件計算から作り直す。
         
         Returns:
-            予測結果の辞書
+            np.ndarray: shape (len(self.df), 指標の列数) の配列
         """
-        from sklearn.ensemble import RandomForestRegressor
+        n = len(self.df)
+        columns = IndicatorEngine.column_names()
+        store = DrawStore(self.cache_dir, "indicators", len(columns))
+        
+        try:
+            cached, meta = store.load_meta(self.history_hash, n)
+            if cached > 0 and 'state' not in meta:
+                cached = 0
+            
+            if cached == 0:
+                indicators = self._compute_indicator_frame()
+                engine = IndicatorEngine.from_frame(self.df, indicators)
+                store.write(0, indicators.values, self.history_hash(n), state=engine.state)
+                print(f"[load_indicator_store] 指標を全件計算しました（{n}件）")
+            elif cached < n:
+                engine = IndicatorEngine(meta['state'])
+                digits = self.df[['hundred', 'ten', 'one']].values[cached:]
+                rows = np.array([engine.step(d) for d in digits])
+                store.write(cached, rows, self.history_hash(n), state=engine.state)
+                print(f"[load_indicator_store] 指標を{len(rows)}件追加しました（保存済み: {cached}件）")
+            
+            return store.read(n)
+        
+        except OSError as e:
+            print(f"[load_indicator_store] 指標ストアを使用できません。全件を計算します: {e}")
+            return self._compute_indicator_frame().values
+    
+    def verify_indicators(self, tolerance: float = 1e-9) -> bool:
+        """
+        指標ストアの値を全件計算の結果と照合する
+        
+        Args:
+            tolerance: 許容する最大絶対誤差
+        
+        Returns:
+            bool: 全ての値が許容誤差内で一致した場合True
+        """
+        stored = np.asarray(self.load_indicator_store())
+        expected = self._compute_indicator_frame().values
+        
+        same_nan = np.isnan(stored) == np.isnan(expected)
+        diff = np.abs(np.nan_to_num(stored) - np.nan_to_num(expected))
+        max_diff = float(diff.max()) if diff.size > 0 else 0.0
+        ok = bool(same_nan.all() and max_diff <= tolerance)
+        
+        print(f"[verify_indicators] 最大誤差: {max_diff:.3e}（{'一致' if ok else '不一致'}）")
+        if not ok:
+            columns = IndicatorEngine.column_names()
+            bad = np.flatnonzero(((diff > tolerance) | ~same_nan).any(axis=0))
+            print(f"[verify_indicators] 不一致の列: {[columns[i] for i in bad]}")
+        return ok
+    
+    def build_training_matrix(self, df_features: Optional[pd.DataFrame] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        決定木系モデル共通の学習行列を作成する
         
-        # 特徴量を作成（高速化のため最新データのみを使用）
-        window_size = min(self.PREDICTION_PAST_WINDOW_SIZE, len(self.df))
+        各行は「過去window_size回の基本データ（百・十・一・合計・範囲）」と
+        「現在時点の技術指標（MA20・RSI・MACD）」からなる。過去データ部分は
+        連続配列に対するスライディングウィンドウで一括生成する。
         
-        # 高度な特徴量を含むDataFrameを取得
-        df_features = self.create_advanced_features()
+        Args:
+            df_features: create_advanced_features() の結果（Noneの場合は作成）
+        
+        Returns:
+            tuple: (特徴量行列 float32 (n_samples, n_features),
+                    目的変数 (n_samples, 3),
+                    特徴量名のリスト)
+        """
+        if df_features is None:
+            df_features = self.create_advanced_features()
+        
+        n = len(df_features)
+        window_size = min(self.PREDICTION_PAST_WINDOW_SIZE, n)
         
         # 高速化のため、最新N件のデータのみを使用
-        start_idx = max(window_size, len(df_features) - self.PREDICTION_MAX_TRAINING_SAMPLES)
+        start_idx = max(window_size, n - self.PREDICTION_MAX_TRAINING_SAMPLES)
+        n_samples = n - start_idx
         
-        features = []
-        targets = []
-        
-        # 最新データから学習データを作成（start_idx以降のデータのみを使用）
-        for i in range(start_idx, len(df_features)):
-            feature = []
-            # 過去window_size回の基本データ
-            for j in range(window_size):
-                idx = i - window_size + j
-                feature.extend([
-                    df_features.iloc[idx]['hundred'],
-                    df_features.iloc[idx]['ten'],
-                    df_features.iloc[idx]['one'],
-                    df_features.iloc[idx]['sum'],
-                    df_features.iloc[idx]['span']
-                ])
-            
-            # 現在の特徴量（移動平均、RSI、MACDなど）
-            if not pd.isna(df_features.iloc[i]['hundred_ma20']):
-                feature.extend([
-                    df_features.iloc[i]['hundred_ma20'],
-                    df_features.iloc[i]['ten_ma20'],
-                    df_features.iloc[i]['one_ma20'],
-                    df_features.iloc[i]['hundred_rsi'],
-                    df_features.iloc[i]['ten_rsi'],
-                    df_features.iloc[i]['one_rsi'],
-                    df_features.iloc[i]['hundred_macd'],
-                    df_features.iloc[i]['ten_macd'],
-                    df_features.iloc[i]['one_macd']
-                ])
-            else:
-                # NaNの場合は0で埋める
-                feature.extend([0.0] * 9)
-            
-            features.append(feature)
-            targets.append([
-                df_features.iloc[i]['hundred'],
-                df_features.iloc[i]['ten'],
-                df_features.iloc[i]['one']
-            ])
+        feature_names = []
+        for j in range(window_size):
+            feature_names.extend([f'past_{j}_{col}' for col in self.LAG_FEATURE_COLUMNS])
+        feature_names.extend(self.INDICATOR_FEATURE_COLUMNS)
+        
+        # 過去window_size回の基本データ: 行iはインデックス i-window_size .. i-1
+        base = np.ascontiguousarray(df_features[self.LAG_FEATURE_COLUMNS].values, dtype=np.float32)
+        windows = np.lib.stride_tricks.sliding_window_view(base, window_size, axis=0)
+        lag_block = windows[start_idx - window_size:n - window_size].transpose(0, 2, 1)
+        lag_block = lag_block.reshape(n_samples, window_size * len(self.LAG_FEATURE_COLUMNS))
+        
+        # 現在の特徴量（MA20が未定義の行は0で埋める）
+        indicators = df_features[self.INDICATOR_FEATURE_COLUMNS].values[start_idx:].astype(np.float32)
+        indicators[np.isnan(df_features['hundred_ma20'].values[start_idx:])] = 0.0
+        
+        features = np.nan_to_num(np.hstack([lag_block, indicators]), nan=0.0)
+        targets = np.nan_to_num(df_features[['hundred', 'ten', 'one']].values[start_idx:].astype(np.float64), nan=0.0)
+        
+        return features, targets, feature_names
+    
+    def base_setting(self, name: str):
+        """
+        軽量設定で上書きされる前の定数の値（モデルのスキーマ・保存するモデルの大きさに使う）
+        
+        Args:
+            name: クラス定数の名前
+        """
+        return self.base_settings.get(name, getattr(self, name))
+    
+    def fit_persistent_model(self, name: str, schema: Dict[str, any], train_new: Callable[[], any],
+                             warm_start: Callable[[any], any]) -> Tuple[any, str]:
+        """
+        保存済みモデルから継続学習する（使えない場合は最初から学習して保存）
+        
+        軽量設定で実行中（base_settingsがある場合）も通常のモデルから継続学習して保存するが、
+        最初から学習したモデルは軽量設定の大きさのため保存しない（次の通常の実行で学習し直す）。
+        schemaは軽量設定の影響を受けないよう、base_settingの値で作る。
+        
+        Args:
+            name: モデル名（ModelStoreのディレクトリ名）
+            schema: 特徴量名・ハイパーパラメータなど、変わったら再学習が必要な値
+            train_new: 最初から学習したモデルを返す関数
+            warm_start: 保存済みモデルを受け取り、新しい学習窓で継続学習したモデルを返す関数
+        
+        Returns:
+            tuple: (モデル, 更新方法 'new' / 'warm_start' / 'reused')
+        """
+        n = len(self.df)
+        store = ModelStore(self.cache_dir, name, schema)
+        model, meta = store.load(self.history_hash, n, self.MODEL_MAX_AGE_DAYS)
+        
+        if model is not None and meta['count'] == n:
+            # 前回から抽せんが増えていなければそのまま使う
+            return model, 'reused'
+        
+        if model is None:
+            model = train_new()
+            if self.base_settings:
+                print(f"[fit_persistent_model] {name} は軽量設定で学習したため保存しません")
+                return model, 'new'
+            meta = {'created_at': time.time(), 'warm_starts': 0}
+            update = 'new'
+        else:
+            model = warm_start(model)
+            meta['warm_starts'] = meta.get('warm_starts', 0) + 1
+            update = 'warm_start'
         
-        if len(features) < 10:
+        meta.update({'count': n, 'history_hash': self.history_hash(n), 'updated_at': time.time()})
+        try:
+            store.save(model, meta)
+        except OSError as e:
+            print(f"[fit_persistent_model] {name} を保存できません: {e}")
+        return model, update
+    
+    def predict_with_random_forest(self) -> Dict[str, any]:
+        """
+        ランダムフォレストによる予測
+        
+        Returns:
+            予測結果の辞書
+        """
+        from sklearn.ensemble import RandomForestRegressor
+        
+        # 共通の学習行列を作成（過去データ + 技術指標）
+        features_array, targets_array, feature_names = self.build_training_matrix()
+        
+        if len(features_array) < 10:
             # データが少なすぎる場合は簡易予測を返す
             last_hundred = int(self.df.iloc[-1]['hundred'])
             last_ten = int(self.df.iloc[-1]['ten'])
@@ -1072,23 +3460,28 @@ class NumbersAnalyzer:
                 'feature_importance': []
             }
         
-        features_array = np.array(features)
-        targets_array = np.array(targets)
-        
-        # NaNを0で埋める
-        features_array = np.nan_to_num(features_array, nan=0.0)
-        targets_array = np.nan_to_num(targets_array, nan=0.0)
-        
-        # ランダムフォレストで学習
-        rf = RandomForestRegressor(n_estimators=self.RF_N_ESTIMATORS, random_state=42, max_depth=self.RF_MAX_DEPTH, n_jobs=-1)
-        rf.fit(features_array, targets_array)
+        # ランダムフォレストで学習（保存済みの森があれば新しい木を追加し、同じ数の古い木を捨てる）
+        def train_new():
+            rf = RandomForestRegressor(n_estimators=self.RF_N_ESTIMATORS, random_state=42, max_depth=self.RF_MAX_DEPTH, n_jobs=-1)
+            rf.fit(features_array, targets_array)
+            return rf
+        
+        def warm_start(rf):
+            rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + self.RF_WARM_START_ESTIMATORS)
+            rf.fit(features_array, targets_array)
+            rf.estimators_ = rf.estimators_[-self.base_setting('RF_N_ESTIMATORS'):]
+            rf.n_estimators = len(rf.estimators_)
+            return rf
+        
+        rf, model_update = self.fit_persistent_model(
+            'random_forest',
+            {'features': feature_names, 'training_samples': self.PREDICTION_MAX_TRAINING_SAMPLES,
+             'n_estimators': self.base_setting('RF_N_ESTIMATORS'), 'max_depth': self.RF_MAX_DEPTH},
+            train_new, warm_start
+        )
         
         # 最新データから予測
-        latest_features = features[-1]
-        latest_features_array = np.array(latest_features).reshape(1, -1)
-        latest_features_array = np.nan_to_num(latest_features_array, nan=0.0)
-        
-        predicted = rf.predict(latest_features_array)[0]
+        predicted = rf.predict(features_array[-1:])[0]
         
         # 予測値を0-9の範囲に丸める
         predictions = {}
@@ -1102,24 +3495,6 @@ class NumbersAnalyzer:
         # 特徴量の重要度を取得
         feature_importance = rf.feature_importances_.tolist()
         
-        # 特徴量名を生成
-        feature_names = []
-        # 過去window_size回の基本データ（各回で5つの特徴量: hundred, ten, one, sum, span）
-        for j in range(window_size):
-            feature_names.extend([
-                f'past_{j}_hundred',
-                f'past_{j}_ten',
-                f'past_{j}_one',
-                f'past_{j}_sum',
-                f'past_{j}_span'
-            ])
-        # 高度な特徴量
-        feature_names.extend([
-            'hundred_ma20', 'ten_ma20', 'one_ma20',
-            'hundred_rsi', 'ten_rsi', 'one_rsi',
-            'hundred_macd', 'ten_macd', 'one_macd'
-        ])
-        
         # 特徴量の重要度と名前をペアにしてソート
         feature_importance_with_names = list(zip(feature_names, feature_importance))
         feature_importance_with_names.sort(key=lambda x: x[1], reverse=True)
@@ -1139,6 +3514,7 @@ class NumbersAnalyzer:
             'mini_prediction': mini_pred,
             'confidence': float(confidence),
             'reason': 'ランダムフォレストによる予測',
+            'model_update': model_update,  # 'new' / 'warm_start' / 'reused'
             'feature_importance': feature_importance,  # 全特徴量の重要度
             'feature_names': feature_names,  # 特徴量名
             'feature_importance_ranked': [
@@ -1168,56 +3544,10 @@ class NumbersAnalyzer:
             print("[predict_with_xgboost] XGBoostがインストールされていません")
             return None
         
-        # 特徴量を作成（定義済みの定数を使用）
-        window_size = min(self.PREDICTION_PAST_WINDOW_SIZE, len(self.df))
-        
-        # 高度な特徴量を含むDataFrameを取得
-        df_features = self.create_advanced_features()
-        
-        # 高速化のため、最新N件のデータのみを使用
-        start_idx = max(window_size, len(df_features) - self.PREDICTION_MAX_TRAINING_SAMPLES)
-        
-        features = []
-        targets = []
-        
-        # 最新データから学習データを作成（start_idx以降のデータのみを使用）
-        for i in range(start_idx, len(df_features)):
-            feature = []
-            # 過去window_size回の基本データ
-            for j in range(window_size):
-                idx = i - window_size + j
-                feature.extend([
-                    df_features.iloc[idx]['hundred'],
-                    df_features.iloc[idx]['ten'],
-                    df_features.iloc[idx]['one'],
-                    df_features.iloc[idx]['sum'],
-                    df_features.iloc[idx]['span']
-                ])
-            
-            # 現在の特徴量（移動平均、RSI、MACDなど）
-            if not pd.isna(df_features.iloc[i]['hundred_ma20']):
-                feature.extend([
-                    df_features.iloc[i]['hundred_ma20'],
-                    df_features.iloc[i]['ten_ma20'],
-                    df_features.iloc[i]['one_ma20'],
-                    df_features.iloc[i]['hundred_rsi'],
-                    df_features.iloc[i]['ten_rsi'],
-                    df_features.iloc[i]['one_rsi'],
-                    df_features.iloc[i]['hundred_macd'],
-                    df_features.iloc[i]['ten_macd'],
-                    df_features.iloc[i]['one_macd']
-                ])
-            else:
-                feature.extend([0.0] * 9)
-            
-            features.append(feature)
-            targets.append([
-                df_features.iloc[i]['hundred'],
-                df_features.iloc[i]['ten'],
-                df_features.iloc[i]['one']
-            ])
+        # 共通の学習行列を作成（過去データ + 技術指標）
+        features_array, targets_array, feature_names = self.build_training_matrix()
         
-        if len(features) < 10:
+        if len(features_array) < 10:
             last_hundred = int(self.df.iloc[-1]['hundred'])
             last_ten = int(self.df.iloc[-1]['ten'])
             last_one = int(self.df.iloc[-1]['one'])
@@ -1230,35 +3560,53 @@ class NumbersAnalyzer:
                 'reason': 'XGBoost（データ不足のため簡易予測）'
             }
         
-        features_array = np.array(features)
-        targets_array = np.array(targets)
-        
-        # NaNを0で埋める
-        features_array = np.nan_to_num(features_array, nan=0.0)
-        targets_array = np.nan_to_num(targets_array, nan=0.0)
-        
         # XGBoostで学習（各桁を個別に予測）
         predictions = {}
         feature_importances = []
         
-        for pos_idx, pos_name in enumerate(['hundred', 'ten', 'one']):
-            target_pos = targets_array[:, pos_idx]
-            
-            model = xgb.XGBRegressor(
-                n_estimators=self.XGB_N_ESTIMATORS,
+        def make_model(n_estimators):
+            return xgb.XGBRegressor(
+                n_estimators=n_estimators,
                 max_depth=self.XGB_MAX_DEPTH,
                 learning_rate=self.XGB_LEARNING_RATE,
                 random_state=42,
                 n_jobs=-1
             )
-            model.fit(features_array, target_pos)
+        
+        def train_new():
+            models = []
+            for pos_idx in range(3):
+                model = make_model(self.XGB_N_ESTIMATORS)
+                model.fit(features_array, targets_array[:, pos_idx])
+                models.append(model)
+            return models
+        
+        def warm_start(previous_models):
+            # 保存済みのブースターに新しい学習窓でラウンドを追加する（総ラウンド数の上限を超えるなら学習し直す）
+            rounds = previous_models[0].get_booster().num_boosted_rounds()
+            if rounds + self.XGB_WARM_START_ROUNDS > self.XGB_MAX_ROUNDS:
+                return train_new()
+            models = []
+            for pos_idx, previous in enumerate(previous_models):
+                model = make_model(self.XGB_WARM_START_ROUNDS)
+                model.fit(features_array, targets_array[:, pos_idx], xgb_model=previous.get_booster())
+                models.append(model)
+            return models
+        
+        models, model_update = self.fit_persistent_model(
+            'xgboost',
+            {'features': feature_names, 'training_samples': self.PREDICTION_MAX_TRAINING_SAMPLES,
+             'n_estimators': self.base_setting('XGB_N_ESTIMATORS'), 'max_depth': self.XGB_MAX_DEPTH,
+             'learning_rate': self.XGB_LEARNING_RATE, 'warm_start_rounds': self.XGB_WARM_START_ROUNDS,
+             'max_rounds': self.XGB_MAX_ROUNDS},
+            train_new, warm_start
+        )
+        
+        for pos_idx, pos_name in enumerate(['hundred', 'ten', 'one']):
+            model = models[pos_idx]
             
             # 最新データから予測
-            latest_features = features[-1]
-            latest_features_array = np.array(latest_features).reshape(1, -1)
-            latest_features_array = np.nan_to_num(latest_features_array, nan=0.0)
-            
-            predicted = model.predict(latest_features_array)[0]
+            predicted = model.predict(features_array[-1:])[0]
             predictions[pos_name] = int(np.round(np.clip(predicted, 0, 9)))
             
             # 特徴量重要度を保存（最初の桁のみ）
@@ -1277,6 +3625,7 @@ class NumbersAnalyzer:
             'mini_prediction': mini_pred,
             'confidence': float(confidence),
             'reason': 'XGBoost勾配ブースティングによる予測',
+            'model_update': model_update,
             'feature_importance': feature_importances
         }
     
@@ -1293,56 +3642,10 @@ class NumbersAnalyzer:
             print("[predict_with_lightgbm] LightGBMがインストールされていません")
             return None
         
-        # 特徴量を作成（高速化のため最新データのみを使用）
-        window_size = min(self.PREDICTION_PAST_WINDOW_SIZE, len(self.df))
-        
-        # 高度な特徴量を含むDataFrameを取得
-        df_features = self.create_advanced_features()
-        
-        # 高速化のため、最新N件のデータのみを使用
-        start_idx = max(window_size, len(df_features) - self.PREDICTION_MAX_TRAINING_SAMPLES)
-        
-        features = []
-        targets = []
-        
-        # 最新データから学習データを作成（start_idx以降のデータのみを使用）
-        for i in range(start_idx, len(df_features)):
-            feature = []
-            # 過去window_size回の基本データ（全データの場合は最大100回まで）
-            for j in range(window_size):
-                idx = i - window_size + j
-                feature.extend([
-                    df_features.iloc[idx]['hundred'],
-                    df_features.iloc[idx]['ten'],
-                    df_features.iloc[idx]['one'],
-                    df_features.iloc[idx]['sum'],
-                    df_features.iloc[idx]['span']
-                ])
-            
-            # 現在の特徴量（移動平均、RSI、MACDなど）
-            if not pd.isna(df_features.iloc[i]['hundred_ma20']):
-                feature.extend([
-                    df_features.iloc[i]['hundred_ma20'],
-                    df_features.iloc[i]['ten_ma20'],
-                    df_features.iloc[i]['one_ma20'],
-                    df_features.iloc[i]['hundred_rsi'],
-                    df_features.iloc[i]['ten_rsi'],
-                    df_features.iloc[i]['one_rsi'],
-                    df_features.iloc[i]['hundred_macd'],
-                    df_features.iloc[i]['ten_macd'],
-                    df_features.iloc[i]['one_macd']
-                ])
-            else:
-                feature.extend([0.0] * 9)
-            
-            features.append(feature)
-            targets.append([
-                df_features.iloc[i]['hundred'],
-                df_features.iloc[i]['ten'],
-                df_features.iloc[i]['one']
-            ])
+        # 共通の学習行列を作成（過去データ + 技術指標）
+        features_array, targets_array, feature_names = self.build_training_matrix()
         
-        if len(features) < 10:
+        if len(features_array) < 10:
             last_hundred = int(self.df.iloc[-1]['hundred'])
             last_ten = int(self.df.iloc[-1]['ten'])
             last_one = int(self.df.iloc[-1]['one'])
@@ -1355,19 +3658,6 @@ class NumbersAnalyzer:
                 'reason': 'LightGBM（データ不足のため簡易予測）'
             }
         
-        features_array = np.array(features)
-        targets_array = np.array(targets)
-        
-        # NaNを0で埋める
-        features_array = np.nan_to_num(features_array, nan=0.0)
-        targets_array = np.nan_to_num(targets_array, nan=0.0)
-        
-        # 特徴量名を生成（DataFrame用）
-        feature_names = []
-        for j in range(window_size):
-            feature_names.extend([f'past_{j}_hundred', f'past_{j}_ten', f'past_{j}_one', f'past_{j}_sum', f'past_{j}_span'])
-        feature_names.extend(['hundred_ma20', 'ten_ma20', 'one_ma20', 'hundred_rsi', 'ten_rsi', 'one_rsi', 'hundred_macd', 'ten_macd', 'one_macd'])
-        
         # DataFrameに変換（特徴量名を設定）
         df_features_train = pd.DataFrame(features_array, columns=feature_names)
         
@@ -1375,26 +3665,50 @@ class NumbersAnalyzer:
         predictions = {}
         feature_importances = []
         
-        for pos_idx, pos_name in enumerate(['hundred', 'ten', 'one']):
-            target_pos = targets_array[:, pos_idx]
-            
-            model = lgb.LGBMRegressor(
-                n_estimators=self.LGB_N_ESTIMATORS,
+        def make_model(n_estimators):
+            return lgb.LGBMRegressor(
+                n_estimators=n_estimators,
                 max_depth=self.LGB_MAX_DEPTH,
                 learning_rate=self.LGB_LEARNING_RATE,
                 random_state=42,
                 n_jobs=-1,
                 verbose=-1
             )
-            model.fit(df_features_train, target_pos)
+        
+        def train_new():
+            models = []
+            for pos_idx in range(3):
+                model = make_model(self.LGB_N_ESTIMATORS)
+                model.fit(df_features_train, targets_array[:, pos_idx])
+                models.append(model)
+            return models
+        
+        def warm_start(previous_models):
+            # 保存済みのブースターに新しい学習窓でラウンドを追加する（総ラウンド数の上限を超えるなら学習し直す）
+            rounds = previous_models[0].booster_.current_iteration()
+            if rounds + self.LGB_WARM_START_ROUNDS > self.LGB_MAX_ROUNDS:
+                return train_new()
+            models = []
+            for pos_idx, previous in enumerate(previous_models):
+                model = make_model(self.LGB_WARM_START_ROUNDS)
+                model.fit(df_features_train, targets_array[:, pos_idx], init_model=previous.booster_)
+                models.append(model)
+            return models
+        
+        models, model_update = self.fit_persistent_model(
+            'lightgbm',
+            {'features': feature_names, 'training_samples': self.PREDICTION_MAX_TRAINING_SAMPLES,
+             'n_estimators': self.base_setting('LGB_N_ESTIMATORS'), 'max_depth': self.LGB_MAX_DEPTH,
+             'learning_rate': self.LGB_LEARNING_RATE, 'warm_start_rounds': self.LGB_WARM_START_ROUNDS,
+             'max_rounds': self.LGB_MAX_ROUNDS},
+            train_new, warm_start
+        )
+        
+        for pos_idx, pos_name in enumerate(['hundred', 'ten', 'one']):
+            model = models[pos_idx]
             
             # 最新データから予測（DataFrameとして渡す）
-            latest_features = features[-1]
-            latest_features_array = np.array(latest_features).reshape(1, -1)
-            latest_features_array = np.nan_to_num(latest_features_array, nan=0.0)
-            df_features_pred = pd.DataFrame(latest_features_array, columns=feature_names)
-            
-            predicted = model.predict(df_features_pred)[0]
+            predicted = model.predict(df_features_train.iloc[-1:])[0]
             predictions[pos_name] = int(np.round(np.clip(predicted, 0, 9)))
             
             # 特徴量重要度を保存（最初の桁のみ）
@@ -1413,6 +3727,7 @@ class NumbersAnalyzer:
             'mini_prediction': mini_pred,
             'confidence': float(confidence),
             'reason': 'LightGBM勾配ブースティングによる予測',
+            'model_update': model_update,
             'feature_importance': feature_importances
         }
     
@@ -1478,54 +3793,10 @@ class NumbersAnalyzer:
         from sklearn.linear_model import RidgeCV
         from sklearn.ensemble import RandomForestRegressor
         
-        # 特徴量を作成（高速化のため最新データのみを使用）
-        window_size = min(self.PREDICTION_PAST_WINDOW_SIZE, len(self.df))
-        
-        df_features = self.create_advanced_features()
-        
-        # 高速化のため、最新N件のデータのみを使用
-        start_idx = max(window_size, len(df_features) - self.PREDICTION_MAX_TRAINING_SAMPLES)
-        
-        features = []
-        targets = []
-        
-        # 最新データから学習データを作成（start_idx以降のデータのみを使用）
-        for i in range(start_idx, len(df_features)):
-            feature = []
-            # 過去window_size回の基本データ（全データの場合は最大100回まで）
-            for j in range(window_size):
-                idx = i - window_size + j
-                feature.extend([
-                    df_features.iloc[idx]['hundred'],
-                    df_features.iloc[idx]['ten'],
-                    df_features.iloc[idx]['one'],
-                    df_features.iloc[idx]['sum'],
-                    df_features.iloc[idx]['span']
-                ])
-            
-            if not pd.isna(df_features.iloc[i]['hundred_ma20']):
-                feature.extend([
-                    df_features.iloc[i]['hundred_ma20'],
-                    df_features.iloc[i]['ten_ma20'],
-                    df_features.iloc[i]['one_ma20'],
-                    df_features.iloc[i]['hundred_rsi'],
-                    df_features.iloc[i]['ten_rsi'],
-                    df_features.iloc[i]['one_rsi'],
-                    df_features.iloc[i]['hundred_macd'],
-                    df_features.iloc[i]['ten_macd'],
-                    df_features.iloc[i]['one_macd']
-                ])
-            else:
-                feature.extend([0.0] * 9)
-            
-            features.append(feature)
-            targets.append([
-                df_features.iloc[i]['hundred'],
-                df_features.iloc[i]['ten'],
-                df_features.iloc[i]['one']
-            ])
+        # 共通の学習行列を作成（過去データ + 技術指標）
+        features_array, targets_array, feature_names = self.build_training_matrix()
         
-        if len(features) < 10:
+        if len(features_array) < 10:
             last_hundred = int(self.df.iloc[-1]['hundred'])
             last_ten = int(self.df.iloc[-1]['ten'])
             last_one = int(self.df.iloc[-1]['one'])
@@ -1538,16 +3809,7 @@ class NumbersAnalyzer:
                 'reason': 'スタッキング（データ不足のため簡易予測）'
             }
         
-        features_array = np.array(features)
-        targets_array = np.array(targets)
-        
-        # NaNを0で埋める
-        features_array = np.nan_to_num(features_array, nan=0.0)
-        targets_array = np.nan_to_num(targets_array, nan=0.0)
-        
         # LightGBMの警告を避けるため、pandas DataFrameに変換（特徴量名を付与）
-        n_features = features_array.shape[1]
-        feature_names = [f'feature_{i}' for i in range(n_features)]
         features_df = pd.DataFrame(features_array, columns=feature_names)
         
         # ベースモデルを定義（定義済みの定数を使用）
@@ -1612,12 +3874,7 @@ class NumbersAnalyzer:
             stacking_regressor.fit(features_df, target_pos)
             
             # 最新データから予測（DataFrame形式で）
-            latest_features = features[-1]
-            latest_features_array = np.array(latest_features).reshape(1, -1)
-            latest_features_array = np.nan_to_num(latest_features_array, nan=0.0)
-            latest_features_df = pd.DataFrame(latest_features_array, columns=feature_names)
-            
-            predicted = stacking_regressor.predict(latest_features_df)[0]
+            predicted = stacking_regressor.predict(features_df.iloc[-1:])[0]
             predictions[pos_name] = int(np.round(np.clip(predicted, 0, 9)))
         
         set_pred = f"{predictions['hundred']}{predictions['ten']}{predictions['one']}"
@@ -1718,64 +3975,103 @@ class NumbersAnalyzer:
         
         # 定義済みの定数を使用
         window_size = min(self.LSTM_WINDOW_SIZE, len(self.df) - 10)
-        predictions = {}
+        positions = ['hundred', 'ten', 'one']
+        n = len(self.df)
         
-        for pos in ['hundred', 'ten', 'one']:
+        # 3桁を3チャネルの系列として正規化（0-9を0-1に）
+        data = self.df[positions].values.astype(np.float32) / 9.0
+        
+        # シーケンスデータを一括作成: X[i] = data[i:i+window_size], y[i] = data[i+window_size]
+        windows = np.lib.stride_tricks.sliding_window_view(data, window_size, axis=0)[:-1]
+        X = np.ascontiguousarray(windows.transpose(0, 2, 1))
+        y = data[window_size:]
+        
+        predictions = {pos: int(self.df.iloc[-1][pos]) for pos in positions}
+        model_update = None
+        
+        if len(X) >= 10:
             try:
-                # データを正規化（0-9を0-1に）
-                data = self.df[pos].values.astype(float) / 9.0
-                
-                # シーケンスデータを作成
-                X, y = [], []
-                for i in range(window_size, len(data)):
-                    X.append(data[i-window_size:i])
-                    y.append(data[i])
-                
-                X = np.array(X)
-                y = np.array(y)
-                
-                if len(X) < 10:
-                    predictions[pos] = int(self.df.iloc[-1][pos])
-                    continue
-                
-                # LSTMモデルを構築（Inputレイヤーを使用して警告を回避）
+                # 3桁をまとめて予測する1つのLSTMモデル（Inputレイヤーを使用して警告を回避）
                 model = Sequential([
-                    Input(shape=(window_size, 1)),
+                    Input(shape=(window_size, len(positions))),
                     LSTM(50, return_sequences=True),
                     Dropout(0.2),
                     LSTM(50, return_sequences=False),
                     Dropout(0.2),
                     Dense(25),
-                    Dense(1)
+                    Dense(len(positions))
                 ])
-                
                 model.compile(optimizer=Adam(learning_rate=0.001), loss='mse', metrics=['mae'])
                 
-                # 学習（定義済みの定数を使用）
-                # FutureWarning（np.object）を抑制
-                X_reshaped = X.reshape((X.shape[0], X.shape[1], 1))
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore', category=FutureWarning, module='keras')
-                    model.fit(
-                        X_reshaped, y,
-                        epochs=self.LSTM_EPOCHS,
-                        batch_size=self.LSTM_BATCH_SIZE,
-                        verbose=0,
-                        validation_split=0.2
-                    )
+                # 保存済みの重みがあれば読み込み、直近のウィンドウだけで追加学習する
+                store = ModelStore(self.cache_dir, 'lstm', {
+                    'window_size': window_size, 'positions': positions, 'layers': [50, 50, 25]
+                })
+                weights_file = store.path('model.weights.h5')
+                meta = store.load_meta(self.history_hash, n, self.MODEL_MAX_AGE_DAYS)
+                if meta and os.path.exists(weights_file):
+                    try:
+                        model.load_weights(weights_file)
+                        model_update = 'reused' if meta['count'] == n else 'warm_start'
+                    except Exception as e:
+                        print(f"[predict_with_lstm] 保存済みの重みを読み込めないため学習し直します: {e}")
+                if model_update is None:
+                    model_update = 'new'
+                    meta = {'created_at': time.time(), 'warm_starts': 0}
+                
+                # 軽量設定（エポック数の削減）で最初から学習した重みは保存しない
+                save_weights = not (model_update == 'new' and self.base_settings)
+                if model_update != 'reused':
+                    if model_update == 'warm_start':
+                        X_train = X[-self.LSTM_FINE_TUNE_WINDOWS:]
+                        y_train = y[-self.LSTM_FINE_TUNE_WINDOWS:]
+                        epochs = self.LSTM_FINE_TUNE_EPOCHS
+                        meta['warm_starts'] = meta.get('warm_starts', 0) + 1
+                    else:
+                        X_train, y_train, epochs = X, y, self.LSTM_EPOCHS
+                    
+                    # バッチ化・先読みした入力パイプライン（末尾20%を検証用、validation_split=0.2と同じ分割）
+                    split = max(1, int(len(X_train) * 0.8))
+                    train_dataset = (tf.data.Dataset.from_tensor_slices((X_train[:split], y_train[:split]))
+                                     .shuffle(split)
+                                     .batch(self.LSTM_BATCH_SIZE)
+                                     .prefetch(tf.data.AUTOTUNE))
+                    validation_dataset = (tf.data.Dataset.from_tensor_slices((X_train[split:], y_train[split:]))
+                                          .batch(self.LSTM_BATCH_SIZE)
+                                          .prefetch(tf.data.AUTOTUNE))
+                    
+                    # 学習（FutureWarning（np.object）を抑制）
+                    with warnings.catch_warnings():
+                        warnings.filterwarnings('ignore', category=FutureWarning, module='keras')
+                        model.fit(
+                            train_dataset,
+                            validation_data=validation_dataset if split < len(X_train) else None,
+                            epochs=epochs,
+                            verbose=0
+                        )
+                
+                if model_update != 'reused' and save_weights:
+                    meta.update({'count': n, 'history_hash': self.history_hash(n), 'updated_at': time.time()})
+                    try:
+                        os.makedirs(store.directory, exist_ok=True)
+                        tmp_file = store.path(f"model.{os.getpid()}.weights.h5")
+                        model.save_weights(tmp_file)
+                        os.replace(tmp_file, weights_file)
+                        store.save_meta(meta)
+                    except OSError as e:
+                        print(f"[predict_with_lstm] 重みを保存できません: {e}")
                 
-                # 最新データから予測
-                last_sequence = data[-window_size:].reshape(1, window_size, 1)
-                predicted_normalized = model.predict(last_sequence, verbose=0)[0][0]
+                # 最新データから予測（1件だけなのでpredictを使わず直接呼び出す）
+                last_sequence = data[-window_size:][np.newaxis]
+                predicted_normalized = np.asarray(model(last_sequence, training=False))[0]
                 
                 # 正規化を解除して0-9の範囲に丸める
-                predicted = int(np.round(np.clip(predicted_normalized * 9, 0, 9)))
-                predictions[pos] = predicted
-                
+                for i, pos in enumerate(positions):
+                    predictions[pos] = int(np.round(np.clip(predicted_normalized[i] * 9, 0, 9)))
+            
             except Exception as e:
-                print(f"[predict_with_lstm] {pos}のLSTM予測に失敗: {e}")
                 # エラー時は最後の値を返す
-                predictions[pos] = int(self.df.iloc[-1][pos])
+                print(f"[predict_with_lstm] LSTM予測に失敗: {e}")
         
         set_pred = f"{predictions['hundred']}{predictions['ten']}{predictions['one']}"
         mini_pred = f"{predictions['ten']}{predictions['one']}"
@@ -1785,7 +4081,8 @@ class NumbersAnalyzer:
             'set_prediction': set_pred,
             'mini_prediction': mini_pred,
             'confidence': 0.76,
-            'reason': 'LSTM（長短期記憶）ニューラルネットワークによる予測'
+            'reason': 'LSTM（長短期記憶）ニューラルネットワークによる予測',
+            'model_update': model_update
         }
     
     def predict_with_conformal(self, base_method: str = 'lightgbm', alpha: float = 0.1) -> Dict[str, any]:
@@ -2086,57 +4383,26 @@ class NumbersAnalyzer:
         Returns:
             連続性分析結果の辞書
         """
+        index = self.count_index()
         continuity_analysis = {}
         
-        for pos in ['hundred', 'ten', 'one']:
-            data = self.df[pos].values.astype(int)
-            
-            if len(data) < 2:
-                continue
-            
-            # 連続出現回数をカウント
-            consecutive_counts = {}
-            current_digit = data[0]
-            consecutive_length = 1
-            
-            for i in range(1, len(data)):
-                if data[i] == current_digit:
-                    consecutive_length += 1
-                else:
-                    if consecutive_length > 1:
-                        consecutive_counts[current_digit] = consecutive_counts.get(current_digit, 0) + consecutive_length - 1
-                    current_digit = data[i]
-                    consecutive_length = 1
-            
-            # 最後の連続もカウント
-            if consecutive_length > 1:
-                consecutive_counts[current_digit] = consecutive_counts.get(current_digit, 0) + consecutive_length - 1
-            
-            # 交互出現パターンを検出（A-B-A-B形式）
-            alternating_patterns = {}
-            for i in range(len(data) - 3):
-                if data[i] == data[i+2] and data[i+1] == data[i+3] and data[i] != data[i+1]:
-                    pattern_key = f"{data[i]}-{data[i+1]}"
-                    alternating_patterns[pattern_key] = alternating_patterns.get(pattern_key, 0) + 1
-            
-            # 連続出現の統計
-            max_consecutive = {}
-            for digit in range(10):
-                max_length = 0
-                current_length = 0
-                for val in data:
-                    if val == digit:
-                        current_length += 1
-                        max_length = max(max_length, current_length)
-                    else:
-                        current_length = 0
-                max_consecutive[digit] = max_length
+        if index.count < 2:
+            return continuity_analysis
+        
+        for p, pos in enumerate(DigitCountIndex.POSITIONS):
+            # 連続出現回数・交互出現パターン（A-B-A-B形式）は最初に出現した順に並べる
+            repeat_counts = index.repeat_counts[p]
+            repeated = np.flatnonzero(repeat_counts > 0)
+            repeated = repeated[np.argsort(index.repeat_first_seen[p, repeated], kind='stable')]
+            alternating_counts = index.alternating_counts[p]
+            alternating = np.flatnonzero(alternating_counts > 0)
+            alternating = alternating[np.argsort(index.alternating_first_seen[p, alternating], kind='stable')]
             
             continuity_analysis[pos] = {
-                'consecutive_counts': {str(k): int(v) for k, v in consecutive_counts.items()},
-                'alternating_patterns': {str(k): int(v) for k, v in alternating_patterns.items()},
-                'max_consecutive': {str(k): int(v) for k, v in max_consecutive.items()},
-                'total_consecutive_occurrences': sum(consecutive_counts.values())
+                'consecutive_counts': {str(k): int(repeat_counts[k]) for k in repeated},
+                'alternating_patterns': {f"{code // 10}-{code % 10}": int(alternating_counts[code]) for code in alternating},
+                'max_consecutive': {str(k): int(v) for k, v in enumerate(index.max_run[p])},
+                'total_consecutive_occurrences': int(repeat_counts.sum())
             }
         
         return continuity_analysis
@@ -2341,83 +4607,82 @@ class NumbersAnalyzer:
             print(f"[optimize_with_genetic_algorithm] 遺伝的アルゴリズム最適化に失敗: {e}")
             return None
     
-    def analyze_network(self) -> Dict[str, any]:
+    def analyze_network(self, extra_metrics: bool = False) -> Dict[str, any]:
         """
         ネットワーク分析（グラフ理論）による数字の遷移分析
         
+        数字0-9をノード、遷移をエッジとする重み付き有向グラフの指標を、
+        出現回数のインデックスの10×10の遷移回数行列から直接計算する
+        （networkxのDiGraphにエッジを出現順に追加した場合と同じ値・順序）。
+        
+        Args:
+            extra_metrics: Trueの場合、networkxで追加の指標（PageRank）を計算する
+                           （networkxがインストールされていない場合は省略）
+        
         Returns:
             ネットワーク分析結果の辞書
         """
-        try:
-            import networkx as nx
-        except ImportError:
-            print("[analyze_network] networkxがインストールされていません")
-            return None
-        
         if len(self.df) < 2:
             return None
         
-        try:
-            # 有向グラフを作成
-            G = nx.DiGraph()
+        index = self.count_index()
+        network_stats = {}
+        
+        # 各桁ごとの統計
+        for p, pos in enumerate(DigitCountIndex.POSITIONS):
+            counts = index.transitions[p]
+            first_seen = index.transition_first_seen[p].reshape(-1)
             
-            # 各桁の遷移をエッジとして追加
-            for pos in ['hundred', 'ten', 'one']:
-                for i in range(len(self.df) - 1):
-                    from_digit = int(self.df.iloc[i][pos])
-                    to_digit = int(self.df.iloc[i+1][pos])
-                    
-                    edge_key = f"{pos}_{from_digit}_{to_digit}"
-                    if G.has_edge(from_digit, to_digit):
-                        G[from_digit][to_digit]['weight'] += 1
-                        pos_count_key = f'{pos}_count'
-                        G[from_digit][to_digit][pos_count_key] = G[from_digit][to_digit].get(pos_count_key, 0) + 1
-                    else:
-                        pos_count_key = f'{pos}_count'
-                        edge_attrs = {'weight': 1, 'pos': pos}
-                        edge_attrs[pos_count_key] = 1
-                        G.add_edge(from_digit, to_digit, **edge_attrs)
+            # エッジ（遷移）を最初に出現した順に並べ、ノードの順序もそれに合わせる
+            codes = np.flatnonzero(counts.reshape(-1) > 0)
+            codes = codes[np.argsort(first_seen[codes], kind='stable')]
+            nodes = list(dict.fromkeys(int(digit) for code in codes for digit in (code // 10, code % 10)))
             
-            # ネットワークの統計を計算
-            network_stats = {}
+            # 次数中心性（異なる遷移元・遷移先の数 / (ノード数 - 1)）
+            adjacency = counts > 0
+            scale = 1.0 / (len(nodes) - 1.0) if len(nodes) > 1 else None
+            in_degree = adjacency.sum(axis=0)
+            out_degree = adjacency.sum(axis=1)
+            in_degree_centrality = {k: (int(in_degree[k]) * scale if scale else 1) for k in nodes}
+            out_degree_centrality = {k: (int(out_degree[k]) * scale if scale else 1) for k in nodes}
             
-            # 各桁ごとの統計
-            for pos in ['hundred', 'ten', 'one']:
-                pos_graph = nx.DiGraph()
-                for i in range(len(self.df) - 1):
-                    from_digit = int(self.df.iloc[i][pos])
-                    to_digit = int(self.df.iloc[i+1][pos])
-                    if pos_graph.has_edge(from_digit, to_digit):
-                        pos_graph[from_digit][to_digit]['weight'] += 1
-                    else:
-                        pos_graph.add_edge(from_digit, to_digit, weight=1)
-                
-                # 中心性指標を計算
-                in_degree_centrality = nx.in_degree_centrality(pos_graph)
-                out_degree_centrality = nx.out_degree_centrality(pos_graph)
-                
-                # 最も頻繁に遷移するエッジ
-                edges_with_weights = [(u, v, d['weight']) for u, v, d in pos_graph.edges(data=True)]
-                edges_with_weights.sort(key=lambda x: x[2], reverse=True)
-                top_edges = edges_with_weights[:5]
-                
-                network_stats[pos] = {
-                    'in_degree_centrality': {str(k): float(v) for k, v in in_degree_centrality.items()},
-                    'out_degree_centrality': {str(k): float(v) for k, v in out_degree_centrality.items()},
-                    'top_transitions': [{'from': int(u), 'to': int(v), 'count': int(w)} for u, v, w in top_edges],
-                    'total_edges': pos_graph.number_of_edges(),
-                    'total_nodes': pos_graph.number_of_nodes()
-                }
+            # 最も頻繁に遷移するエッジ（同数の場合は遷移元ノードの順、同じ遷移元では出現順）
+            node_rank = np.empty(10, dtype=np.int64)
+            node_rank[nodes] = np.arange(len(nodes))
+            edges = codes[np.argsort(node_rank[codes // 10], kind='stable')]
+            weights = counts.reshape(-1)[edges]
+            top_edges = edges[np.argsort(-weights, kind='stable')][:5]
             
-            return {
-                'network_stats': network_stats,
-                'overall_nodes': G.number_of_nodes(),
-                'overall_edges': G.number_of_edges()
+            network_stats[pos] = {
+                'in_degree_centrality': {str(k): float(v) for k, v in in_degree_centrality.items()},
+                'out_degree_centrality': {str(k): float(v) for k, v in out_degree_centrality.items()},
+                'top_transitions': [{'from': int(code // 10), 'to': int(code % 10), 'count': int(counts.reshape(-1)[code])}
+                                    for code in top_edges],
+                'total_edges': len(codes),
+                'total_nodes': len(nodes)
             }
-            
-        except Exception as e:
-            print(f"[analyze_network] ネットワーク分析に失敗: {e}")
-            return None
+        
+        # 全桁をまとめたグラフ（いずれかの桁で出現した遷移）
+        combined = index.transitions.sum(axis=0) > 0
+        result = {
+            'network_stats': network_stats,
+            'overall_nodes': int((combined.any(axis=0) | combined.any(axis=1)).sum()),
+            'overall_edges': int(combined.sum())
+        }
+        
+        if extra_metrics:
+            try:
+                import networkx as nx
+            except ImportError:
+                print("[analyze_network] networkxがインストールされていないため、追加の指標を省略します")
+                return result
+            for p, pos in enumerate(DigitCountIndex.POSITIONS):
+                graph = nx.from_numpy_array(index.transitions[p], create_using=nx.DiGraph)
+                graph.remove_nodes_from([node for node in list(graph) if graph.degree(node) == 0])
+                pagerank = nx.pagerank(graph, weight='weight')
+                result['network_stats'][pos]['pagerank'] = {str(k): float(v) for k, v in pagerank.items()}
+        
+        return result
     
     def calculate_dynamic_confidence(self, method_name: str, prediction: str) -> float:
         """
@@ -2430,8 +4695,8 @@ class NumbersAnalyzer:
         Returns:
             信頼度（0.0-1.0）
         """
-        # 簡易版：実際には過去の予測履歴と実際の結果を比較する必要がある
-        # ここでは、各手法の想定精度に基づく基本信頼度を返す
+        # 各手法の想定精度に基づく基本信頼度に、予測の台帳（直近の予測と実際の結果）と
+        # 頻出パターン・トレンドの要約（confidence_contextで実行ごとにキャッシュ）による補正を加える
         
         base_confidence = {
             'chaos': 0.65,
@@ -2449,59 +4714,35 @@ class NumbersAnalyzer:
             'conformal': 0.75
         }
         
-        # 予測履歴ファイルを読み込んで精度を評価（改善版）
-        history_file = "docs/data/prediction_history.json"
-        if os.path.exists(history_file):
-            try:
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    history_data = json.load(f)
-                
-                # 過去の予測の一貫性を評価
-                method_predictions = []
-                for entry in history_data[-20:]:  # 直近20回
-                    if 'methods' in entry and method_name in entry['methods']:
-                        method_pred = entry['methods'][method_name]
-                        if method_pred:
-                            method_predictions.append(method_pred.get('set_prediction'))
-                
-                # 予測の一貫性が高い（多様な予測）場合は信頼度を上げる
-                if len(method_predictions) > 0:
-                    unique_predictions = len(set(method_predictions))
-                    consistency = unique_predictions / len(method_predictions)
-                    consistency_boost = consistency * 0.05  # 最大0.05のブースト
-                    base = min(base + consistency_boost, 0.95)
-                    
-            except Exception as e:
-                print(f"[calculate_dynamic_confidence] 履歴読み込みエラー: {e}")
-        
         base = base_confidence.get(method_name, 0.65)
         
-        # 予測値が頻出パターンに含まれている場合は信頼度を上げる
-        patterns = self.extract_frequent_patterns(top_n=20)
-        
-        if prediction in patterns.get('set_top', {}):
-            # 頻出パターンの上位10位以内なら信頼度を上げる
-            rank = list(patterns['set_top'].keys()).index(prediction) + 1
-            if rank <= 10:
-                boost = (11 - rank) * 0.01  # 最大0.1のブースト
-                base = min(base + boost, 0.95)
-        
-        # トレンドと一致している場合は信頼度を上げる
-        trends = self.analyze_trends()
-        last_hundred = int(self.df.iloc[-1]['hundred'])
-        last_ten = int(self.df.iloc[-1]['ten'])
-        last_one = int(self.df.iloc[-1]['one'])
-        
-        predicted_hundred = int(prediction[0])
-        predicted_ten = int(prediction[1])
-        predicted_one = int(prediction[2])
-        
-        # 短期トレンドと一致しているかチェック
-        if 'short' in trends.get('hundred', {}):
-            trend_hundred = trends['hundred']['short']['trend']
-            if trend_hundred > 0 and predicted_hundred > last_hundred:
+        # 予測の台帳から直近の予測の一貫性と的中を評価
+        stats = self.ledger_stats().get(method_name)
+        if stats and stats['count'] > 0:
+            # 予測の一貫性が高い（多様な予測）場合は信頼度を上げる
+            consistency = stats['unique'] / stats['count']
+            base = min(base + consistency * 0.05, 0.95)  # 最大0.05のブースト
+            
+            # 結果が出た予測の的中率（ストレート・ボックス・ミニ）に応じて信頼度を上げる
+            if stats['resolved'] > 0:
+                hit_rate = (stats['straight'] + stats['box'] + stats['mini']) / (3 * stats['resolved'])
+                base = min(base + hit_rate * 0.05, 0.95)  # 最大0.05のブースト
+        
+        context = self.confidence_context()
+        
+        # 予測値が頻出パターンの上位10位以内なら信頼度を上げる
+        rank = context['set_rank'].get(prediction)
+        if rank is not None:
+            boost = (11 - rank) * 0.01  # 最大0.1のブースト
+            base = min(base + boost, 0.95)
+        
+        # 短期トレンドと一致している場合は信頼度を上げる
+        trend_hundred = context['trend_hundred']
+        if trend_hundred is not None and len(prediction) == 3 and prediction.isdigit():
+            predicted_hundred = int(prediction[0])
+            if trend_hundred > 0 and predicted_hundred > context['last_hundred']:
                 base += 0.02
-            elif trend_hundred < 0 and predicted_hundred < last_hundred:
+            elif trend_hundred < 0 and predicted_hundred < context['last_hundred']:
                 base += 0.02
         
         return min(base, 0.95)  # 最大0.95に制限
@@ -2515,31 +4756,67 @@ class NumbersAnalyzer:
             time_index: 時間インデックス
         """
         target = self.df.iloc[time_index][['hundred', 'ten', 'one']].values[digit_pos]
+        return float(invert_phases([time_index], [target])[0])
+    
+    def history_hash(self, n: Optional[int] = None) -> str:
+        """
+        抽せん履歴（日付と各桁）の先頭n件のハッシュを計算する
+        
+        Args:
+            n: 対象とする件数（Noneの場合は全件）
+        
+        Returns:
+            str: SHA-256の16進文字列
+        """
+        head = self.df if n is None else self.df.iloc[:n]
+        h = hashlib.sha256()
+        h.update(head['date'].values.astype('datetime64[D]').astype(np.int64).tobytes())
+        h.update(head[['hundred', 'ten', 'one']].values.astype(np.int8).tobytes())
+        return h.hexdigest()
+    
+    def load_phase_store(self) -> np.ndarray:
+        """
+        位相ストアを読み込む（未計算の抽せん分だけ逆算して追記）
+        
+        位相は (抽せんインデックス, 桁) ごとに一度決まれば変わらないため、
+        cache_dir/phases.f64 に追記していき、以降はメモリマップで読み込む。
+        保存済み件数分の履歴ハッシュが一致しない場合（過去データの修正や
+        並び替え）は最初から作り直す。
+        
+        Returns:
+            np.ndarray: shape (len(self.df), 3) の位相配列（百・十・一の順）
+        """
+        n = len(self.df)
+        store = DrawStore(self.cache_dir, "phases", 3)
         
-        def error_func(phase):
-            prediction = int(np.floor(5 * np.sin(0.5 * time_index + phase) + 5) % 10)
-            return abs(target - prediction)
+        try:
+            cached, _ = store.load_meta(self.history_hash, n)
+            
+            if cached < n:
+                digits = self.df[['hundred', 'ten', 'one']].values[cached:]
+                time_indices = np.repeat(np.arange(cached, n), 3)
+                new_phases = invert_phases(time_indices, digits.ravel())
+                store.write(cached, new_phases.reshape(-1, 3), self.history_hash(n))
+                print(f"[load_phase_store] 位相を{len(new_phases)}件計算しました（保存済み: {cached * 3}件）")
+            
+            return store.read(n)
         
-        result = minimize_scalar(error_func, bounds=(0, 6.28), method='bounded')
-        return result.x
+        except OSError as e:
+            print(f"[load_phase_store] 位相ストアを使用できません。全件を計算します: {e}")
+            digits = self.df[['hundred', 'ten', 'one']].values
+            return invert_phases(np.repeat(np.arange(n), 3), digits.ravel()).reshape(-1, 3)
     
     def get_recent_phases(self, window: int = 100) -> Dict[str, List[float]]:
         """
-        直近の位相を取得
+        直近の位相を取得（位相ストアから読み込み）
         
         Args:
             window: 取得するデータ数
         """
-        recent_df = self.df.tail(window)
-        phases = {'hundred': [], 'ten': [], 'one': []}
+        store = self.load_phase_store()
+        start = max(0, len(store) - window)
         
-        for idx, row in recent_df.iterrows():
-            time_idx = len(self.df) - len(recent_df) + (idx - recent_df.index[0])
-            for i, pos in enumerate(['hundred', 'ten', 'one']):
-                phase = self.calculate_phase(i, time_idx)
-                phases[pos].append(phase)
-        
-        return phases
+        return {pos: store[start:, i].tolist() for i, pos in enumerate(['hundred', 'ten', 'one'])}
     
     def predict_chaos(self) -> Dict[str, any]:
         """
@@ -2580,35 +4857,34 @@ class NumbersAnalyzer:
             'reason': '位相の線形トレンドから予測'
         }
     
-    def predict_markov(self) -> Dict[str, any]:
+    def predict_markov(self, order: Optional[int] = None) -> Dict[str, any]:
         """
         マルコフ連鎖に基づく予測
         
+        Args:
+            order: 連鎖の次数（直前何回の数字を状態とするか、Noneの場合はMARKOV_ORDER）
+                   現在の状態が過去に一度も出ていない桁は、次数を下げて予測する
+            
         Returns:
             予測結果の辞書
         """
-        # 遷移確率行列を構築
-        transitions = {}
-        for pos in ['hundred', 'ten', 'one']:
-            transitions[pos] = np.zeros((10, 10))
-            for i in range(1, len(self.df)):
-                from_digit = self.df.iloc[i-1][pos]
-                to_digit = self.df.iloc[i][pos]
-                transitions[pos][int(from_digit), int(to_digit)] += 1
+        if order is None:
+            order = self.MARKOV_ORDER
+        engine = self.count_index().markov
+        if not 1 <= order <= engine.max_order:
+            raise ValueError(f"order must be between 1 and {engine.max_order}: {order}")
         
-        # 正規化
-        for pos in ['hundred', 'ten', 'one']:
-            row_sums = transitions[pos].sum(axis=1)
-            row_sums[row_sums == 0] = 1  # ゼロ除算を防ぐ
-            transitions[pos] = transitions[pos] / row_sums[:, np.newaxis]
-        
-        # 最後の数字から予測
+        # 直近の状態からの遷移回数が最も多い数字を予測（遷移確率の最大と同じ）
         predictions = {}
-        for pos in ['hundred', 'ten', 'one']:
-            last_digit = int(self.df.iloc[-1][pos])
-            probs = transitions[pos][last_digit]
-            predicted = np.argmax(probs)
-            predictions[pos] = predicted
+        for p, pos in enumerate(DigitCountIndex.POSITIONS):
+            counts = np.zeros(10, dtype=np.int64)
+            for k in range(order, 0, -1):
+                state = engine.state(p, k)
+                if state is not None:
+                    counts = engine.counts(p, k, state)
+                    if counts.sum() > 0:
+                        break
+            predictions[pos] = np.argmax(counts)
         
         set_pred = f"{predictions['hundred']}{predictions['ten']}{predictions['one']}"
         mini_pred = f"{predictions['ten']}{predictions['one']}"
@@ -2618,7 +4894,7 @@ class NumbersAnalyzer:
             'set_prediction': set_pred,
             'mini_prediction': mini_pred,
             'confidence': 0.70,
-            'reason': 'マルコフ遷移確率から予測'
+            'reason': 'マルコフ遷移確率から予測' if order == 1 else f'{order}次マルコフ遷移確率から予測'
         }
     
     def predict_bayesian(self) -> Dict[str, any]:
@@ -2628,10 +4904,12 @@ class NumbersAnalyzer:
         Returns:
             予測結果の辞書
         """
-        # 各桁の出現頻度（事前分布）
+        # 各桁の出現頻度（事前分布、インデックスの出現回数から）
+        index = self.count_index()
         priors = {}
-        for pos in ['hundred', 'ten', 'one']:
-            priors[pos] = self.df[pos].value_counts(normalize=True).sort_index()
+        for p, pos in enumerate(DigitCountIndex.POSITIONS):
+            counts = index.digit_counts[p]
+            priors[pos] = pd.Series(counts / counts.sum(), index=range(10))[counts > 0]
         
         # 直近20回の出現頻度（尤度）
         recent_df = self.df.tail(20)
@@ -2694,19 +4972,19 @@ class NumbersAnalyzer:
             if current_quarter in patterns['quarterly'][pos]:
                 quarterly_probs = patterns['quarterly'][pos][current_quarter]
             
-            # 重み付き平均で予測
+            # 重み付き平均で予測（analyze_periodicityの数字のキーはint）
             combined_probs = {}
             for digit in range(10):
                 prob = 0.0
                 count = 0
-                if str(digit) in weekday_probs:
-                    prob += weekday_probs[str(digit)] * 0.4
+                if digit in weekday_probs:
+                    prob += weekday_probs[digit] * 0.4
                     count += 0.4
-                if str(digit) in monthly_probs:
-                    prob += monthly_probs[str(digit)] * 0.3
+                if digit in monthly_probs:
+                    prob += monthly_probs[digit] * 0.3
                     count += 0.3
-                if str(digit) in quarterly_probs:
-                    prob += quarterly_probs[str(digit)] * 0.3
+                if digit in quarterly_probs:
+                    prob += quarterly_probs[digit] * 0.3
                     count += 0.3
                 
                 if count > 0:
@@ -2785,116 +5063,289 @@ class NumbersAnalyzer:
             'reason': '頻出パターン分析から予測'
         }
     
-    def ensemble_predict(self, update_info: Optional[Dict[str, any]] = None, mode: str = 'light') -> Dict[str, any]:
+    def print_import_profile(self):
+        """ライブラリの読み込み時間を表示する（起動時の基本ライブラリと、手法ごとの重いライブラリ）"""
+        print("\n=== ライブラリの読み込み時間 ===")
+        print(f"  numpy, pandas（起動時）: {STARTUP_IMPORT_SECONDS:.2f}秒")
+        ordered = sorted(self.import_profile.items(), key=lambda item: -(item[1]['seconds'] or 0.0))
+        for module, entry in ordered:
+            methods = ', '.join(entry['methods'])
+            if entry['seconds'] is None:
+                print(f"  {module}: 未インストール（{methods}）")
+            else:
+                print(f"  {module}: {entry['seconds']:.2f}秒（{methods}）")
+    
+    def load_method_timings(self) -> Dict[str, Dict[str, float]]:
         """
-        アンサンブル予測（複数手法の統合）
+        手法ごとの所要時間の計測値を読み込む（時間予算の見積もりに使用）
+        
+        Returns:
+            dict: {"モード:グループ:キー": {'normal': 秒, 'degraded': 秒}}（ファイルがない場合は空）
+        """
+        path = os.path.join(self.cache_dir, "method_timings.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_method_timings(self, timings: Dict[str, Dict[str, float]]):
+        """手法ごとの所要時間の計測値を保存する（一時ファイル経由で置き換え）"""
+        path = os.path.join(self.cache_dir, "method_timings.json")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(timings, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[save_method_timings] 所要時間を保存できません: {e}")
+    
+    def run_methods(self, specs: List[Dict[str, any]], mode: str = 'light',
+                    workers: Optional[int] = None, time_budget: Optional[float] = None) -> Dict[str, Dict[str, any]]:
+        """
+        登録された手法を実行する（互いに独立なのでプロセスプールで並列実行）
+        
+        各手法は個別に例外を捕捉し、失敗した手法の結果はNoneになる。
+        各手法が使う重いライブラリ（登録表のimports）は、その手法を実行する直前に
+        実行先のプロセスで読み込み、読み込み時間をimport_profileに記録する。
+        time_budgetを指定した場合は、各手法の見積もり時間（前回までの計測値）を
+        残り時間と比べて、収まらない手法を軽量設定で実行するかスキップする（ソフト期限）。
+        実行中の手法は見積もりの数倍を超えた時点で打ち切る（ハード期限）。
         
         Args:
-            update_info: データ更新情報（デフォルト: None）
+            specs: ENSEMBLE_METHODS形式の登録表
             mode: 実行モード ('light' または 'full')
+            workers: プロセス数（Noneの場合はENSEMBLE_WORKERS、1の場合は逐次実行）
+            time_budget: 全体の時間予算（秒、Noneの場合は無制限）
         
         Returns:
-            統合予測結果
+            dict: {'prediction': {key: 結果}, 'analysis': {key: 結果},
+                   'run_budget': 予算・軽量化・スキップの記録}（結果は登録順）
         """
-        # 常に全再計算を実行
-        print(f"[ensemble_predict] 予測分析を実行します（{mode}モード）...")
         start_time = time.time()
+        deadline = start_time + time_budget if time_budget else None
         
-        print("[ensemble_predict] 軽量な予測手法を実行中...")
-        chaos_pred = self.predict_chaos()
-        markov_pred = self.predict_markov()
-        bayesian_pred = self.predict_bayesian()
-        periodicity_pred = self.predict_with_periodicity()
-        pattern_pred = self.predict_with_patterns()
-        print(f"[ensemble_predict] 軽量な予測手法完了（経過時間: {time.time() - start_time:.1f}秒）")
+        if workers is None:
+            workers = self.ENSEMBLE_WORKERS or os.cpu_count() or 1
+        workers = max(1, min(workers, len(specs)))
         
-        # ランダムフォレストによる予測（計算コストが高いのでエラーハンドリング）
-        random_forest_pred = None
-        try:
-            print("[ensemble_predict] ランダムフォレスト予測を実行中...")
-            rf_start = time.time()
-            random_forest_pred = self.predict_with_random_forest()
-            print(f"[ensemble_predict] ランダムフォレスト予測完了（経過時間: {time.time() - rf_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] ランダムフォレスト予測をスキップ: {e}")
+        tasks = []
+        for spec in specs:
+            kwargs = dict(spec.get('kwargs', {}))
+            if mode == 'full':
+                kwargs.update(spec.get('full_kwargs', {}))
+            tasks.append((spec, kwargs))
         
-        # XGBoostによる予測
-        xgboost_pred = None
+        # 共有キャッシュ（位相・指標・特徴量・出現回数）は親プロセスで先に用意し、
+        # ワーカーからは読み込みだけにする
         try:
-            print("[ensemble_predict] XGBoost予測を実行中...")
-            xgb_start = time.time()
-            xgboost_pred = self.predict_with_xgboost()
-            print(f"[ensemble_predict] XGBoost予測完了（経過時間: {time.time() - xgb_start:.1f}秒）")
+            self.load_phase_store()
+            self.create_advanced_features()
+            self.count_index()
         except Exception as e:
-            print(f"[ensemble_predict] XGBoost予測をスキップ: {e}")
+            print(f"[run_methods] 共有キャッシュの準備に失敗: {e}")
+        
+        timings = self.load_method_timings()
+        
+        def timing_key(spec):
+            return f"{mode}:{spec['group']}:{spec['key']}"
+        
+        def estimate(spec, degraded=False):
+            measured = timings.get(timing_key(spec), {}).get('degraded' if degraded else 'normal')
+            if measured is not None:
+                return measured
+            base = self.TIME_BUDGET_DEFAULT_ESTIMATES.get(spec.get('cost', 1), max(self.TIME_BUDGET_DEFAULT_ESTIMATES.values()))
+            return base * self.TIME_BUDGET_DEGRADED_RATIO if degraded else base
+        
+        def minimum_estimate(spec):
+            return estimate(spec, degraded='degraded' in spec)
+        
+        def plan(spec, kwargs, waiting):
+            """ソフト期限の判定（Noneの場合はスキップ）: (引数, 上書き設定, 軽量化したか)"""
+            if deadline is None:
+                return kwargs, None, False
+            remaining = deadline - time.time()
+            # 後に控える手法の最小所要時間をワーカー数で按分して残しておく
+            reserve = sum(minimum_estimate(other) for other, _ in waiting) / workers
+            if estimate(spec) <= remaining - reserve:
+                return kwargs, None, False
+            degraded = spec.get('degraded', {})
+            degraded_kwargs = dict(kwargs)
+            degraded_kwargs.update(degraded.get('kwargs', {}))
+            if mode == 'full':
+                degraded_kwargs.update(degraded.get('full_kwargs', {}))
+            if not degraded.get('settings') and degraded_kwargs == kwargs:
+                # このモードでは軽量設定がない
+                return (kwargs, None, False) if estimate(spec) <= remaining else None
+            if estimate(spec, degraded=True) > remaining:
+                return None
+            return degraded_kwargs, degraded.get('settings'), True
+        
+        def hard_deadline(spec, degraded, started):
+            if deadline is None:
+                return None
+            limit = max(estimate(spec, degraded) * self.TIME_BUDGET_HARD_FACTOR, self.TIME_BUDGET_MIN_HARD_SECONDS)
+            return min(deadline, started + limit)
+        
+        outcomes = {}
+        budget_record = {
+            'time_budget': time_budget,
+            'elapsed': None,
+            'degraded': [],
+            'skipped': []
+        }
         
-        # LightGBMによる予測
-        lightgbm_pred = None
-        try:
-            print("[ensemble_predict] LightGBM予測を実行中...")
-            lgb_start = time.time()
-            lightgbm_pred = self.predict_with_lightgbm()
-            print(f"[ensemble_predict] LightGBM予測完了（経過時間: {time.time() - lgb_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] LightGBM予測をスキップ: {e}")
+        use_pool = workers > 1 or deadline is not None
+        
+        def report(spec, outcome, degraded=False):
+            result, error, elapsed, import_times, cache_counts = outcome
+            if use_pool:
+                # ワーカーでのヒット・ミスを合算する（逐次実行では親プロセスの回数に含まれている）
+                for kind, count in cache_counts.items():
+                    self.feature_cache_stats[kind] += count
+            for module, seconds in import_times.items():
+                entry = self.import_profile.setdefault(module, {'seconds': seconds, 'methods': []})
+                if seconds is not None and (entry['seconds'] is None or seconds > entry['seconds']):
+                    entry['seconds'] = seconds
+                entry['methods'].append(spec['key'])
+            if error is None:
+                print(f"[ensemble_predict] {spec['label']}完了（経過時間: {elapsed:.1f}秒）")
+                key = timing_key(spec)
+                kind = 'degraded' if degraded else 'normal'
+                previous = timings.get(key, {}).get(kind)
+                alpha = self.TIME_BUDGET_TIMING_ALPHA
+                timings.setdefault(key, {})[kind] = round(
+                    elapsed if previous is None else alpha * elapsed + (1 - alpha) * previous, 3)
+            else:
+                print(f"[ensemble_predict] {spec['label']}をスキップ: {error}")
+            outcomes[(spec['group'], spec['key'])] = outcome
         
-        # ARIMAによる予測
-        arima_pred = None
-        try:
-            print("[ensemble_predict] ARIMA予測を実行中...")
-            arima_start = time.time()
-            arima_pred = self.predict_with_arima()
-            print(f"[ensemble_predict] ARIMA予測完了（経過時間: {time.time() - arima_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] ARIMA予測をスキップ: {e}")
+        def skip(spec, reason, message, elapsed=0.0):
+            budget_record['skipped'].append({'method': spec['key'], 'group': spec['group'], 'reason': reason})
+            report(spec, (None, message, elapsed, {}, {}))
         
-        # スタッキングによる予測
-        stacking_pred = None
-        try:
-            print("[ensemble_predict] スタッキング予測を実行中...")
-            stack_start = time.time()
-            stacking_pred = self.predict_with_stacking()
-            print(f"[ensemble_predict] スタッキング予測完了（経過時間: {time.time() - stack_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] スタッキング予測をスキップ: {e}")
+        print(f"[run_methods] {len(tasks)}件の手法を実行します（プロセス数: {workers}）")
+        if deadline is not None:
+            print(f"[run_methods] 時間予算: {time_budget:.0f}秒")
         
-        # HMMによる予測
-        hmm_pred = None
-        try:
-            print("[ensemble_predict] HMM予測を実行中...")
-            hmm_start = time.time()
-            hmm_pred = self.predict_with_hmm()
-            print(f"[ensemble_predict] HMM予測完了（経過時間: {time.time() - hmm_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] HMM予測をスキップ: {e}")
+        if not use_pool:
+            for spec, kwargs in tasks:
+                print(f"[ensemble_predict] {spec['label']}を実行中...")
+                report(spec, _call_method(self, spec['method'], kwargs, imports=spec.get('imports')))
+        else:
+            from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+            
+            def new_pool():
+                return ProcessPoolExecutor(max_workers=workers, initializer=_init_method_worker,
+                                           initargs=(self,))
+            
+            # 重い手法から投入して全体の待ち時間を短くする
+            # （ハード期限を守るため、空いているワーカーの数だけ投入する）
+            waiting = sorted(tasks, key=lambda task: -task[0].get('cost', 1))
+            running = {}
+            abandoned = set()
+            executor = new_pool()
+            try:
+                while waiting or running:
+                    while waiting and len(running) + len(abandoned) < workers:
+                        spec, kwargs = waiting.pop(0)
+                        planned = plan(spec, kwargs, waiting)
+                        if planned is None:
+                            skip(spec, 'budget', "時間予算の残りが不足")
+                            continue
+                        method_kwargs, settings, degraded = planned
+                        if degraded:
+                            print(f"[ensemble_predict] {spec['label']}を軽量設定で実行します")
+                            changed = {k: v for k, v in method_kwargs.items() if kwargs.get(k) != v}
+                            budget_record['degraded'].append({
+                                'method': spec['key'],
+                                'group': spec['group'],
+                                'settings': {**(settings or {}), **changed}
+                            })
+                        started = time.time()
+                        future = executor.submit(_run_method_in_worker, spec['method'], method_kwargs, settings,
+                                                 spec.get('imports'))
+                        running[future] = (spec, degraded, started, hard_deadline(spec, degraded, started))
+                    
+                    if not running:
+                        if waiting:
+                            # 打ち切った手法がワーカーをすべて占有している場合はプールを作り直す
+                            _terminate_pool(executor)
+                            abandoned.clear()
+                            executor = new_pool()
+                        continue
+                    
+                    limits = [limit for _, _, _, limit in running.values() if limit is not None]
+                    timeout = max(0.0, min(limits) - time.time()) if limits else None
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    
+                    for future in done:
+                        spec, degraded, _, _ = running.pop(future)
+                        try:
+                            outcome = future.result()
+                        except Exception as e:
+                            # ワーカープロセス自体の異常終了など
+                            outcome = (None, f"{type(e).__name__}: {e}", 0.0, {}, {})
+                        report(spec, outcome, degraded)
+                    
+                    now = time.time()
+                    for future, (spec, degraded, started, limit) in list(running.items()):
+                        if limit is not None and now >= limit:
+                            # ハード期限超過: 結果を待たずに打ち切る（次回は見積もりを引き上げる）
+                            del running[future]
+                            abandoned.add(future)
+                            key = timing_key(spec)
+                            kind = 'degraded' if degraded else 'normal'
+                            entry = timings.setdefault(key, {})
+                            entry[kind] = round(max(now - started, entry.get(kind, 0.0)), 3)
+                            skip(spec, 'timeout', f"期限超過のため打ち切り（{now - started:.1f}秒）", now - started)
+                    abandoned = {future for future in abandoned if not future.done()}
+            finally:
+                if abandoned:
+                    _terminate_pool(executor)
+                else:
+                    executor.shutdown(wait=True)
         
-        # LSTMによる予測
-        lstm_pred = None
-        try:
-            print("[ensemble_predict] LSTM予測を実行中（時間がかかる可能性があります）...")
-            lstm_start = time.time()
-            lstm_pred = self.predict_with_lstm()
-            print(f"[ensemble_predict] LSTM予測完了（経過時間: {time.time() - lstm_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] LSTM予測をスキップ: {e}")
+        self.save_method_timings(timings)
+        budget_record['elapsed'] = round(time.time() - start_time, 1)
+        if budget_record['degraded'] or budget_record['skipped']:
+            print(f"[run_methods] 軽量化: {len(budget_record['degraded'])}件 / 時間予算によるスキップ: {len(budget_record['skipped'])}件")
         
-        # コンフォーマル予測
-        conformal_pred = None
-        try:
-            print("[ensemble_predict] コンフォーマル予測を実行中...")
-            conformal_pred = self.predict_with_conformal(base_method='lightgbm')  # 高速化のためlightgbmに変更
-        except Exception as e:
-            print(f"[ensemble_predict] コンフォーマル予測をスキップ: {e}")
+        results = {'prediction': {}, 'analysis': {}, 'run_budget': budget_record}
+        for spec, _ in tasks:
+            results[spec['group']][spec['key']] = outcomes[(spec['group'], spec['key'])][0]
+        return results
+    
+    def ensemble_predict(self, update_info: Optional[Dict[str, any]] = None, mode: str = 'light',
+                         workers: Optional[int] = None, time_budget: Optional[float] = None,
+                         max_cost: Optional[int] = None) -> Dict[str, any]:
+        """
+        アンサンブル予測（複数手法の統合）
         
-        # カルマンフィルタによる予測
-        kalman_pred = None
-        try:
-            print("[ensemble_predict] カルマンフィルタ予測を実行中...")
-            kalman_pred = self.predict_with_kalman()
-        except Exception as e:
-            print(f"[ensemble_predict] カルマンフィルタ予測をスキップ: {e}")
+        Args:
+            update_info: データ更新情報（デフォルト: None）
+            mode: 実行モード ('light' または 'full')
+            workers: 並列実行するプロセス数（Noneの場合はENSEMBLE_WORKERS）
+            time_budget: 予測手法・分析に使える時間（秒、Noneの場合は無制限）
+            max_cost: 実行する手法の計算コストの上限（1-3、Noneの場合はすべて実行）
+        
+        Returns:
+            統合予測結果
+        """
+        # 常に全再計算を実行
+        print(f"[ensemble_predict] 予測分析を実行します（{mode}モード）...")
+        start_time = time.time()
+        
+        # 登録されたすべての予測手法・分析を実行
+        specs = [spec for spec in self.ENSEMBLE_METHODS if max_cost is None or spec.get('cost', 1) <= max_cost]
+        if len(specs) < len(self.ENSEMBLE_METHODS):
+            print(f"[ensemble_predict] 計算コスト{max_cost}以下の{len(specs)}件の手法・分析のみ実行します")
+        results = self.run_methods(specs, mode=mode, workers=workers, time_budget=time_budget)
+        predictions = results['prediction']
+        analyses = results['analysis']
         
-        print(f"[ensemble_predict] すべての予測手法完了（総経過時間: {time.time() - start_time:.1f}秒）")
+        print(f"[ensemble_predict] すべての予測手法・分析完了（総経過時間: {time.time() - start_time:.1f}秒）")
         
         # 各手法の予測を集計
         set_votes = {}
@@ -2917,25 +5368,16 @@ class NumbersAnalyzer:
             'conformal': 0.75
         }
         
-        predictions_list = [chaos_pred, markov_pred, bayesian_pred, periodicity_pred, pattern_pred]
-        if random_forest_pred:
-            predictions_list.append(random_forest_pred)
-        if xgboost_pred:
-            predictions_list.append(xgboost_pred)
-        if lightgbm_pred:
-            predictions_list.append(lightgbm_pred)
-        if arima_pred:
-            predictions_list.append(arima_pred)
-        if stacking_pred:
-            predictions_list.append(stacking_pred)
-        if hmm_pred:
-            predictions_list.append(hmm_pred)
-        if lstm_pred:
-            predictions_list.append(lstm_pred)
-        if conformal_pred:
-            predictions_list.append(conformal_pred)
-        if kalman_pred:
-            predictions_list.append(kalman_pred)
+        # methods辞書を構築（登録順、失敗・未対応の手法は除外）
+        methods_dict = {key: pred for key, pred in predictions.items() if pred}
+        predictions_list = list(methods_dict.values())
+        
+        # 各手法の動的信頼度（予測の台帳と、この実行の頻出パターン・トレンド分析の結果から計算）
+        scoring_started = time.perf_counter()
+        self.confidence_context(patterns=analyses.get('frequent_patterns'), trends=analyses.get('trends'))
+        for key, pred in methods_dict.items():
+            pred['dynamic_confidence'] = round(self.calculate_dynamic_confidence(key, str(pred['set_prediction'])), 3)
+        print(f"[ensemble_predict] 動的信頼度: {len(methods_dict)}手法（{(time.perf_counter() - scoring_started) * 1e6:.0f}µs）")
         
         for pred in predictions_list:
             set_num = pred['set_prediction']
@@ -2947,10 +5389,6 @@ class NumbersAnalyzer:
             set_votes[set_num] = set_votes.get(set_num, 0) + confidence * weight
             mini_votes[mini_num] = mini_votes.get(mini_num, 0) + confidence * weight
         
-        # 最も支持された予測を選択
-        best_set = max(set_votes.items(), key=lambda x: x[1])
-        best_mini = max(mini_votes.items(), key=lambda x: x[1])
-        
         # トップ5のセット予測
         set_top5 = sorted(set_votes.items(), key=lambda x: x[1], reverse=True)[:5]
         mini_top5 = sorted(mini_votes.items(), key=lambda x: x[1], reverse=True)[:5]
@@ -2961,128 +5399,8 @@ class NumbersAnalyzer:
         # タイムスタンプはJST（Asia/Tokyo）で記録
         jst_now = datetime.now(ZoneInfo("Asia/Tokyo"))
         
-        # 追加の分析結果を取得（常に再計算）
-        print("[ensemble_predict] 基本分析を実行中...")
-        analysis_start = time.time()
-        correlations = self.analyze_correlations()
-        trends = self.analyze_trends()
-        frequent_patterns = self.extract_frequent_patterns(top_n=10)
-        gap_analysis = self.analyze_gaps_detailed()
-        anomalies = self.detect_anomalies()
-        periodicity_patterns = self.analyze_periodicity()
-        print(f"[ensemble_predict] 基本分析完了（経過時間: {time.time() - analysis_start:.1f}秒）")
-        
-        # フーリエ変換による周波数解析（計算コストが高いのでオプション）
-        frequency_analysis = None
-        try:
-            print("[ensemble_predict] 周波数解析を実行中...")
-            freq_start = time.time()
-            frequency_analysis = self.analyze_frequency_domain()
-            print(f"[ensemble_predict] 周波数解析完了（経過時間: {time.time() - freq_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] 周波数解析をスキップ: {e}")
-        
-        # クラスタリング分析（計算コストが高いのでオプション）
-        clustering = None
-        try:
-            print("[ensemble_predict] クラスタリング分析を実行中...")
-            cluster_start = time.time()
-            clustering = self.cluster_patterns(n_clusters=5)
-            print(f"[ensemble_predict] クラスタリング分析完了（経過時間: {time.time() - cluster_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] クラスタリング分析をスキップ: {e}")
-        
-        # methods辞書を構築
-        methods_dict = {
-            'chaos': chaos_pred,
-            'markov': markov_pred,
-            'bayesian': bayesian_pred,
-            'periodicity': periodicity_pred,
-            'pattern': pattern_pred
-        }
-        if random_forest_pred:
-            methods_dict['random_forest'] = random_forest_pred
-        if xgboost_pred:
-            methods_dict['xgboost'] = xgboost_pred
-        if lightgbm_pred:
-            methods_dict['lightgbm'] = lightgbm_pred
-        if arima_pred:
-            methods_dict['arima'] = arima_pred
-        if stacking_pred:
-            methods_dict['stacking'] = stacking_pred
-        if hmm_pred:
-            methods_dict['hmm'] = hmm_pred
-        if lstm_pred:
-            methods_dict['lstm'] = lstm_pred
-        if conformal_pred:
-            methods_dict['conformal'] = conformal_pred
-        if kalman_pred:
-            methods_dict['kalman'] = kalman_pred
-        
-        # 追加の分析結果を取得（常に再計算）
-        print("[ensemble_predict] 高度な分析を実行中...")
-        advanced_start = time.time()
-        
-        wavelet_analysis = None
-        try:
-            print("[ensemble_predict] ウェーブレット解析を実行中...")
-            wavelet_start = time.time()
-            wavelet_analysis = self.analyze_wavelet()
-            print(f"[ensemble_predict] ウェーブレット解析完了（経過時間: {time.time() - wavelet_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] ウェーブレット解析をスキップ: {e}")
-        
-        pca_analysis = None
-        try:
-            print("[ensemble_predict] PCA解析を実行中...")
-            pca_start = time.time()
-            pca_analysis = self.analyze_pca()
-            print(f"[ensemble_predict] PCA解析完了（経過時間: {time.time() - pca_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] PCA解析をスキップ: {e}")
-        
-        tsne_analysis = None
-        try:
-            # モードに応じてデータ件数を変更（Light=10, Full=250）
-            tsne_limit = 250 if mode == 'full' else 10
-            print(f"[ensemble_predict] t-SNE解析を実行中（上限: {tsne_limit}件）...")
-            tsne_start = time.time()
-            tsne_analysis = self.analyze_tsne(max_data_points=tsne_limit)
-            print(f"[ensemble_predict] t-SNE解析完了（経過時間: {time.time() - tsne_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] t-SNE解析をスキップ: {e}")
-        
-        continuity_analysis = None
-        try:
-            continuity_analysis = self.analyze_continuity()
-        except Exception as e:
-            print(f"[ensemble_predict] 連続性分析をスキップ: {e}")
-        
-        change_points = None
-        try:
-            change_points = self.detect_change_points()
-        except Exception as e:
-            print(f"[ensemble_predict] 変化点検出をスキップ: {e}")
-        
-        network_analysis = None
-        try:
-            print("[ensemble_predict] ネットワーク分析を実行中...")
-            network_start = time.time()
-            network_analysis = self.analyze_network()
-            print(f"[ensemble_predict] ネットワーク分析完了（経過時間: {time.time() - network_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] ネットワーク分析をスキップ: {e}")
-        
-        genetic_optimization = None
-        try:
-            print("[ensemble_predict] 遺伝的アルゴリズム最適化を実行中（時間がかかる可能性があります）...")
-            genetic_start = time.time()
-            genetic_optimization = self.optimize_with_genetic_algorithm()
-            print(f"[ensemble_predict] 遺伝的アルゴリズム最適化完了（経過時間: {time.time() - genetic_start:.1f}秒）")
-        except Exception as e:
-            print(f"[ensemble_predict] 遺伝的アルゴリズム最適化をスキップ: {e}")
-        
-        print(f"[ensemble_predict] 高度な分析完了（総経過時間: {time.time() - advanced_start:.1f}秒）")
+        print(f"[ensemble_predict] 特徴量キャッシュ: ヒット{self.feature_cache_stats['hits']}回 / ミス{self.feature_cache_stats['misses']}回"
+              f"（ワーカーで実行した手法を含む）")
         print(f"[ensemble_predict] 全体の処理完了（総経過時間: {time.time() - start_time:.1f}秒）")
         
         return {
@@ -3110,102 +5428,326 @@ class NumbersAnalyzer:
                 'last_date': self.df.iloc[-1]['date'].strftime('%Y-%m-%d'),
                 'last_number': str(self.df.iloc[-1]['num']).zfill(3)
             },
-            'advanced_analysis': {
-                'correlations': correlations,
-                'trends': trends,
-                'frequent_patterns': frequent_patterns,
-                'gap_analysis': gap_analysis,
-                'anomalies': anomalies,
-                'clustering': clustering,
-                'periodicity': periodicity_patterns,
-                'frequency_analysis': frequency_analysis,
-                'wavelet_analysis': wavelet_analysis,
-                'pca_analysis': pca_analysis,
-                'tsne_analysis': tsne_analysis,
-                'continuity_analysis': continuity_analysis,
-                'change_points': change_points,
-                'network_analysis': network_analysis,
-                'genetic_optimization': genetic_optimization
-            }
+            'advanced_analysis': analyses,
+            'run_budget': results['run_budget']
+        }
+    
+    def backtest(self, n_draws: int = 1000, refit_every: Optional[int] = None, max_cost: Optional[int] = None,
+                 workers: Optional[int] = None) -> Dict[str, any]:
+        """
+        ウォークフォワード検証（直近n_draws回の抽せんを、それぞれ前日までのデータだけで予測して採点する）
+        
+        検証対象をrefit_every回ごとのブロックに分け、ブロックの並びを連続した区間（fold）に分けて
+        プロセスプールで並列実行する。各foldはBacktestViewで抽せんを1件ずつ進めるため、出現回数の
+        インデックスは差分の加算だけで済み、位相・指標は全件分を1回計算した配列を共有する。
+        計算コスト2以上の手法はブロックの先頭でだけ実行し、ブロック内では同じ予測を使う。
+        
+        Args:
+            n_draws: 検証する直近の抽せん数
+            refit_every: 計算コスト2以上の手法を再実行する間隔（Noneの場合はBACKTEST_REFIT_EVERY）
+            max_cost: 検証する手法の計算コストの上限（Noneの場合はすべて）
+            workers: 並列実行するプロセス数（Noneの場合はENSEMBLE_WORKERS）
+        
+        Returns:
+            dict: 手法ごとのストレート・ボックス・ミニの的中数と的中率
+        """
+        start_time = time.time()
+        refit_every = max(1, refit_every or self.BACKTEST_REFIT_EVERY)
+        if workers is None:
+            workers = self.ENSEMBLE_WORKERS
+        if workers is None:
+            workers = os.cpu_count() or 1
+        specs = [spec for spec in self.ENSEMBLE_METHODS
+                 if spec['group'] == 'prediction' and (max_cost is None or spec.get('cost', 1) <= max_cost)]
+        
+        n = len(self.df)
+        first = max(self.BACKTEST_MIN_HISTORY, n - n_draws)
+        if first >= n:
+            raise ValueError(f"検証には{self.BACKTEST_MIN_HISTORY + 1}件以上の抽せんが必要です（{n}件）")
+        
+        # 位相・指標は各行がその時点までの抽せんだけで決まるため、全件分を1回だけ用意して各foldで先頭t行を使う
+        phases = np.asarray(self.load_phase_store(), dtype=np.float64)
+        indicators = np.asarray(self.load_indicator_store(), dtype=np.float64)
+        
+        # refit_every回ごとのブロックを連続したfoldに分ける（再実行の時点がプロセス数によらず同じになる）
+        blocks = [(start, min(start + refit_every, n)) for start in range(first, n, refit_every)]
+        n_folds = max(1, min(workers, len(blocks)))
+        folds = [(chunk[0][0], chunk[-1][1]) for chunk in np.array_split(np.array(blocks), n_folds) if len(chunk)]
+        print(f"[backtest] {n - first}回の抽せんを{len(specs)}手法で検証します"
+              f"（{len(folds)} fold、重い手法は{refit_every}回ごとに再実行）")
+        
+        if len(folds) == 1:
+            outcomes = [_run_backtest_fold(self, *folds[0], phases, indicators, specs, refit_every)]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=len(folds)) as executor:
+                futures = [executor.submit(_run_backtest_fold, self, start, end, phases, indicators, specs, refit_every)
+                           for start, end in folds]
+                outcomes = [future.result() for future in futures]
+        
+        actual = self.df['num'].values[first:n].astype(np.int64)
+        actual_box = PatternCounter.encode(np.stack([actual // 100, actual // 10 % 10, actual % 10], axis=1), box=True)
+        report = {
+            'draws': int(n - first),
+            'first_index': int(first),
+            'last_date': self.df.iloc[-1]['date'].strftime('%Y-%m-%d'),
+            'refit_every': refit_every,
+            'baseline': {'straight': 0.001, 'mini': 0.01},
+            'methods': {}
         }
+        for spec in specs:
+            key = spec['key']
+            predicted = np.concatenate([outcome['set'][key] for outcome in outcomes])
+            mini = np.concatenate([outcome['mini'][key] for outcome in outcomes])
+            errors = [outcome['errors'][key] for outcome in outcomes if key in outcome['errors']]
+            valid = predicted >= 0
+            evaluated = int(valid.sum())
+            predicted_box = PatternCounter.encode(np.stack([predicted // 100, predicted // 10 % 10, predicted % 10], axis=1), box=True)
+            hits = {
+                'straight': int((valid & (predicted == actual)).sum()),
+                'box': int((valid & (predicted_box == actual_box)).sum()),
+                'mini': int((valid & (mini >= 0) & (mini == actual % 100)).sum())
+            }
+            result = {'evaluated': evaluated}
+            for kind, count in hits.items():
+                result[kind] = count
+                result[f'{kind}_rate'] = round(count / evaluated, 4) if evaluated else None
+            if errors:
+                result['error'] = errors[0]
+            report['methods'][key] = result
+        report['elapsed'] = round(time.time() - start_time, 1)
+        
+        print(f"[backtest] {'method':<16}{'evaluated':>10}{'straight':>10}{'box':>10}{'mini':>10}")
+        for key, result in report['methods'].items():
+            if result['evaluated'] == 0:
+                print(f"[backtest] {key:<16}{0:>10}  （{result.get('error', '予測なし')}）")
+                continue
+            print(f"[backtest] {key:<16}{result['evaluated']:>10}" +
+                  ''.join(f"{result[f'{kind}_rate']:>10.2%}" for kind in ('straight', 'box', 'mini')))
+        print(f"[backtest] ランダムな予測の期待値: ストレート 0.10% / ミニ 1.00%（経過時間: {report['elapsed']:.1f}秒）")
+        return report
     
-    def save_prediction(self, output_path: str = "docs/data/latest_prediction.json", update_info: Optional[Dict[str, any]] = None, mode: str = 'light'):
+    def save_prediction(self, output_path: str = "docs/data/latest_prediction.json", update_info: Optional[Dict[str, any]] = None, mode: str = 'light',
+                        workers: Optional[int] = None, time_budget: Optional[float] = None,
+                        max_cost: Optional[int] = None):
         """
         予測結果をJSONファイルに保存（履歴も保存）
         
+        output_pathには最初の表示に必要な本体とセクションのマニフェストを保存し、
+        位相・詳細分析などはsplit_predictionのセクションとして別ファイルに保存する。
+        出力はPredictionWriterで浮動小数点数を丸めたインデントなしのJSONとし、.gz / .br も書き出す。
+        
         Args:
             output_path: 出力ファイルのパス
             update_info: データ更新情報（デフォルト: None）
             mode: 実行モード
+            workers: 並列実行するプロセス数（Noneの場合はENSEMBLE_WORKERS）
+            time_budget: 予測手法・分析に使える時間（秒、Noneの場合は無制限）
+            max_cost: 実行する手法の計算コストの上限（1-3、Noneの場合はすべて実行）
         """
-        prediction = self.ensemble_predict(update_info=update_info, mode=mode)
+        prediction = self.ensemble_predict(update_info=update_info, mode=mode, workers=workers,
+                                           time_budget=time_budget, max_cost=max_cost)
         
         # ディレクトリが存在しない場合は作成
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # latest_prediction.jsonに保存（既存の動作を維持）
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(prediction, f, ensure_ascii=False, indent=2)
-        
-        print(f"予測結果を {output_path} に保存しました")
-        
-        # 日付と時刻付きファイルで履歴を保存（同日に複数回実行可能）
+        # latest_prediction.jsonには最初の表示に必要な部分とセクションのマニフェストだけを保存し、
+        # 位相・詳細分析などはセクションファイルに分けて、詳細を開いたときに読み込ませる
+        # （セクションは内容のハッシュで保存するため、前回から変わらないものは書き込まれない）
+        history_dir = os.path.dirname(output_path)
+        writer = PredictionWriter()
+        core, sections = split_prediction(prediction)
+        core['sections'] = write_prediction_sections(history_dir, sections, writer)
+        core = writer.quantize('core', core)
+        
+        # 直近の履歴と内容が同じ再実行（データ・結果とも変化なし）は履歴に追加しない
+        # （履歴インデックスの要約にある最新のエントリだけを見るため、件数によらず一定のコスト）
+        history = PredictionHistoryIndex(history_dir)
+        content_hash = prediction_content_hash(core)
+        latest_entry = history.latest()
+        add_history = not (latest_entry and latest_entry.get('sha256') == content_hash)
+        
+        # 本体は1回だけシリアライズし、同じバイト列をlatest_prediction.jsonと日時付きの履歴に書き込む
+        # （同日に複数回実行可能。履歴も本体のみで、セクションはlatest_prediction.jsonと同じファイルを参照する）
         jst_now = datetime.now(ZoneInfo("Asia/Tokyo"))
         date_str = jst_now.strftime("%Y-%m-%d")
         time_str = jst_now.strftime("%H%M%S")
         datetime_str = jst_now.strftime("%Y-%m-%d_%H%M%S")
-        history_dir = os.path.dirname(output_path)
         history_file = os.path.join(history_dir, f"prediction_{datetime_str}.json")
         
-        # 日時付きファイルに保存
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(prediction, f, ensure_ascii=False, indent=2)
+        core_data = writer.encode('core', core)
+        writer.write('core', core_data, [output_path, history_file] if add_history else [output_path])
+        writer.report()
         
-        print(f"予測履歴を {history_file} に保存しました")
+        section_bytes = sum(entry['bytes'] for entry in core['sections'].values())
+        print(f"予測結果を {output_path} に保存しました（本体 {len(core_data):,} bytes、"
+              f"セクション {len(core['sections'])}件 {section_bytes:,} bytes）")
         
-        # 履歴リストを更新
-        history_list_path = os.path.join(history_dir, "prediction_history.json")
-        history_list = []
+        if not add_history:
+            print(f"[save_prediction] 直近の履歴（{latest_entry.get('file')}）と内容が同じため、履歴は追加しません")
+            return prediction
         
-        if os.path.exists(history_list_path):
-            try:
-                with open(history_list_path, 'r', encoding='utf-8') as f:
-                    history_list = json.load(f)
-            except Exception as e:
-                print(f"[save_prediction] 履歴リストの読み込みに失敗: {e}")
-                history_list = []
+        print(f"予測履歴を {history_file} に保存しました")
         
-        # 新しいエントリを追加（同じ日時でも別エントリとして追加）
+        # 新しいエントリ（同じ日時でも別エントリとして追加）
         history_entry = {
             'date': date_str,
             'time': time_str,
             'datetime': datetime_str,
             'timestamp': jst_now.isoformat(),
             'file': f"prediction_{datetime_str}.json",
+            'sha256': content_hash,
             'statistics': prediction.get('statistics', {})
         }
         
-        history_list.append(history_entry)
-        # タイムスタンプでソート（新しい順）
-        history_list.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        print(f"[save_prediction] 履歴リストに追加しました: {datetime_str}")
+        # 履歴インデックスに1行追記する（全件の読み込み・並べ替えはしない）
+        summary = history.append(history_entry)
+        print(f"[save_prediction] 履歴インデックスに追加しました: {datetime_str}（{summary['total']} 件）")
         
-        # 履歴リストを保存
-        with open(history_list_path, 'w', encoding='utf-8') as f:
-            json.dump(history_list, f, ensure_ascii=False, indent=2)
-        
-        print(f"履歴リストを {history_list_path} に保存しました（{len(history_list)} 件）")
+        # 予測の台帳に各手法の予測を追記する（次の抽せん結果が出たときに当せん番号を記録）
+        try:
+            self.ledger.append(len(self.df), jst_now.timestamp(), prediction['methods'])
+            self._ledger_stats = None
+        except OSError as e:
+            print(f"[save_prediction] 予測の台帳に追記できません: {e}")
         
         return prediction
 
 
+class BacktestView(NumbersAnalyzer):
+    """
+    ウォークフォワード検証用のアナライザー（先頭t件の抽せんだけが見える状態）
+    
+    advanceで抽せんを1件ずつ進め、出現回数のインデックスには追加分だけを加算する。
+    位相・指標は全件分を計算済みの配列の先頭t行を返し（各行はその時点までの抽せんだけで決まる）、
+    学習済みモデルは一時ディレクトリに保存するため、本来のキャッシュ・予測の台帳は変更しない。
+    """
+    
+    def __init__(self, parent: NumbersAnalyzer, start: int, phases: np.ndarray, indicators: np.ndarray, cache_dir: str):
+        """
+        初期化
+        
+        Args:
+            parent: 全件のデータを読み込んだアナライザー（クラス定数の上書きも引き継ぐ）
+            start: 最初に見える抽せん数
+            phases: 全件の位相（load_phase_storeの結果）
+            indicators: 全件の指標（load_indicator_storeの結果）
+            cache_dir: モデルを保存する一時ディレクトリ
+        """
+        self.__dict__.update(parent.__dict__)
+        self.feature_cache_stats = {'hits': 0, 'misses': 0}
+        self.cache_dir = cache_dir
+        self.ledger = PredictionLedger(cache_dir)
+        self._full_df = parent.df
+        self._full_draws = parent.draws
+        self._phases = phases
+        self._indicators = indicators
+        self._set_length(start)
+        self._count_index = DigitCountIndex.from_frame(self.df)
+    
+    def _set_length(self, t: int):
+        """先頭t件の抽せんが見える状態にする（派生キャッシュは無効化）"""
+        self.df = self._full_df.iloc[:t]
+        self.draws = {column: values[:t] for column, values in self._full_draws.items()}
+        self.data_version += 1
+        self._feature_cache = None
+        self._confidence_context = None
+    
+    def advance(self):
+        """次の抽せんを1件見えるようにする"""
+        t = len(self.df)
+        self._count_index.append(self._full_df.iloc[t:t + 1])
+        self._set_length(t + 1)
+    
+    def load_phase_store(self) -> np.ndarray:
+        """全件分の位相の先頭t行"""
+        return self._phases[:len(self.df)]
+    
+    def load_indicator_store(self) -> np.ndarray:
+        """全件分の指標の先頭t行"""
+        return self._indicators[:len(self.df)]
+
+
+def _run_backtest_fold(analyzer: NumbersAnalyzer, start: int, end: int, phases: np.ndarray, indicators: np.ndarray,
+                       specs: List[Dict[str, any]], refit_every: int) -> Dict[str, any]:
+    """
+    ウォークフォワード検証の1 fold（抽せんstart..end-1を、それぞれ直前までのデータで予測する）
+    
+    Returns:
+        dict: {'set' / 'mini': {手法のキー: 予測の配列（予測がない場合は-1）}, 'errors': {手法のキー: エラー}}
+    """
+    import tempfile
+    import shutil
+    
+    cache_dir = tempfile.mkdtemp(prefix="backtest_")
+    try:
+        view = BacktestView(analyzer, start, phases, indicators, cache_dir)
+        n = end - start
+        outcome = {'set': {spec['key']: np.full(n, -1, dtype=np.int64) for spec in specs},
+                   'mini': {spec['key']: np.full(n, -1, dtype=np.int64) for spec in specs},
+                   'errors': {}}
+        previous = {}
+        for i, t in enumerate(range(start, end)):
+            if i > 0:
+                view.advance()
+            for spec in specs:
+                key = spec['key']
+                if key in outcome['errors']:
+                    continue
+                if spec.get('cost', 1) >= 2 and (t - start) % refit_every != 0 and key in previous:
+                    result = previous[key]
+                else:
+                    result, error, _, _, _ = _call_method(view, spec['method'], spec.get('kwargs', {}), imports=spec.get('imports'))
+                    if error is not None or not result:
+                        # 未インストールのライブラリなど、以降も同じ結果になるため打ち切る
+                        outcome['errors'][key] = error or '予測なし'
+                        continue
+                    previous[key] = result
+                outcome['set'][key][i] = PredictionLedger._parse_number(result.get('set_prediction'), 1000)
+                outcome['mini'][key][i] = PredictionLedger._parse_number(result.get('mini_prediction'), 100)
+        return outcome
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
 def main():
     """メイン実行関数"""
     parser = argparse.ArgumentParser(description='Numbers3 Prediction Analysis')
     parser.add_argument('--mode', choices=['light', 'full'], default='light',
                         help='Execution mode: light (fast, default) or full (comprehensive)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes for independent methods (default: CPU count, 1: sequential)')
+    parser.add_argument('--verify-indicators', action='store_true',
+                        help='Check incrementally updated indicators against a full recompute')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Seconds available for the prediction methods; slow methods are degraded or skipped to fit (default: unlimited)')
+    parser.add_argument('--max-cost', type=int, choices=[1, 2, 3], default=None,
+                        help='Only run methods up to this relative cost (1: cheap statistical methods only)')
+    parser.add_argument('--import-profile', action='store_true',
+                        help='Report the time spent importing libraries at startup and per method')
+    parser.add_argument('--compact-history', action='store_true',
+                        help='Rewrite old full prediction history files as core files sharing content-addressed sections, then exit')
+    parser.add_argument('--backtest', type=int, default=None, metavar='N',
+                        help='Walk-forward backtest of the prediction methods over the last N draws (no data update), then exit')
+    parser.add_argument('--refit-every', type=int, default=None, metavar='K',
+                        help='Re-run model-fitting methods (cost >= 2) every K draws during --backtest (default: BACKTEST_REFIT_EVERY)')
     args = parser.parse_args()
     
+    if args.backtest:
+        analyzer = NumbersAnalyzer()
+        report = analyzer.backtest(n_draws=args.backtest, refit_every=args.refit_every, max_cost=args.max_cost,
+                                   workers=args.workers)
+        report_path = os.path.join(analyzer.cache_dir, "backtest_report.json")
+        os.makedirs(analyzer.cache_dir, exist_ok=True)
+        write_text_atomic(report_path, json.dumps(report, ensure_ascii=False, indent=2))
+        print(f"[main] 検証結果を {report_path} に保存しました")
+        return False
+    
+    if args.compact_history:
+        compacted = compact_prediction_history("docs/data")
+        print(f"[main] 予測履歴 {compacted}件を分割形式に書き換えました")
+        return False
+    
     print(f"[main] 開始モード: {args.mode}")
 
     analyzer = NumbersAnalyzer()
@@ -3219,8 +5761,12 @@ def main():
     else:
         print("[main] データは更新されませんでした。予測分析を実行します。")
     
+    if args.verify_indicators:
+        analyzer.verify_indicators()
+    
     # 予測分析を実行（常に全再計算）
-    prediction = analyzer.save_prediction(update_info=update_info, mode=args.mode)
+    prediction = analyzer.save_prediction(update_info=update_info, mode=args.mode, workers=args.workers,
+                                          time_budget=args.time_budget, max_cost=args.max_cost)
     
     print("\n=== 予測結果 ===")
     print(f"セット予測（上位3件）:")
@@ -3231,6 +5777,9 @@ def main():
     for pred in prediction['mini_predictions']:
         print(f"  {pred['rank']}. {pred['number']} (信頼度: {pred['confidence']:.3f})")
     
+    if args.import_profile:
+        analyzer.print_import_profile()
+    
     # データ更新があった場合は、その情報も返す（GitHub Actionsで使用）
     return update_info['updated']
 
@@ -0,0 +1,308 @@
+"""
+NumbersAnalyzerの各手法のベンチマーク
+
+シード付きの合成データ（1,000〜1,000,000件）で ENSEMBLE_METHODS に登録された手法を1つずつ
+別プロセスで実行し、経過時間・ピークRSS・メモリ確保量をJSONに保存する。
+--baseline を指定した場合は、保存済みの結果と比べて遅くなった手法を報告する。
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from analyze import NumbersAnalyzer, _call_method, _terminate_pool, format_data_json, load_dependencies, write_text_atomic
+
+# 既定の履歴サイズ（抽せん数）
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# 合成データの最初の抽せん日（ナンバーズ3の第1回）
+SYNTHETIC_START_DATE = '1994-10-07'
+# 出現回数を使う手法が共有するインデックスの作成（各手法の計測には含めないため、独立した項目として計測する）
+COUNT_INDEX_SPEC = {'method': 'count_index', 'key': 'count_index', 'group': 'index', 'cost': 1}
+
+
+def generate_draws(n: int, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    シード付きの合成データを作成する（各桁は一様乱数、抽せん日は平日）
+
+    Args:
+        n: 抽せん数
+        seed: 乱数のシード
+
+    Returns:
+        list: data.json形式のレコード（日付順）
+    """
+    rng = np.random.default_rng(seed)
+    nums = rng.integers(0, 1000, size=n)
+    dates = np.busday_offset(np.datetime64(SYNTHETIC_START_DATE, 'D'), np.arange(n), roll='forward')
+    return [{'date': str(date), 'num': f"{num:03d}", 'issue': str(issue)}
+            for issue, (date, num) in enumerate(zip(dates, nums), start=1)]
+
+
+def prepare_dataset(work_dir: str, n: int, seed: int) -> Dict[str, str]:
+    """
+    合成データとそのキャッシュ（位相・指標のストア）を用意する（作成済みなら再利用）
+
+    Args:
+        work_dir: 作業ディレクトリ
+        n: 抽せん数
+        seed: 乱数のシード
+
+    Returns:
+        dict: {'data_path': data.jsonのパス, 'cache_dir': キャッシュディレクトリ}
+    """
+    data_path = os.path.join(work_dir, f"synthetic_{n}_{seed}.json")
+    cache_dir = os.path.join(work_dir, f"cache_{n}_{seed}")
+    if not os.path.exists(data_path):
+        started = time.perf_counter()
+        os.makedirs(work_dir, exist_ok=True)
+        write_text_atomic(data_path, format_data_json(generate_draws(n, seed), style='lines'))
+        print(f"[prepare_dataset] {n:,}件の合成データを作成しました（{time.perf_counter() - started:.1f}秒）")
+
+    # 各手法の計測に含めないよう、ディスク上のストアを先に作っておく
+    started = time.perf_counter()
+    analyzer = NumbersAnalyzer(data_path=data_path, cache_dir=cache_dir)
+    analyzer.load_phase_store()
+    analyzer.load_indicator_store()
+    print(f"[prepare_dataset] {n:,}件のストアを準備しました（{time.perf_counter() - started:.1f}秒）")
+    return {'data_path': data_path, 'cache_dir': cache_dir}
+
+
+def _max_rss_mb() -> float:
+    """このプロセスのピークRSS（MB、LinuxはKB単位・macOSはバイト単位で返される）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure_method(data_path: str, cache_dir: str, spec: Dict[str, any], mode: str,
+                    trace_alloc: bool) -> Dict[str, any]:
+    """
+    手法を1回実行して計測する（新しいプロセスで実行される）
+
+    データの読み込み・ライブラリの読み込みは計測に含めない。出現回数のインデックスは手法の実行前に
+    作成して計測から除き、その作成時間は COUNT_INDEX_SPEC の項目として計測する。
+
+    Returns:
+        dict: {'status', 'seconds', 'peak_rss_mb', 'rss_growth_mb'}（trace_allocの場合は
+              'alloc_peak_mb', 'alloc_retained_mb' も）
+    """
+    analyzer = NumbersAnalyzer(data_path=data_path, cache_dir=cache_dir)
+    if spec['method'] != COUNT_INDEX_SPEC['method']:
+        analyzer.count_index()
+    kwargs = dict(spec.get('kwargs', {}))
+    if mode == 'full':
+        kwargs.update(spec.get('full_kwargs', {}))
+    load_dependencies(spec.get('imports', []))
+
+    rss_before = _max_rss_mb()
+    if trace_alloc:
+        tracemalloc.start()
+    result, error, elapsed, _, _ = _call_method(analyzer, spec['method'], kwargs)
+    measurement = {}
+    if trace_alloc:
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        measurement.update({'alloc_peak_mb': round(peak / (1024 * 1024), 2),
+                            'alloc_retained_mb': round(retained / (1024 * 1024), 2)})
+    peak_rss = _max_rss_mb()
+
+    if error is not None:
+        status = 'error'
+    elif result is None:
+        # 未インストールのライブラリなど、手法が予測を返さなかった場合
+        status = 'unavailable'
+    else:
+        status = 'ok'
+    measurement.update({
+        'status': status,
+        'seconds': round(elapsed, 4),
+        'peak_rss_mb': round(peak_rss, 1),
+        'rss_growth_mb': round(peak_rss - rss_before, 1)
+    })
+    if error is not None:
+        measurement['error'] = error
+    return measurement
+
+
+def run_isolated(spec: Dict[str, any], dataset: Dict[str, str], mode: str, trace_alloc: bool,
+                 timeout: float) -> Dict[str, any]:
+    """
+    新しいプロセス（spawn）で手法を計測する（他の手法のメモリ・キャッシュの影響を受けないように）
+
+    Args:
+        spec: ENSEMBLE_METHODSの登録内容
+        dataset: prepare_datasetの結果
+        mode: 'light' または 'full'
+        trace_alloc: tracemallocでメモリ確保量を計測する（経過時間は別の実行で計測する）
+        timeout: 打ち切るまでの秒数
+    """
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn'))
+    try:
+        future = executor.submit(_measure_method, dataset['data_path'], dataset['cache_dir'], spec, mode, trace_alloc)
+        measurement = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        _terminate_pool(executor)
+        return {'status': 'timeout', 'seconds': None}
+    except Exception as e:
+        # ワーカーの異常終了（メモリ不足など）
+        executor.shutdown(wait=False, cancel_futures=True)
+        return {'status': 'crashed', 'seconds': None, 'error': f"{type(e).__name__}: {e}"}
+    executor.shutdown(wait=True)
+    return measurement
+
+
+def select_specs(methods: Optional[List[str]] = None, max_cost: Optional[int] = None) -> List[Dict[str, any]]:
+    """
+    計測する手法を選ぶ（出現回数のインデックスの作成 COUNT_INDEX_SPEC を先頭に含む）
+
+    Args:
+        methods: メソッド名または結果のキー（Noneの場合はすべて）
+        max_cost: 計算コストの上限（Noneの場合はすべて）
+    """
+    specs = []
+    for spec in [COUNT_INDEX_SPEC] + NumbersAnalyzer.ENSEMBLE_METHODS:
+        if methods and spec['method'] not in methods and spec['key'] not in methods:
+            continue
+        if max_cost is not None and spec.get('cost', 1) > max_cost:
+            continue
+        specs.append(spec)
+    return specs
+
+
+def run_benchmark(sizes: List[int], specs: List[Dict[str, any]], seed: int = 0, mode: str = 'light',
+                  trace_alloc: bool = True, timeout: float = 600.0, work_dir: str = ".cache/benchmark") -> Dict[str, any]:
+    """
+    すべての履歴サイズ・手法を計測する
+
+    Returns:
+        dict: {'meta': 実行環境・条件, 'results': [{'method', 'key', 'group', 'size', ...計測値}]}
+    """
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'mode': mode,
+            'sizes': sizes
+        },
+        'results': []
+    }
+
+    for n in sizes:
+        dataset = prepare_dataset(work_dir, n, seed)
+        for spec in specs:
+            measurement = run_isolated(spec, dataset, mode, trace_alloc=False, timeout=timeout)
+            if trace_alloc and measurement['status'] == 'ok':
+                allocation = run_isolated(spec, dataset, mode, trace_alloc=True, timeout=timeout)
+                for field in ('alloc_peak_mb', 'alloc_retained_mb'):
+                    if field in allocation:
+                        measurement[field] = allocation[field]
+
+            entry = {'method': spec['method'], 'key': spec['key'], 'group': spec['group'], 'size': n}
+            entry.update(measurement)
+            report['results'].append(entry)
+
+            if measurement['status'] == 'ok':
+                alloc = f"、確保 {measurement['alloc_peak_mb']:,.1f}MB" if 'alloc_peak_mb' in measurement else ''
+                print(f"[run_benchmark] {n:>9,}件 {spec['method']:<36} {measurement['seconds']:>9.3f}秒"
+                      f"（ピークRSS {measurement['peak_rss_mb']:,.0f}MB{alloc}）")
+            else:
+                print(f"[run_benchmark] {n:>9,}件 {spec['method']:<36} {measurement['status']}"
+                      f"{': ' + measurement['error'] if measurement.get('error') else ''}")
+
+    return report
+
+
+def check_regressions(report: Dict[str, any], baseline: Dict[str, any], threshold: float = 1.5,
+                      min_delta: float = 0.05) -> List[Dict[str, any]]:
+    """
+    基準の結果より遅くなった手法を探す
+
+    Args:
+        report: 今回の結果
+        baseline: 基準の結果（以前のrun_benchmarkの出力）
+        threshold: 遅くなったとみなす経過時間の比率
+        min_delta: 計測の揺らぎとして無視する差（秒）
+
+    Returns:
+        list: [{'method', 'size', 'baseline', 'seconds', 'ratio'}]
+    """
+    previous = {(entry['method'], entry['size']): entry for entry in baseline.get('results', [])
+                if entry.get('status') == 'ok'}
+    regressions = []
+    for entry in report['results']:
+        base = previous.get((entry['method'], entry['size']))
+        if entry.get('status') != 'ok' or base is None:
+            continue
+        ratio = entry['seconds'] / max(base['seconds'], 1e-9)
+        if ratio > threshold and entry['seconds'] - base['seconds'] > min_delta:
+            regressions.append({'method': entry['method'], 'size': entry['size'], 'baseline': base['seconds'],
+                                'seconds': entry['seconds'], 'ratio': round(ratio, 2)})
+    return regressions
+
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description='Benchmark NumbersAnalyzer methods on seeded synthetic draw histories')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='Comma-separated history sizes in draws (default: 1000,10000,100000,1000000)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic draw generator')
+    parser.add_argument('--methods', default=None,
+                        help='Comma-separated method names or result keys to benchmark (default: all registered methods)')
+    parser.add_argument('--max-cost', type=int, choices=[1, 2, 3], default=None,
+                        help='Only benchmark methods up to this relative cost')
+    parser.add_argument('--mode', choices=['light', 'full'], default='light', help='Use the light or full method arguments')
+    parser.add_argument('--timeout', type=float, default=600.0, help='Seconds before a single measurement is abandoned')
+    parser.add_argument('--no-alloc', action='store_true',
+                        help='Skip the extra tracemalloc run per method (wall time and peak RSS only)')
+    parser.add_argument('--work-dir', default='.cache/benchmark',
+                        help='Directory for the synthetic data and its caches (reused between runs)')
+    parser.add_argument('--output', default=None,
+                        help='Path of the results JSON (default: <work-dir>/results_<timestamp>.json)')
+    parser.add_argument('--baseline', default=None, help='Results JSON to compare against; exits with 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='Slowdown ratio against the baseline that counts as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help='Ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    specs = select_specs(args.methods.split(',') if args.methods else None, args.max_cost)
+    if not specs:
+        parser.error('no registered method matches --methods / --max-cost')
+
+    report = run_benchmark(sizes, specs, seed=args.seed, mode=args.mode, trace_alloc=not args.no_alloc,
+                           timeout=args.timeout, work_dir=args.work_dir)
+
+    output = args.output or os.path.join(args.work_dir, f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    write_text_atomic(output, json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"[main] 計測結果を {output} に保存しました（{len(report['results'])}件）")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = check_regressions(report, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"[main] 基準（{args.baseline}）より{args.threshold}倍以上遅くなった手法: {len(regressions)}件")
+            for item in regressions:
+                print(f"  {item['method']} ({item['size']:,}件): {item['baseline']:.3f}秒 → {item['seconds']:.3f}秒（×{item['ratio']}）")
+            sys.exit(1)
+        print(f"[main] 基準（{args.baseline}）と比べて遅くなった手法はありません")
+
+
+if __name__ == "__main__":
+    main()
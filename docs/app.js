@@ -4,8 +4,12 @@
  */
 
 let predictionData = null;
+let loadedSections = new Set(); // 読み込み済みのセクション（分割出力の場合）
 let phaseChart = null;
-let predictionHistory = [];
+let predictionHistory = []; // 読み込み済みの履歴（新しい順）
+let historySummary = null; // 履歴インデックスの要約（従来形式の履歴リストの場合はnull）
+let currentHistoryValue = 'latest'; // 表示中の予測（履歴選択の値）
+const HISTORY_MORE_VALUE = '__more__'; // 古い履歴を追加で読み込む項目の値
 let periodicityCharts = {}; // 周期性グラフのインスタンスを保存
 
 // ページ読み込み時にデータを取得
@@ -16,6 +20,17 @@ document.addEventListener('DOMContentLoaded', async () => {
         if (historySelect) {
             historySelect.addEventListener('change', async (e) => {
                 const selectedValue = e.target.value;
+                if (selectedValue === HISTORY_MORE_VALUE) {
+                    // 古い履歴のページを読み込み、選択は表示中の予測に戻す
+                    try {
+                        await loadOlderHistory();
+                    } catch (error) {
+                        console.warn('古い履歴の読み込みに失敗:', error);
+                    }
+                    historySelect.value = currentHistoryValue;
+                    return;
+                }
+                currentHistoryValue = selectedValue;
                 try {
                     if (selectedValue === 'latest') {
                         await loadPredictionData('latest');
@@ -38,13 +53,26 @@ document.addEventListener('DOMContentLoaded', async () => {
 
 /**
  * 予測履歴リストを読み込む
+ * 履歴インデックスの要約（直近1ページ分、新しい順）だけを読み込み、
+ * 古い履歴はloadOlderHistoryでページ単位に読み込む
  */
 async function loadPredictionHistory() {
     try {
         // キャッシュを無効化して最新の履歴を取得
-        const response = await fetch('data/prediction_history.json?' + new Date().getTime());
+        const response = await fetch('data/prediction_history_summary.json?' + new Date().getTime());
         if (response.ok) {
-            predictionHistory = await response.json();
+            historySummary = await response.json();
+            predictionHistory = historySummary.recent || [];
+            console.log(`[loadPredictionHistory] 履歴を読み込みました: ${predictionHistory.length} / ${historySummary.total} 件`);
+            populateHistorySelect();
+            return;
+        }
+        
+        // 履歴インデックスがない場合は従来形式の履歴リストを読み込む
+        historySummary = null;
+        const legacyResponse = await fetch('data/prediction_history.json?' + new Date().getTime());
+        if (legacyResponse.ok) {
+            predictionHistory = await legacyResponse.json();
             console.log(`[loadPredictionHistory] 履歴を読み込みました: ${predictionHistory.length} 件`);
             populateHistorySelect();
         } else {
@@ -57,6 +85,34 @@ async function loadPredictionHistory() {
     }
 }
 
+/**
+ * 読み込み済みの履歴より古い履歴の件数
+ */
+function remainingHistoryCount() {
+    if (!historySummary || predictionHistory.length === 0) return 0;
+    return predictionHistory[predictionHistory.length - 1].seq;
+}
+
+/**
+ * 読み込み済みの履歴より古い履歴を1ページ分読み込む
+ * ページファイル（history_pages/{k}.json）は古い順に確定済みのため、キャッシュをそのまま使える
+ */
+async function loadOlderHistory() {
+    const oldestSeq = remainingHistoryCount();
+    if (oldestSeq <= 0) return;
+    
+    const page = Math.floor((oldestSeq - 1) / historySummary.page_size);
+    const response = await fetch(`data/history_pages/${page}.json`);
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText} - ファイル: data/history_pages/${page}.json`);
+    }
+    const entries = await response.json();
+    const older = entries.filter(entry => entry.seq < oldestSeq).reverse();
+    predictionHistory = predictionHistory.concat(older);
+    console.log(`[loadOlderHistory] 履歴を読み込みました: ${predictionHistory.length} / ${historySummary.total} 件`);
+    populateHistorySelect();
+}
+
 /**
  * 履歴選択ドロップダウンを設定
  */
@@ -121,6 +177,16 @@ function populateHistorySelect() {
         
         historySelect.appendChild(option);
     });
+    
+    // まだ読み込んでいない古い履歴がある場合は追加読み込みの項目を表示
+    const remaining = remainingHistoryCount();
+    if (remaining > 0) {
+        const moreOption = document.createElement('option');
+        moreOption.value = HISTORY_MORE_VALUE;
+        moreOption.textContent = `さらに古い履歴を読み込む（残り ${remaining} 件）`;
+        historySelect.appendChild(moreOption);
+    }
+    historySelect.value = currentHistoryValue;
 }
 
 /**
@@ -141,10 +207,77 @@ async function loadPredictionData(file = 'latest') {
     }
     
     predictionData = await response.json();
+    loadedSections = new Set();
     console.log(`[loadPredictionData] データを読み込みました: ${file}`);
     renderContent();
 }
 
+/**
+ * 分割出力された予測データのセクションを読み込み、predictionDataにマージする
+ * （最初の表示には不要な位相・詳細分析などは、詳細を開いたときにだけ読み込む）
+ * 分割されていない従来形式の予測データでは何もしない
+ * @param {string[]} [names] - セクション名（省略時はすべて）
+ */
+async function ensureSections(names) {
+    const manifest = (predictionData && predictionData.sections) || {};
+    const data = predictionData;
+    const pending = (names || Object.keys(manifest))
+        .filter(name => manifest[name] && !loadedSections.has(name));
+    
+    await Promise.all(pending.map(async (name) => {
+        const entry = manifest[name];
+        // ファイル名に内容のハッシュが含まれるため、キャッシュをそのまま使える
+        const response = await fetch(`data/${entry.file}`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText} - ファイル: data/${entry.file}`);
+        }
+        const content = await response.json();
+        // 読み込み中に別の予測が選択された場合は破棄
+        if (data !== predictionData) return;
+        mergePredictionSection(entry.target, content);
+        loadedSections.add(name);
+    }));
+    if (pending.length > 0) {
+        console.log(`[ensureSections] セクションを読み込みました: ${pending.join(', ')}`);
+    }
+}
+
+/**
+ * セクションの内容を格納先（'recent_phases' / 'methods' / 'advanced_analysis.キー'）にマージする
+ */
+function mergePredictionSection(target, content) {
+    if (target === 'methods') {
+        // 手法ごとの詳細（特徴量の重要度など）を概要にマージ
+        predictionData.methods = predictionData.methods || {};
+        Object.entries(content).forEach(([key, detail]) => {
+            predictionData.methods[key] = Object.assign({}, predictionData.methods[key], detail);
+        });
+        return;
+    }
+    const [head, key] = target.split('.');
+    if (key) {
+        predictionData[head] = predictionData[head] || {};
+        predictionData[head][key] = content;
+    } else {
+        predictionData[head] = content;
+    }
+}
+
+/**
+ * 詳細表示の読み込み中の表示
+ */
+function renderSectionLoading(container) {
+    container.innerHTML = '<p class="text-gray-500 text-sm">詳細データを読み込み中...</p>';
+}
+
+/**
+ * セクションの読み込み失敗の表示
+ */
+function renderSectionError(container, error) {
+    console.error('[ensureSections] セクションの読み込みに失敗:', error);
+    container.innerHTML = `<p class="text-red-600 text-sm">詳細データの読み込みに失敗しました: ${error.message}</p>`;
+}
+
 /**
  * コンテンツをレンダリング
  */
@@ -166,10 +299,10 @@ function renderContent() {
     // ミニ予測を表示
     setTimeout(() => renderMiniPredictions(), 200);
     
-    // 位相グラフを描画
+    // 位相グラフを描画（位相のセクションはグラフが画面に入ったときに読み込む）
     setTimeout(() => {
-        renderPhaseChart('all');
         setupPhaseChartTabs();
+        observePhaseChart();
     }, 300);
     
     // 予測手法の詳細を表示（予測結果も含む）
@@ -179,6 +312,57 @@ function renderContent() {
     setTimeout(() => setupAnalysisDetailButtons(), 500);
 }
 
+/**
+ * 位相グラフが画面に入ったときに位相データを読み込んで描画する
+ */
+let phaseChartObserver = null;
+
+function observePhaseChart() {
+    const canvas = document.getElementById('phaseChart');
+    if (!canvas) return;
+    
+    const load = async () => {
+        try {
+            await ensureSections(['phases']);
+            renderPhaseChart(currentPhaseView);
+        } catch (error) {
+            console.error('[observePhaseChart] 位相データの読み込みに失敗:', error);
+        }
+    };
+    
+    if (phaseChartObserver) {
+        phaseChartObserver.disconnect();
+        phaseChartObserver = null;
+    }
+    if (!('IntersectionObserver' in window)) {
+        load();
+        return;
+    }
+    phaseChartObserver = new IntersectionObserver((entries) => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            phaseChartObserver.disconnect();
+            phaseChartObserver = null;
+            load();
+        }
+    }, { rootMargin: '200px' });
+    phaseChartObserver.observe(canvas);
+}
+
+// 詳細分析ボタン（data-analysis）と読み込むセクション（advanced_analysisのキー）の対応
+const ANALYSIS_DETAIL_SECTIONS = {
+    'correlations': 'correlations',
+    'trends': 'trends',
+    'clustering': 'clustering',
+    'frequency': 'frequency_analysis',
+    'wavelet': 'wavelet_analysis',
+    'pca': 'pca_analysis',
+    'tsne': 'tsne_analysis',
+    'continuity': 'continuity_analysis',
+    'change_points': 'change_points',
+    'network': 'network_analysis',
+    'genetic': 'genetic_optimization'
+};
+
 /**
  * 詳細分析結果のボタンイベントを設定
  */
@@ -226,7 +410,11 @@ function toggleAnalysisDetail(analysisType, btn) {
         const contentDiv = detailDiv.querySelector('.analysis-detail-content') || detailDiv;
         if (!contentDiv.innerHTML.trim() || contentDiv.innerHTML === '') {
             console.log(`[toggleAnalysisDetail] ${analysisType} の詳細をレンダリングします`);
-            renderAnalysisDetail(analysisType, contentDiv);
+            renderSectionLoading(contentDiv);
+            const section = ANALYSIS_DETAIL_SECTIONS[analysisType];
+            ensureSections(section ? [section] : [])
+                .then(() => renderAnalysisDetail(analysisType, contentDiv))
+                .catch(error => renderSectionError(contentDiv, error));
         }
     } else {
         // 詳細を非表示
@@ -1073,6 +1261,23 @@ function renderMethodDetails() {
         }
     };
 
+    // 時間予算により軽量化・スキップされた手法を表示
+    const runBudget = predictionData.run_budget || {};
+    const degradedKeys = (runBudget.degraded || [])
+        .filter(item => item.group === 'prediction')
+        .map(item => item.method);
+    const skippedItems = runBudget.skipped || [];
+    if (skippedItems.length > 0) {
+        const skipReasons = { 'budget': '時間予算不足', 'timeout': '期限超過' };
+        const notice = document.createElement('div');
+        notice.className = 'bg-amber-50 rounded-xl p-4 border-2 border-amber-200 text-sm text-amber-800';
+        notice.innerHTML = `
+            <p class="font-semibold mb-1">⏱ 時間予算の都合で実行されなかった手法・分析があります</p>
+            <p>${skippedItems.map(item => `${methodNames[item.method] || item.method}（${skipReasons[item.reason] || item.reason}）`).join('、')}</p>
+        `;
+        container.appendChild(notice);
+    }
+
     Object.keys(methods).forEach((methodKey, index) => {
         const method = methods[methodKey];
         if (!method) {
@@ -1090,6 +1295,9 @@ function renderMethodDetails() {
         
         // データ利用件数のバッジを取得
         const dataUsageBadge = getMethodDataUsageBadgeHtml(methodKey);
+        const degradedBadge = degradedKeys.includes(methodKey)
+            ? '<p class="text-xs text-amber-700 mb-2">⏱ 時間予算のため軽量設定で実行</p>'
+            : '';
         
         card.innerHTML = `
             <div class="flex items-start justify-between mb-4">
@@ -1109,6 +1317,7 @@ function renderMethodDetails() {
                 </div>
             </div>
             ${dataUsageBadge}
+            ${degradedBadge}
             <div class="grid grid-cols-1 md:grid-cols-2 gap-4 mb-4">
                 <div class="bg-white/60 backdrop-blur-sm rounded-xl p-4 border border-gray-200">
                     <p class="text-xs font-semibold text-gray-600 uppercase tracking-wide mb-2">セット予測</p>
@@ -1177,7 +1386,15 @@ function toggleMethodDetail(methodKey) {
         // 詳細内容を生成（まだ生成されていない場合）
         const contentDiv = detailDiv.querySelector('.method-detail-content');
         if (contentDiv && contentDiv.innerHTML === '') {
-            renderMethodDetailContent(methodKey, contentDiv);
+            // 手法の詳細は各種分析結果を参照するため、位相以外のセクションを読み込む
+            // （位相はカオス理論の詳細でのみ使用）
+            const manifest = predictionData.sections || {};
+            const sections = Object.keys(manifest)
+                .filter(name => manifest[name].target !== 'recent_phases' || methodKey === 'chaos');
+            renderSectionLoading(contentDiv);
+            ensureSections(sections)
+                .then(() => renderMethodDetailContent(methodKey, contentDiv))
+                .catch(error => renderSectionError(contentDiv, error));
         }
     } else {
         // 詳細を非表示
@@ -2737,7 +2954,7 @@ function renderPatternDetail(method, analysis) {
     html += '<div class="bg-white rounded-lg p-4 mb-4">';
     html += '<h5 class="font-semibold text-gray-700 mb-3">分析プロセス</h5>';
     html += '<ol class="text-sm text-gray-600 space-y-2 list-decimal list-inside">';
-    html += '<li><strong>頻出パターンの抽出</strong>: 全履歴データから、3桁コンボ（set_top）と2桁コンボ（mini_top、hundred_ten_top、ten_one_top）の出現頻度を計算</li>';
+    html += '<li><strong>頻出パターンの抽出</strong>: 全履歴データから、3桁コンボ（set_top）、2桁コンボ（mini_top、hundred_ten_top、ten_one_top）、ボックス（box_top）の出現頻度を計算</li>';
     html += '<li><strong>最新データとの照合</strong>: 最新の数字（百の位と十の位、十の位と一の位）が頻出パターンに含まれているか確認</li>';
     html += '<li><strong>予測の実行</strong>: 頻出パターンに基づいて次の数字を予測（百の位と十の位の組み合わせから一の位を、十の位と一の位の組み合わせから百の位を予測）</li>';
     html += '<li><strong>予測値の生成</strong>: 各桁の予測値を組み合わせて3桁の数字を生成</li>';
@@ -2768,6 +2985,18 @@ function renderPatternDetail(method, analysis) {
         html += '</div>';
     }
     
+    if (patterns.box_top) {
+        html += '<div class="bg-white rounded-lg p-3 mt-2">';
+        html += '<p class="text-sm font-semibold text-gray-700 mb-2">頻出ボックス（順不同の3桁、上位5件）:</p>';
+        html += '<ul class="text-sm text-gray-600 space-y-1">';
+        const top5 = Object.entries(patterns.box_top).slice(0, 5);
+        top5.forEach(([pattern, count]) => {
+            html += `<li>${pattern}: ${count}回</li>`;
+        });
+        html += '</ul>';
+        html += '</div>';
+    }
+    
     html += '</div>';
     return html;
 }
@@ -182,6 +182,35 @@ if (modelSelect) {
     });
 }
 
+// 分割出力された予測結果のセクション（詳細分析・手法の詳細）を読み込んでマージする
+// プロンプトには位相データを使わないため、phases（recent_phases）は読み込まない
+async function loadPredictionSections(predictionData) {
+    const manifest = predictionData.sections || {};
+    const entries = Object.values(manifest).filter(entry => entry.target !== 'recent_phases');
+    const contents = await Promise.all(entries.map(async (entry) => {
+        const res = await fetch(`data/${entry.file}`);
+        if (!res.ok) throw new Error(`HTTP ${res.status}: data/${entry.file}`);
+        return res.json();
+    }));
+    entries.forEach((entry, i) => {
+        const content = contents[i];
+        if (entry.target === 'methods') {
+            predictionData.methods = predictionData.methods || {};
+            Object.entries(content).forEach(([key, detail]) => {
+                predictionData.methods[key] = Object.assign({}, predictionData.methods[key], detail);
+            });
+            return;
+        }
+        const [head, key] = entry.target.split('.');
+        if (key) {
+            predictionData[head] = predictionData[head] || {};
+            predictionData[head][key] = content;
+        } else {
+            predictionData[head] = content;
+        }
+    });
+}
+
 // データロードと解析実行
 analyzeBtn.addEventListener('click', async () => {
     try {
@@ -201,6 +230,7 @@ analyzeBtn.addEventListener('click', async () => {
             const predictionResponse = await fetch('data/latest_prediction.json');
             if (predictionResponse.ok) {
                 const predictionData = await predictionResponse.json();
+                await loadPredictionSections(predictionData);
                 advancedAnalysis = predictionData.advanced_analysis || null;
                 predictionMethods = predictionData.methods || null;
                 console.log('[analyzeBtn] 高度な分析データを読み込みました:', advancedAnalysis ? Object.keys(advancedAnalysis) : 'なし');
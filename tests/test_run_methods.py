@@ -0,0 +1,50 @@
+"""
+run_methods の時間予算（ハード期限）の回帰テスト
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from analyze import NumbersAnalyzer, format_data_json, write_text_atomic
+
+
+class SlowAnalyzer(NumbersAnalyzer):
+    """見積もりを短くし、期限を超える手法を持つアナライザー"""
+
+    TIME_BUDGET_DEFAULT_ESTIMATES = {1: 0.1}
+    TIME_BUDGET_MIN_HARD_SECONDS = 0.5
+
+    def sleep_method(self):
+        time.sleep(30)
+        return {'set_prediction': '000'}
+
+
+def make_data(path, n=200):
+    rng = np.random.default_rng(0)
+    dates = np.busday_offset(np.datetime64('2020-01-01', 'D'), np.arange(n), roll='forward')
+    records = [{'date': str(date), 'num': f"{num:03d}", 'issue': str(issue)}
+               for issue, (date, num) in enumerate(zip(dates, rng.integers(0, 1000, size=n)), start=1)]
+    write_text_atomic(path, format_data_json(records, style='lines'))
+
+
+def test_hard_timeout_without_stored_timing(tmp_path):
+    data_path = str(tmp_path / "data.json")
+    cache_dir = str(tmp_path / "cache")
+    make_data(data_path)
+    os.makedirs(cache_dir)
+    write_text_atomic(os.path.join(cache_dir, "method_timings.json"), "{}")
+
+    analyzer = SlowAnalyzer(data_path=data_path, cache_dir=cache_dir)
+    spec = {'method': 'sleep_method', 'key': 'sleep', 'group': 'prediction', 'label': 'スリープ', 'cost': 1}
+    started = time.time()
+    results = analyzer.run_methods([spec], workers=1, time_budget=5.0)
+
+    assert time.time() - started < 20
+    assert results['prediction']['sleep'] is None
+    assert results['run_budget']['skipped'] == [{'method': 'sleep', 'group': 'prediction', 'reason': 'timeout'}]
+    with open(os.path.join(cache_dir, "method_timings.json"), 'r', encoding='utf-8') as f:
+        timings = json.load(f)
+    assert timings['light:prediction:sleep']['normal'] >= 0.5